@@ -1,11 +1,14 @@
 from django.urls import path
 
+from posts.pagecache import public_page
 from . import views
 
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech')
+    path(
+        'author/', public_page(views.AboutAuthorView.as_view()), name='author'
+    ),
+    path('tech/', public_page(views.AboutTechView.as_view()), name='tech'),
 ]
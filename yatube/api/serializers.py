@@ -0,0 +1,68 @@
+"""
+Представление объектов в JSON.
+
+Каждый сериализатор — словарь «имя поля → функция», поэтому клиент
+может запросить только нужные поля параметром fields.
+"""
+from posts.stats import author_stats
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _image(post, request):
+    if not post.image:
+        return None
+    return request.build_absolute_uri(post.image.url)
+
+
+POST_FIELDS = {
+    'id': lambda post, request: post.pk,
+    'text': lambda post, request: post.text,
+    'pub_date': lambda post, request: _date(post.pub_date),
+    'author': lambda post, request: post.author.username,
+    'group': lambda post, request: post.group.slug if post.group else None,
+    'image': _image,
+    'comments_count': lambda post, request: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment, request: comment.pk,
+    'post': lambda comment, request: comment.post_id,
+    'author': lambda comment, request: comment.author.username,
+    'text': lambda comment, request: comment.text,
+    'created': lambda comment, request: _date(comment.created),
+    'parent': lambda comment, request: comment.parent_id,
+}
+
+GROUP_FIELDS = {
+    'id': lambda group, request: group.pk,
+    'title': lambda group, request: group.title,
+    'slug': lambda group, request: group.slug,
+    'description': lambda group, request: group.description,
+}
+
+PROFILE_FIELDS = {
+    'id': lambda author, request: author.pk,
+    'username': lambda author, request: author.username,
+    'full_name': lambda author, request: author.get_full_name(),
+    'posts_count': lambda author, request: author_stats(author).posts_count,
+    'comments_count': (
+        lambda author, request: author_stats(author).comments_count
+    ),
+}
+
+
+def select(fields, requested):
+    """Подмножество полей по параметру fields; None — неизвестное поле."""
+    if not requested:
+        return fields
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    if any(name not in fields for name in names):
+        return None
+    return {name: fields[name] for name in names}
+
+
+def serialize(obj, fields, request):
+    return {name: getter(obj, request) for name, getter in fields.items()}
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import POSTS_PER_PAGE
+
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_post_list_fields(self):
+        """Список постов отдаёт только запрошенные поля."""
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,text,group'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{
+            'id': self.post.pk, 'text': 'Тестовый пост', 'group': 'test-slug',
+        }])
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'password'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """Следующая страница доступна по ссылке с курсором."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=self.user)
+            for number in range(POSTS_PER_PAGE)
+        )
+        first = self.client.get(reverse('api:post_list')).json()
+        self.assertEqual(len(first['results']), POSTS_PER_PAGE)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        ids = {post['id'] for post in first['results'] + second['results']}
+        self.assertEqual(len(ids), POSTS_PER_PAGE + 1)
+
+    def test_unchanged_feed_returns_not_modified(self):
+        """Неизменившаяся лента отвечает 304, изменения дают новый ETag."""
+        url = reverse('api:group_posts', kwargs={'slug': 'test-slug'})
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(text='Комментарий', author=self.user,
+                               post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 1)
+
+    def test_if_modified_since_does_not_hide_changes(self):
+        """Правка и удаление поста не дают 304 на If-Modified-Since."""
+        post = Post.objects.create(text='Новый пост', author=self.user)
+        url = reverse('api:profile_posts', kwargs={'username': 'NewUser'})
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+        post.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Исправленный пост')
+
+    def test_comments_and_profile(self):
+        """Комментарии поста и профиль автора."""
+        Comment.objects.create(text='Комментарий', author=self.reader,
+                               post=self.post)
+        response = self.client.get(
+            reverse('api:comment_list', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(
+            [comment['author'] for comment in response.json()['results']],
+            ['Reader'],
+        )
+        response = self.client.get(
+            reverse('api:profile_detail', kwargs={'username': 'NewUser'})
+        )
+        self.assertEqual(response.json()['posts_count'], 1)
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок доступна только авторизованным."""
+        url = reverse('api:follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.client.force_login(self.reader)
+        results = self.client.get(url).json()['results']
+        self.assertEqual([post['id'] for post in results], [self.post.pk])
@@ -0,0 +1,166 @@
+"""
+JSON API v1 только для чтения.
+
+Списки листаются курсором (?cursor=), поля выбираются параметром
+fields=id,text. ETag строится из версий областей кэша лент (их
+увеличивают сигналы при любых изменениях), поэтому неизменившаяся
+лента отвечает 304 на If-None-Match без выборки постов и без шаблонов.
+Last-Modified не отдаётся: дата самой новой записи не меняется при
+правке или удалении, и If-Modified-Since получал бы 304 на устаревший
+список.
+"""
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from posts import cache
+from posts.feed import follow_feed
+from posts.models import Group, Post, User
+from posts.utils import KeysetPaginator, page_query
+from yatube.settings import POSTS_PER_PAGE
+from . import serializers
+
+
+def _json(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _error(message, status=400):
+    return _json({'detail': message}, status=status)
+
+
+def _link(request, cursor):
+    if not cursor:
+        return None
+    return request.build_absolute_uri('?' + page_query(request, cursor=cursor))
+
+
+def _list(request, queryset, fields):
+    fields = serializers.select(fields, request.GET.get('fields'))
+    if fields is None:
+        return _error('Неизвестное поле в параметре fields.')
+    page = KeysetPaginator(queryset, POSTS_PER_PAGE).get_page(
+        cursor=request.GET.get('cursor')
+    )
+    return _json({
+        'next': _link(request, page.next_cursor),
+        'previous': _link(request, page.previous_cursor),
+        'results': [
+            serializers.serialize(obj, fields, request) for obj in page
+        ],
+    })
+
+
+def _detail(request, obj, fields):
+    fields = serializers.select(fields, request.GET.get('fields'))
+    if fields is None:
+        return _error('Неизвестное поле в параметре fields.')
+    return _json(serializers.serialize(obj, fields, request))
+
+
+def _conditional(scopes):
+    """ETag из версий областей кэша."""
+    def etag(request, **kwargs):
+        return cache.feed_cache_key(request, *scopes(request, **kwargs))
+
+    return condition(etag_func=etag)
+
+
+def _login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Нужна авторизация.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _lookup_id(request, model, **filters):
+    """pk объекта; запоминается в запросе для ETag."""
+    key = (model, *filters.items())
+    found = request.__dict__.setdefault('_api_ids', {})
+    if key not in found:
+        found[key] = model.objects.filter(**filters).values_list(
+            'pk', flat=True
+        ).first()
+    if found[key] is None:
+        raise Http404
+    return found[key]
+
+
+def _group_id(request, slug):
+    return _lookup_id(request, Group, slug=slug)
+
+
+def _author_id(request, username):
+    return _lookup_id(request, User, username=username)
+
+
+@require_safe
+@_conditional(lambda request: [cache.ALL_POSTS])
+def post_list(request):
+    return _list(request, Post.objects.feed(), serializers.POST_FIELDS)
+
+
+@require_safe
+@_conditional(lambda request, post_id: [cache.post_scope(post_id)])
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return _detail(request, post, serializers.POST_FIELDS)
+
+
+@require_safe
+@_conditional(lambda request, post_id: [cache.post_scope(post_id)])
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = post.comments.select_related('author')
+    return _list(request, comments, serializers.COMMENT_FIELDS)
+
+
+@require_safe
+@_conditional(lambda request: [cache.ALL_POSTS])
+def group_list(request):
+    groups = Group.objects.order_by('pk')
+    return _list(request, groups, serializers.GROUP_FIELDS)
+
+
+@require_safe
+@_conditional(
+    lambda request, slug: [cache.group_scope(_group_id(request, slug))]
+)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _list(request, group.posts.feed(), serializers.POST_FIELDS)
+
+
+@require_safe
+def profile_detail(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return _detail(request, author, serializers.PROFILE_FIELDS)
+
+
+@require_safe
+@_conditional(
+    lambda request, username: [
+        cache.author_scope(_author_id(request, username))
+    ]
+)
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return _list(request, author.posts.feed(), serializers.POST_FIELDS)
+
+
+@require_safe
+@_login_required
+@_conditional(
+    lambda request: [cache.ALL_POSTS, cache.follow_scope(request.user.pk)]
+)
+def follow_posts(request):
+    posts = follow_feed(request.user).feed()
+    return _list(request, posts, serializers.POST_FIELDS)
@@ -0,0 +1,150 @@
+"""
+Двухуровневый кэш: L1 в памяти процесса с коротким TTL
+и L2 — общий кэш всех воркеров (memcached, redis или файлы).
+
+Запись идёт в оба уровня, чтение — сначала из L1. Изменение,
+сделанное другим воркером, видно здесь не позже LOCAL_TIMEOUT секунд.
+
+Здесь же стандартные бэкенды Django, считающие попадания для метрик.
+Двухуровневый кэш считает их сам, по итогу чтения: промах L1 и
+попадание в L2 — одно попадание, а не промах и попадание.
+"""
+from django.core.cache import caches
+from django.core.cache.backends import filebased, locmem, memcached
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+
+_MISSING = object()
+
+
+class MetricsMixin:
+    """Считает попадания и промахи кэша для метрик запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            metrics.record_cache(misses=1)
+            return default
+        metrics.record_cache(hits=1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Базовый get_many вызывает get, его обращения уже не считаются.
+        with metrics.paused():
+            found = super().get_many(keys, version=version)
+        metrics.record_cache(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+class LocMemCache(MetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(MetricsMixin, filebased.FileBasedCache):
+    pass
+
+
+class MemcachedCache(MetricsMixin, memcached.MemcachedCache):
+    pass
+
+
+class PyLibMCCache(MetricsMixin, memcached.PyLibMCCache):
+    pass
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _remember(self, key, value, version):
+        self.local.set(key, value, self.local_timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(key, value, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        with metrics.paused():
+            value = self.local.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                value = self.shared.get(key, _MISSING, version=version)
+                if value is not _MISSING:
+                    self._remember(key, value, version)
+        if value is _MISSING:
+            metrics.record_cache(misses=1)
+            return default
+        metrics.record_cache(hits=1)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(key, value, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self.local.delete(key, version=version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with metrics.paused():
+            found = self.local.get_many(keys, version=version)
+            missing = [key for key in keys if key not in found]
+            if missing:
+                fetched = self.shared.get_many(missing, version=version)
+                self.local.set_many(
+                    fetched, self.local_timeout, version=version
+                )
+                found.update(fetched)
+        metrics.record_cache(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self.local.set_many(
+            {key: value for key, value in data.items() if key not in failed},
+            self.local_timeout,
+            version=version,
+        )
+        return failed
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self.local.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        with metrics.paused():
+            return (
+                self.local.has_key(key, version=version)
+                or self.shared.has_key(key, version=version)
+            )
+
+    def incr(self, key, delta=1, version=None):
+        # Базовый incr читает значение через get, это не обращение.
+        with metrics.paused():
+            value = self.shared.incr(key, delta, version=version)
+        self._remember(key, value, version)
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
@@ -0,0 +1,92 @@
+"""
+Нормализация загруженных картинок.
+
+PostForm пропускает каждую новую картинку через normalize(): поворот
+по EXIF, уменьшение до IMAGE_MAX_SIZE, удаление метаданных и
+перекодирование в бюджет IMAGE_MAX_BYTES. JPEG, PNG и GIF остаются в
+своём формате и под своим именем, остальные форматы переводятся в PNG
+(если есть прозрачность) или JPEG. У анимированных картинок остаётся
+первый кадр: миниатюры всё равно строятся по нему.
+"""
+import os
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF')
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+# Какие сведения из image.info нужны для верного вида картинки.
+KEEP_INFO = ('transparency',)
+
+MIN_SIDE = 320
+
+SCALE_STEP = 0.75
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def _prepare(image, fmt):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        return image.convert('RGB')
+    if fmt == 'PNG' and image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+        return image.convert('RGBA')
+    return image
+
+
+def _save(image, fmt, quality):
+    buffer = BytesIO()
+    options = {'optimize': True}
+    if fmt == 'JPEG':
+        options.update(quality=quality, progressive=True)
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _encode(image, fmt):
+    """Байты картинки не больше бюджета, если это достижимо."""
+    qualities = settings.IMAGE_JPEG_QUALITY if fmt == 'JPEG' else (None,)
+    while True:
+        for quality in qualities:
+            data = _save(image, fmt, quality)
+            if len(data) <= settings.IMAGE_MAX_BYTES:
+                return data
+        width, height = image.size
+        if min(width, height) * SCALE_STEP < MIN_SIDE:
+            return data
+        image = image.resize(
+            (int(width * SCALE_STEP), int(height * SCALE_STEP)),
+            Image.LANCZOS,
+        )
+
+
+def normalize(upload):
+    """Новый загруженный файл вместо upload, приведённый к ограничениям."""
+    try:
+        upload.seek(0)
+        source = Image.open(upload)
+        source.seek(0)
+        image = ImageOps.exif_transpose(source)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise forms.ValidationError('Не удалось обработать картинку.')
+    fmt = source.format
+    if fmt not in KEEP_FORMATS:
+        fmt = 'PNG' if _has_alpha(image) else 'JPEG'
+    image.info = {
+        key: value for key, value in source.info.items() if key in KEEP_INFO
+    }
+    image.thumbnail(settings.IMAGE_MAX_SIZE, Image.LANCZOS)
+    data = _encode(_prepare(image, fmt), fmt)
+    name = upload.name
+    if fmt != source.format:
+        name = f'{os.path.splitext(name)[0]}.{EXTENSIONS[fmt]}'
+    return SimpleUploadedFile(name, data, content_type=Image.MIME[fmt])
@@ -0,0 +1,223 @@
+"""
+Хранилище метаданных sorl-thumbnail.
+
+Записи лежат в отдельном файле SQLite внутри MEDIA_ROOT — рядом с
+самими миниатюрами, так что индекс и файлы не расходятся. Перед ним
+стоит LRU в памяти процесса: шаблон, который ищет готовую миниатюру,
+обычно не доходит даже до файла. Промахи тоже запоминаются, но не
+дольше THUMBNAIL_LRU_TIMEOUT — миниатюру мог создать другой процесс.
+prefetch() загружает записи для всех картинок страницы одним запросом.
+
+Для вытеснения по давности в индексе хранится время, когда шаблон
+последний раз нашёл миниатюру, а для отчёта — число найденных и не
+найденных миниатюр.
+Оба пишутся не на каждое чтение, а пачкой раз в
+THUMBNAIL_INDEX_FLUSH_INTERVAL секунд.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kv_accessed ON kv (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+HITS = 'hits'
+MISSES = 'misses'
+
+# Больше параметров SQLite в одном запросе не принимает.
+CHUNK_SIZE = 500
+
+_MISSING = object()
+
+
+def index_path():
+    return settings.THUMBNAIL_INDEX_PATH or os.path.join(
+        settings.MEDIA_ROOT, '.thumbnails.sqlite3'
+    )
+
+
+class KVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._path = None
+        self._lru = OrderedDict()
+        self._touched = {}
+        self._counts = {HITS: 0, MISSES: 0}
+        self._flushed = time.monotonic()
+
+    def _connection(self):
+        path = index_path()
+        connections = self._local.__dict__.setdefault('connections', {})
+        if path not in connections:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(
+                path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            connections[path] = connection
+        with self._lock:
+            if self._path != path:
+                # Другой MEDIA_ROOT — другие миниатюры.
+                self._path = path
+                self._lru.clear()
+                self._touched.clear()
+        return connections[path]
+
+    def _cached(self, key):
+        with self._lock:
+            found = self._lru.get(key)
+            if found is None:
+                return _MISSING
+            value, expires = found
+            if expires < time.monotonic():
+                del self._lru[key]
+                return _MISSING
+            self._lru.move_to_end(key)
+            return value
+
+    def _remember(self, values):
+        expires = time.monotonic() + settings.THUMBNAIL_LRU_TIMEOUT
+        with self._lock:
+            for key, value in values.items():
+                self._lru[key] = (value, expires)
+                self._lru.move_to_end(key)
+            while len(self._lru) > settings.THUMBNAIL_LRU_SIZE:
+                self._lru.popitem(last=False)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+                self._touched.pop(key, None)
+
+    def record(self, image_file, hit):
+        """
+        Учитывает поиск готовой миниатюры шаблоном: для отчёта о
+        попаданиях и, если она нашлась, для вытеснения по давности.
+        """
+        with self._lock:
+            self._counts[HITS if hit else MISSES] += 1
+            if hit:
+                self._touched[add_prefix(image_file.key)] = time.time()
+        self.flush(force=False)
+
+    def flush(self, force=True):
+        """Пишет накопленные времена обращений и счётчики в индекс."""
+        with self._lock:
+            interval = settings.THUMBNAIL_INDEX_FLUSH_INTERVAL
+            if not force and time.monotonic() - self._flushed < interval:
+                return
+            touched, self._touched = self._touched, {}
+            counts = self._counts
+            self._counts = {HITS: 0, MISSES: 0}
+            self._flushed = time.monotonic()
+        connection = self._connection()
+        connection.executemany(
+            'UPDATE kv SET accessed = MAX(accessed, ?) WHERE key = ?',
+            [(accessed, key) for key, accessed in touched.items()],
+        )
+        connection.executemany(
+            'INSERT INTO stats (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+            list(counts.items()),
+        )
+
+    def stats(self):
+        self.flush()
+        return dict(self._connection().execute(
+            'SELECT name, value FROM stats'
+        ).fetchall())
+
+    def reset_stats(self):
+        self._connection().execute('DELETE FROM stats')
+
+    def _fetch(self, keys):
+        connection = self._connection()
+        found = dict.fromkeys(keys)
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            found.update(connection.execute(
+                f'SELECT key, value FROM kv WHERE key IN ({placeholders})',
+                chunk,
+            ))
+        self._remember(found)
+        return found
+
+    def prefetch(self, image_files):
+        """Загружает в LRU записи всех image_files одним запросом."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        missing = [key for key in keys if self._cached(key) is _MISSING]
+        if missing:
+            self._fetch(missing)
+
+    def _get_raw(self, key):
+        value = self._cached(key)
+        if value is _MISSING:
+            value = self._fetch([key])[key]
+        return value
+
+    def _set_raw(self, key, value):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO kv (key, value, accessed) '
+            'VALUES (?, ?, ?)',
+            (key, value, time.time()),
+        )
+        self._remember({key: value})
+
+    def _delete_raw(self, *keys):
+        keys = list(keys)
+        connection = self._connection()
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            connection.execute(
+                f'DELETE FROM kv WHERE key IN ({placeholders})', chunk
+            )
+        self._forget(keys)
+
+    def _find_keys_raw(self, prefix):
+        rows = self._connection().execute(
+            'SELECT key FROM kv WHERE substr(key, 1, ?) = ?',
+            (len(prefix), prefix),
+        )
+        return [key for key, in rows]
+
+    def least_recent(self, prefix, before):
+        """
+        Ключи с префиксом, не читанные с момента before, от давно
+        не читанных к недавним.
+        """
+        self.flush()
+        rows = self._connection().execute(
+            'SELECT key FROM kv WHERE substr(key, 1, ?) = ? '
+            'AND accessed < ? ORDER BY accessed',
+            (len(prefix), prefix, before),
+        )
+        return [key for key, in rows]
+
+    def clear(self):
+        self._connection().execute('DELETE FROM kv')
+        with self._lock:
+            self._lru.clear()
+            self._touched.clear()
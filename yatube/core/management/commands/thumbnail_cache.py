@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает объём и попадания кэша миниатюр и удаляет давно '
+        'не читанные миниатюры сверх бюджета.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--evict', action='store_true',
+            help='Удалить давно не читанные миниатюры сверх бюджета.',
+        )
+        parser.add_argument(
+            '--budget', type=int,
+            help='Бюджет в байтах (по умолчанию THUMBNAIL_DISK_BUDGET).',
+        )
+
+    def report(self):
+        usage = thumbnails.usage()
+        lookups = usage.get('hits', 0) + usage.get('misses', 0)
+        rate = usage.get('hits', 0) / lookups * 100 if lookups else 0
+        self.stdout.write(
+            f'Миниатюр: {usage["thumbnails"]}, '
+            f'на диске: {usage["bytes"] / 1024 / 1024:.1f} МБ, '
+            f'попаданий: {rate:.1f}% из {lookups}'
+        )
+
+    def handle(self, *args, **options):
+        self.report()
+        if not options['evict']:
+            return
+        budget = options['budget']
+        if budget is None:
+            budget = settings.THUMBNAIL_DISK_BUDGET
+        evicted, freed = thumbnails.evict(budget)
+        self.stdout.write(
+            f'Удалено миниатюр: {evicted}, '
+            f'освобождено: {freed / 1024 / 1024:.1f} МБ'
+        )
+        self.report()
@@ -0,0 +1,234 @@
+"""
+Метрики запросов в памяти процесса.
+
+MetricsMiddleware собирает для каждого запроса время ответа, число и
+время SQL-запросов, попадания и промахи кэша, время рендеринга шаблона
+и размер ответа. Значения копятся в гистограммах по имени
+представления и отдаются представлением core.views.metrics в текстовом
+формате Prometheus. У каждого воркера свои гистограммы.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100)
+BYTES = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+HISTOGRAMS = {
+    'request_duration_seconds': ('Время ответа', SECONDS),
+    'db_queries': ('Число SQL-запросов', QUERIES),
+    'db_duration_seconds': ('Время SQL-запросов', SECONDS),
+    'template_duration_seconds': ('Время рендеринга шаблона', SECONDS),
+    'response_size_bytes': ('Размер ответа', BYTES),
+}
+COUNTERS = {
+    'cache_hits_total': 'Попадания в кэш',
+    'cache_misses_total': 'Промахи кэша',
+}
+PREFIX = 'yatube_'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (граница, число наблюдений не больше неё)."""
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def observe(self, name, view, value):
+        with self._lock:
+            key = (name, view)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+            self.histograms[key].observe(value)
+
+    def inc(self, name, view, amount=1):
+        with self._lock:
+            self.counters[name, view] = (
+                self.counters.get((name, view), 0) + amount
+            )
+
+    def render(self):
+        """Текст в формате экспозиции Prometheus 0.0.4."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines += _header(name, help_text, 'histogram')
+                for (metric, view), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if metric == name:
+                        lines += _histogram_lines(name, view, histogram)
+            for name, help_text in COUNTERS.items():
+                lines += _header(name, help_text, 'counter')
+                for (metric, view), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(
+                            f'{PREFIX}{name}{{view="{_label(view)}"}} {value}'
+                        )
+        return '\n'.join(lines) + '\n'
+
+
+def _header(name, help_text, kind):
+    return [
+        f'# HELP {PREFIX}{name} {help_text}',
+        f'# TYPE {PREFIX}{name} {kind}',
+    ]
+
+
+def _label(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _number(value):
+    return '+Inf' if value == math.inf else repr(value)
+
+
+def _histogram_lines(name, view, histogram):
+    view = _label(view)
+    lines = [
+        f'{PREFIX}{name}_bucket{{view="{view}",le="{_number(bound)}"}} '
+        f'{count}'
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f'{PREFIX}{name}_sum{{view="{view}"}} {histogram.sum}')
+    lines.append(f'{PREFIX}{name}_count{{view="{view}"}} {histogram.count}')
+    return lines
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_time = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0
+
+
+_local = threading.local()
+
+
+def current():
+    return getattr(_local, 'request', None)
+
+
+def start():
+    _local.request = RequestMetrics()
+    return _local.request
+
+
+def stop():
+    _local.request = None
+
+
+@contextmanager
+def paused():
+    """Не учитывать операции внутри блока."""
+    state = current()
+    _local.request = None
+    try:
+        yield
+    finally:
+        _local.request = state
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper: время каждого запроса."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state = current()
+        if state is not None:
+            duration = time.perf_counter() - started
+            state.db_time += duration
+            state.queries.append((duration, sql))
+
+
+def record_cache(hits=0, misses=0):
+    state = current()
+    if state is not None:
+        state.cache_hits += hits
+        state.cache_misses += misses
+
+
+def record_template(duration):
+    state = current()
+    if state is not None:
+        state.template_time += duration
+
+
+def finish(state, view, size):
+    """Переносит счётчики запроса в гистограммы представления."""
+    duration = time.perf_counter() - state.started
+    registry.observe('request_duration_seconds', view, duration)
+    registry.observe('db_queries', view, len(state.queries))
+    registry.observe('db_duration_seconds', view, state.db_time)
+    registry.observe('template_duration_seconds', view, state.template_time)
+    if size is not None:
+        registry.observe('response_size_bytes', view, size)
+    registry.inc('cache_hits_total', view, state.cache_hits)
+    registry.inc('cache_misses_total', view, state.cache_misses)
+    if (
+        duration >= settings.METRICS_SLOW_REQUEST_SECONDS
+        and random.random() < settings.METRICS_SLOW_REQUEST_SAMPLE
+    ):
+        _log_slow(state, view, duration)
+
+
+def _log_slow(state, view, duration):
+    slowest = sorted(state.queries, reverse=True)[:5]
+    logger.warning(
+        'Медленный запрос %s: %.3f с, SQL %d за %.3f с, шаблон %.3f с\n%s',
+        view,
+        duration,
+        len(state.queries),
+        state.db_time,
+        state.template_time,
+        '\n'.join(f'{took:.4f} с: {sql}' for took, sql in slowest),
+    )
@@ -0,0 +1,61 @@
+"""
+Хранилище с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого с исходным расширением, в каталоге
+из upload_to: posts/<хэш>.jpg. Одинаковые загрузки ложатся в один
+файл, а так как sorl ищет миниатюры по имени оригинала, дубликаты
+делят и миниатюры. Файл пишется во временный и переименовывается,
+поэтому параллельная загрузка того же содержимого не портит его.
+Удаляет файлы не хранилище, а сборщик мусора (posts.media); повторная
+загрузка уже лежащего файла обновляет время его изменения, чтобы
+сборщик не удалил файл, на который сейчас сошлётся новый пост.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest.hexdigest() + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Имя {name} длиннее {max_length} символов.'
+            )
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+# Хранилище картинок постов; миниатюры ищутся по тому же классу.
+images_storage = ContentAddressedStorage()
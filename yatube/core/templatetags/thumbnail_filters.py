@@ -0,0 +1,40 @@
+from functools import partial
+
+from django import template
+
+from core import thumbnails
+from posts import cache
+from posts.models import Post
+
+
+register = template.Library()
+
+
+def _on_ready(image):
+    # Страницы, закэшированные с оригиналом, должны получить миниатюру.
+    post = getattr(image, 'instance', None)
+    if not isinstance(post, Post):
+        return None
+    return partial(cache.bump, *cache.post_scopes(post))
+
+
+@register.filter
+def thumbnail_url(image, geometry):
+    return thumbnails.thumbnail_url(image, geometry, _on_ready(image))
+
+
+@register.filter
+def thumbnail_srcset(image, geometry):
+    return thumbnails.srcset(image, geometry, callback=_on_ready(image))
+
+
+@register.filter
+def webp_srcset(image, geometry):
+    return thumbnails.srcset(image, geometry, 'WEBP', _on_ready(image))
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, geometry):
+    """Загружает метаданные миниатюр всех постов страницы разом."""
+    thumbnails.prefetch([post.image for post in posts], geometry)
+    return ''
@@ -1,6 +1,7 @@
 from django import template
 
-from posts.models import Post
+from posts import write_queue
+from posts.stats import author_stats
 
 
 register = template.Library()
@@ -13,4 +14,15 @@ def addclass(field, css):
 
 @register.filter
 def total_posts(author):
-    return Post.objects.filter(author=author).count()
+    return author_stats(author).posts_count
+
+
+@register.filter
+def total_comments(author):
+    return author_stats(author).comments_count
+
+
+@register.simple_tag
+def idempotency_key():
+    """Новый ключ для скрытого поля формы поста или комментария."""
+    return write_queue.new_key()
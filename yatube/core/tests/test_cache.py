@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core import metrics
+
+
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def two_tier(local_alias):
+    return {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'LOCAL': local_alias,
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 60,
+        },
+    }
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': settings.LOCMEM_CACHE},
+    'local_1': {'BACKEND': settings.LOCMEM_CACHE, 'LOCATION': 'local_1'},
+    'local_2': {'BACKEND': settings.LOCMEM_CACHE, 'LOCATION': 'local_2'},
+    # Файловый кэш заменяет в тестах общий memcached/redis.
+    'shared': {
+        'BACKEND': settings.SHARED_CACHE_BACKENDS['file'],
+        'LOCATION': TEMP_CACHE_DIR,
+    },
+    'worker_1': two_tier('local_1'),
+    'worker_2': two_tier('local_2'),
+})
+class TwoTierCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.worker_1 = caches['worker_1']
+        self.worker_2 = caches['worker_2']
+        self.worker_1.clear()
+        self.worker_2.clear()
+
+    def test_value_is_shared_between_workers(self):
+        """Запись одного воркера видна другому через общий уровень."""
+        self.worker_1.set('key', 'value')
+        self.assertEqual(self.worker_2.get('key'), 'value')
+        self.assertEqual(caches['local_2'].get('key'), 'value')
+
+    def test_local_tier_is_checked_first(self):
+        """Чтение из L1 не обращается к общему уровню."""
+        caches['local_1'].set('key', 'local')
+        caches['shared'].set('key', 'shared')
+        self.assertEqual(self.worker_1.get('key'), 'local')
+
+    def test_delete_and_incr_reach_shared_tier(self):
+        """Удаление и инкремент выполняются в общем уровне."""
+        self.worker_1.set('counter', 1)
+        self.assertEqual(self.worker_2.incr('counter'), 2)
+        self.assertEqual(caches['shared'].get('counter'), 2)
+        self.worker_2.delete('counter')
+        self.assertIsNone(caches['shared'].get('counter'))
+        self.assertIsNone(self.worker_2.get('counter'))
+        # Другой воркер видит старое значение до истечения LOCAL_TIMEOUT.
+        caches['local_1'].clear()
+        self.assertEqual(self.worker_1.get_many(['counter']), {})
+
+    def test_metrics_count_outer_lookup_once(self):
+        """Промах L1 и попадание в L2 считаются одним попаданием."""
+        self.worker_1.set('key', 'value')
+        self.worker_1.set('other', 'value')
+        caches['local_1'].clear()
+        state = metrics.start()
+        self.addCleanup(metrics.stop)
+        self.worker_1.get('key')
+        self.worker_1.get('missing')
+        self.worker_1.get_many(['other', 'absent'])
+        self.assertEqual((state.cache_hits, state.cache_misses), (2, 2))
@@ -0,0 +1,59 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import images
+
+
+def upload(name, fmt, size=(64, 48), mode='RGB', **options):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, fmt, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def opened(result):
+    result.seek(0)
+    return Image.open(BytesIO(result.read()))
+
+
+class NormalizeTest(TestCase):
+    @override_settings(IMAGE_MAX_SIZE=(32, 32))
+    def test_large_image_is_scaled_down(self):
+        """Картинка уменьшается до IMAGE_MAX_SIZE с сохранением пропорций."""
+        result = images.normalize(upload('photo.jpg', 'JPEG'))
+        self.assertEqual(opened(result).size, (32, 24))
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_exif_is_stripped(self):
+        """Метаданные не попадают в сохранённый файл."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        exif[0x0112] = 6
+        result = images.normalize(
+            upload('photo.jpg', 'JPEG', exif=exif.tobytes())
+        )
+        image = opened(result)
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(image.size, (48, 64))
+
+    def test_unknown_format_is_converted(self):
+        """BMP становится JPEG, прозрачный TIFF — PNG."""
+        result = images.normalize(upload('scan.bmp', 'BMP'))
+        self.assertEqual(result.name, 'scan.jpg')
+        self.assertEqual(opened(result).format, 'JPEG')
+        result = images.normalize(upload('logo.tiff', 'TIFF', mode='RGBA'))
+        self.assertEqual(result.name, 'logo.png')
+
+    @override_settings(IMAGE_MAX_BYTES=2000)
+    def test_size_budget(self):
+        """Шумная картинка перекодируется в бюджет по байтам."""
+        noise = Image.effect_noise((1200, 1200), 100).convert('RGB')
+        buffer = BytesIO()
+        noise.save(buffer, 'JPEG', quality=95)
+        result = images.normalize(
+            SimpleUploadedFile('noise.jpg', buffer.getvalue())
+        )
+        self.assertLess(result.size, len(buffer.getvalue()))
+        self.assertGreaterEqual(min(opened(result).size), images.MIN_SIDE)
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from core import thumbnails
+from core.kvstore import KVStore
+from posts.models import Post, User
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_PREGENERATE_WORKERS=0,
+)
+class ThumbnailIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.clear()
+        self.posts = []
+        for index in range(3):
+            content = SMALL_GIF.replace(b'\x0C', bytes([index]))
+            self.posts.append(Post.objects.create(
+                text='Пост с картинкой',
+                author=self.user,
+                image=SimpleUploadedFile('small.gif', content, 'image/gif'),
+            ))
+            thumbnails.generate(self.posts[-1].image.name)
+
+    def test_prefetch_reads_index_once(self):
+        """Метаданные всей страницы читаются одним запросом."""
+        kvstore = KVStore()
+        statements = []
+        kvstore._connection().set_trace_callback(statements.append)
+        images = [post.image for post in self.posts]
+        with mock.patch.object(default, 'kvstore', kvstore):
+            thumbnails.prefetch(images, '960x339')
+            urls = [
+                thumbnails.thumbnail_url(image, '960x339') for image in images
+            ]
+            sets = [thumbnails.srcset(image, '960x339') for image in images]
+        selects = [sql for sql in statements if sql.startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        for image, url, srcset in zip(images, urls, sets):
+            self.assertNotEqual(url, image.url)
+            self.assertEqual(len(srcset.split(', ')), 3)
+
+    @override_settings(THUMBNAIL_EVICT_IDLE=-60)
+    def test_evict_to_budget(self):
+        """Вытесняются давно не читанные миниатюры, пока не уложатся."""
+        fresh = self.posts[0].image
+        options = settings.THUMBNAIL_PREGENERATE_SIZES['960x339']
+        thumbnail = default.backend.lookup_thumbnail(
+            fresh, '960x339', **options
+        )
+        default.kvstore.flush()
+        before = thumbnails.usage()
+        self.assertEqual(before['thumbnails'], 9)
+        budget = thumbnail.storage.size(thumbnail.name)
+        evicted, freed = thumbnails.evict(budget)
+        after = thumbnails.usage()
+        self.assertLessEqual(after['bytes'], budget)
+        self.assertEqual(evicted, 9 - after['thumbnails'])
+        self.assertEqual(freed, before['bytes'] - after['bytes'])
+        self.assertNotEqual(
+            thumbnails.thumbnail_url(fresh, '960x339'), fresh.url
+        )
+        with mock.patch('django.db.transaction.on_commit'):
+            self.assertEqual(
+                thumbnails.thumbnail_url(self.posts[1].image, '960x339'),
+                self.posts[1].image.url,
+            )
+
+    def test_recently_read_thumbnails_are_kept(self):
+        """Недавно прочитанные миниатюры могут быть в кэше страниц."""
+        before = thumbnails.usage()
+        self.assertEqual(thumbnails.evict(0), (0, 0))
+        self.assertEqual(thumbnails.usage()['bytes'], before['bytes'])
+
+    def test_command_reports_hit_rate(self):
+        """Команда показывает долю найденных миниатюр."""
+        default.kvstore.reset_stats()
+        thumbnails.thumbnail_url(self.posts[0].image, '960x339')
+        out = StringIO()
+        call_command('thumbnail_cache', stdout=out)
+        self.assertIn('Миниатюр: 9', out.getvalue())
+        self.assertIn('попаданий: 100.0% из 1', out.getvalue())
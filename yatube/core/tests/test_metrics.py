@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+
+User = get_user_model()
+
+
+class HistogramTest(TestCase):
+    def test_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные, последняя — +Inf."""
+        histogram = metrics.Histogram((1, 5))
+        for value in (0.5, 3, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.cumulative()),
+            [(1, 1), (5, 3), (float('inf'), 4)],
+        )
+        self.assertEqual((histogram.sum, histogram.count), (16.5, 4))
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+
+    def setUp(self):
+        self.client = Client(REMOTE_ADDR='10.0.0.1')
+        metrics.registry.reset()
+        cache.clear()
+
+    def metrics_text(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_is_recorded_by_view(self):
+        """Запрос попадает в гистограммы своего представления."""
+        self.client.get(reverse('posts:index'))
+        text = self.metrics_text()
+        view = 'view="posts:index"'
+        self.assertIn(
+            f'yatube_request_duration_seconds_count{{{view}}} 1', text
+        )
+        self.assertIn(f'yatube_db_queries_count{{{view}}} 1', text)
+        self.assertIn(f'yatube_response_size_bytes_count{{{view}}} 1', text)
+        histogram = metrics.registry.histograms[
+            'template_duration_seconds', 'posts:index'
+        ]
+        self.assertGreater(histogram.sum, 0)
+        self.assertGreater(
+            metrics.registry.counters['cache_misses_total', 'posts:index'], 0
+        )
+
+    def test_endpoint_requires_staff_or_internal_ip(self):
+        """Метрики закрыты для посторонних."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        internal = Client(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(internal.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(
+        METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SLOW_REQUEST_SAMPLE=1
+    )
+    def test_slow_request_is_logged_with_sql(self):
+        """Медленный запрос пишется в журнал вместе с SQL."""
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
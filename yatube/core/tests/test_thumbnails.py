@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from core import thumbnails
+from core.templatetags import thumbnail_filters
+from posts import cache
+from posts.models import Post, User
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_PREGENERATE_WORKERS=0,
+)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_missing_thumbnail_falls_back_to_original(self):
+        """Без готовой миниатюры выводится оригинал, ресайз уходит в пул."""
+        with mock.patch('core.thumbnails.schedule') as schedule, \
+                mock.patch('django.db.transaction.on_commit') as on_commit:
+            url = thumbnails.thumbnail_url(self.post.image, '960x339')
+            schedule.assert_not_called()
+            on_commit.call_args[0][0]()
+        self.assertEqual(url, self.post.image.url)
+        schedule.assert_called_once_with(self.post.image.name, None)
+
+    def test_thumbnail_ordered_by_template_refreshes_pages(self):
+        """Миниатюра, заказанная шаблоном, сбрасывает страницы поста."""
+        scope = cache.post_scope(self.post.pk)
+        before = cache.versions(scope)
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            url = thumbnail_filters.thumbnail_url(self.post.image, '960x339')
+            self.assertEqual(cache.versions(scope), before)
+            on_commit.call_args[0][0]()
+        self.assertEqual(url, self.post.image.url)
+        self.assertNotEqual(cache.versions(scope), before)
+        self.assertNotEqual(
+            thumbnail_filters.thumbnail_url(self.post.image, '960x339'),
+            self.post.image.url,
+        )
+
+    def test_pregenerated_thumbnail_is_used(self):
+        """После генерации шаблон получает адрес миниатюры."""
+        callback = mock.Mock()
+        thumbnails.generate(self.post.image.name, callback)
+        callback.assert_called_once_with()
+        url = thumbnails.thumbnail_url(self.post.image, '960x339')
+        self.assertNotEqual(url, self.post.image.url)
+        self.assertTrue(url.startswith(settings.MEDIA_URL + 'cache/'))
+
+    def test_removed_source_is_skipped(self):
+        """Для удалённой картинки sorl не вызывается и не ставит ошибку."""
+        name = self.post.image.name
+        self.post.image.storage.delete(name)
+        with mock.patch('core.thumbnails.get_thumbnail') as get_thumbnail:
+            thumbnails.generate(name)
+        get_thumbnail.assert_not_called()
+        self.assertFalse(thumbnails.cache.get(thumbnails._failed_key(name)))
+
+    def test_srcset_lists_ready_widths(self):
+        """srcset перечисляет готовые миниатюры с их настоящей шириной."""
+        with mock.patch('django.db.transaction.on_commit'):
+            self.assertEqual(
+                thumbnails.srcset(self.post.image, '960x339'), ''
+            )
+        thumbnails.generate(self.post.image.name)
+        candidates = thumbnails.srcset(self.post.image, '960x339').split(', ')
+        self.assertEqual(
+            [candidate.split()[1] for candidate in candidates],
+            ['480w', '960w', '2w'],
+        )
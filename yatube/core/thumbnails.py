@@ -0,0 +1,278 @@
+"""
+Заблаговременная генерация миниатюр.
+
+Миниатюры всех размеров из THUMBNAIL_PREGENERATE_SIZES создаются
+после сохранения картинки, при THUMBNAIL_WEBP — ещё и копии в WebP.
+В веб-сервере их делает пул потоков (start_pool вызывается из
+yatube.wsgi), в тестах и командах — сам вызов schedule(), чтобы
+запись в MEDIA_ROOT не продолжалась после их окончания. Шаблоны
+только ищут готовую миниатюру и, пока её нет, показывают оригинал —
+ресайза в запросе нет. Для srcset берутся лишь
+уже созданные ширины из THUMBNAIL_SRCSET. Метаданные миниатюр хранит
+core.kvstore; evict() удаляет давно не читанные миниатюры, пока они
+не уложатся в бюджет на диске.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+
+from .storage import images_storage
+
+
+logger = logging.getLogger(__name__)
+
+FAILED_TIMEOUT = 60 * 60
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, как его назовёт get_thumbnail, без обращений."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None; сама миниатюра не создаётся."""
+        thumbnail_file = self.thumbnail_file(file_, geometry_string, **options)
+        thumbnail = default.kvstore.get(thumbnail_file)
+        record = getattr(default.kvstore, 'record', None)
+        if record is not None:
+            record(thumbnail_file, thumbnail is not None)
+        return thumbnail
+
+
+def _failed_key(name):
+    return f'thumbnails:failed:{name}'
+
+
+def _variants():
+    formats = [None]
+    if settings.THUMBNAIL_WEBP:
+        formats.append('WEBP')
+    for geometry, options in settings.THUMBNAIL_PREGENERATE_SIZES.items():
+        for fmt in formats:
+            yield geometry, dict(options, format=fmt) if fmt else options
+
+
+def generate(name, callback=None):
+    """Создаёт миниатюры всех настроенных размеров и форматов."""
+    close_old_connections()
+    try:
+        if not images_storage.exists(name):
+            # Картинку удалили, пока задача ждала в очереди.
+            return
+        source = ImageFile(name, images_storage)
+        for geometry, options in _variants():
+            get_thumbnail(source, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        cache.set(_failed_key(name), True, FAILED_TIMEOUT)
+    else:
+        if callback is not None:
+            callback()
+    finally:
+        with _lock:
+            _pending.discard(name)
+        close_old_connections()
+
+
+def start_pool():
+    """Включает пул из THUMBNAIL_PREGENERATE_WORKERS потоков."""
+    global _executor
+    with _lock:
+        if _executor is None and settings.THUMBNAIL_PREGENERATE_WORKERS:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_PREGENERATE_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def schedule(name, callback=None):
+    """Отдаёт картинку пулу, если она ещё не в работе."""
+    if not name or cache.get(_failed_key(name)):
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if _executor is not None:
+        _executor.submit(generate, name, callback)
+    else:
+        generate(name, callback)
+
+
+def pregenerate(image, callback=None):
+    """Планирует генерацию после фиксации транзакции с картинкой."""
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: schedule(name, callback))
+
+
+def thumbnail_url(image, geometry, callback=None):
+    """
+    Адрес готовой миниатюры, иначе адрес оригинала. callback
+    вызывается, когда запланированные миниатюры готовы.
+    """
+    if not image:
+        return ''
+    options = dict(settings.THUMBNAIL_PREGENERATE_SIZES[geometry])
+    thumbnail = default.backend.lookup_thumbnail(image, geometry, **options)
+    if thumbnail is None:
+        name = image.name
+        transaction.on_commit(lambda: schedule(name, callback))
+        return image.url
+    return thumbnail.url
+
+
+def _srcset_options(geometry, fmt):
+    for size in settings.THUMBNAIL_SRCSET[geometry]:
+        options = dict(settings.THUMBNAIL_PREGENERATE_SIZES[size])
+        if fmt:
+            options['format'] = fmt
+        yield size, options
+
+
+def prefetch(images, geometry):
+    """
+    Загружает метаданные миниатюр всех картинок страницы одним
+    запросом, чтобы thumbnail_url и srcset не ходили в индекс поштучно.
+    """
+    load = getattr(default.kvstore, 'prefetch', None)
+    images = [image for image in images if image]
+    if load is None or not images:
+        return
+    variants = [(geometry, settings.THUMBNAIL_PREGENERATE_SIZES[geometry])]
+    variants += _srcset_options(geometry, None)
+    if settings.THUMBNAIL_WEBP:
+        variants += _srcset_options(geometry, 'WEBP')
+    load([
+        default.backend.thumbnail_file(image, size, **options)
+        for image in images
+        for size, options in variants
+    ])
+
+
+def srcset(image, geometry, fmt=None, callback=None):
+    """
+    Значение srcset из готовых миниатюр для размера geometry.
+
+    Ширина каждой берётся из самой миниатюры: без upscale она может
+    оказаться меньше заявленной в геометрии. callback — как в
+    thumbnail_url.
+    """
+    if not image or (fmt == 'WEBP' and not settings.THUMBNAIL_WEBP):
+        return ''
+    candidates = []
+    missing = False
+    for size, options in _srcset_options(geometry, fmt):
+        thumbnail = default.backend.lookup_thumbnail(image, size, **options)
+        if thumbnail is None:
+            missing = True
+        else:
+            candidates.append(f'{thumbnail.url} {thumbnail.width}w')
+    if missing:
+        name = image.name
+        transaction.on_commit(lambda: schedule(name, callback))
+    return ', '.join(candidates)
+
+
+def _sources(kvstore):
+    """Ключ оригинала для каждой миниатюры из индекса."""
+    sources = {}
+    for source_key in kvstore._find_keys(identity='thumbnails'):
+        for key in kvstore._get(source_key, identity='thumbnails') or []:
+            sources[key] = source_key
+    return sources
+
+
+def _sizes(kvstore, keys):
+    sizes = {}
+    for key in keys:
+        thumbnail = kvstore._get(key)
+        if thumbnail is None:
+            continue
+        try:
+            sizes[key] = (thumbnail, thumbnail.storage.size(thumbnail.name))
+        except OSError:
+            sizes[key] = (thumbnail, 0)
+    return sizes
+
+
+def usage():
+    """Число миниатюр, их объём на диске и статистика поиска."""
+    kvstore = default.kvstore
+    sizes = _sizes(kvstore, _sources(kvstore))
+    return {
+        'thumbnails': len(sizes),
+        'bytes': sum(size for _, size in sizes.values()),
+        **kvstore.stats(),
+    }
+
+
+def evict(budget):
+    """
+    Удаляет давно не читанные миниатюры, пока остальные занимают больше
+    budget байт. Удалённая миниатюра создастся снова при следующем
+    рендере. Миниатюры, прочитанные за THUMBNAIL_EVICT_IDLE, не
+    удаляются: на них ещё ссылается закэшированный HTML, поэтому бюджет
+    может остаться превышенным. Возвращает пару (удалено, освобождено
+    байт).
+    """
+    kvstore = default.kvstore
+    sources = _sources(kvstore)
+    before = time.time() - settings.THUMBNAIL_EVICT_IDLE
+    order = [
+        del_prefix(key)
+        for key in kvstore.least_recent(add_prefix(''), before)
+    ]
+    sizes = _sizes(kvstore, [key for key in order if key in sources])
+    total = sum(size for _, size in sizes.values())
+    evicted = defaultdict(set)
+    freed = 0
+    for key in order:
+        if total <= budget:
+            break
+        if key not in sizes:
+            continue
+        thumbnail, size = sizes[key]
+        thumbnail.delete()
+        kvstore._delete(key)
+        evicted[sources[key]].add(key)
+        total -= size
+        freed += size
+    for source_key, keys in evicted.items():
+        remaining = [
+            key
+            for key in kvstore._get(source_key, identity='thumbnails') or []
+            if key not in keys
+        ]
+        if remaining:
+            kvstore._set(source_key, remaining, identity='thumbnails')
+        else:
+            kvstore._delete(source_key, identity='thumbnails')
+    return sum(map(len, evicted.values())), freed
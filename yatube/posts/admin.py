@@ -1,10 +1,37 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'post', 'author', 'text', 'created')
+class IndexedSearchMixin:
+    """Поиск в админке по полнотекстовому индексу вместо LIKE."""
+    search_kind = None
+    search_limit = 500
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        hits, next_cursor = search.search(
+            search_term, kind=self.search_kind, limit=self.search_limit
+        )
+        if next_cursor is not None:
+            self.message_user(
+                request,
+                f'Показаны {self.search_limit} самых релевантных '
+                f'совпадений, уточните запрос.',
+                messages.WARNING,
+            )
+        ids = [hit.object_id for hit in hits]
+        return queryset.filter(pk__in=ids), False
+
+
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = search.COMMENT
+    list_display = ('pk', 'post', 'author', 'text', 'created', 'parent')
+    readonly_fields = ('parent',)
     search_fields = ('text',)
     list_filter = ('created',)
 
@@ -13,7 +40,8 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = search.POST
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
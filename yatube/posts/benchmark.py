@@ -0,0 +1,313 @@
+"""
+Нагрузочные прогоны страниц постов.
+
+generate_content наполняет базу синтетическими данными, benchmark
+запрашивает каждую страницу с заданной параллельностью через тестовый
+клиент Django или по HTTP у запущенного сервера и сводит задержки
+p50/p95/p99 и число SQL-запросов. Сводку можно сохранить в JSON
+и сравнить с прошлым прогоном.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import transfer
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+METRICS = ('p50', 'p95', 'p99', 'queries')
+
+
+class Generator:
+    """
+    Синтетические пользователи, группы, подписки, посты и комментарии.
+
+    Записи идут через transfer.Importer, поэтому счётчики, ленты и
+    поисковый индекс обновляются так же, как при обычном импорте.
+    Популярность авторов распределена по Парето: у немногих авторов
+    большинство подписчиков и постов.
+    """
+
+    def __init__(self, seed=0, batch_size=1000, days=365):
+        from faker import Faker
+
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.batch_size = batch_size
+        self.days = days
+
+    def _import(self, model, records):
+        importer = transfer.Importer(model)
+        for chunk in transfer.chunks(records, self.batch_size):
+            importer.import_chunk(chunk)
+        return importer.created
+
+    def _popular(self, names):
+        index = int(self.random.paretovariate(1.2)) - 1
+        return names[min(index, len(names) - 1)]
+
+    def users(self, count):
+        start = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        password = make_password(None)
+        users = (
+            User(
+                username=f'bench{number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            )
+            for number in range(start, start + count)
+        )
+        for chunk in transfer.chunks(users, self.batch_size):
+            User.objects.bulk_create(chunk)
+        return [f'bench{number}' for number in range(start, start + count)]
+
+    def groups(self, count):
+        slugs = [f'bench-{number}' for number in range(count)]
+        self._import('group', (
+            {
+                'slug': slug,
+                'title': self.faker.catch_phrase()[:200],
+                'description': self.faker.paragraph(),
+            }
+            for slug in slugs
+        ))
+        return slugs
+
+    def follows(self, usernames, per_user):
+        return self._import('follow', (
+            {'user': user, 'author': self._popular(usernames)}
+            for user in usernames
+            for _ in range(per_user)
+        ))
+
+    def posts(self, usernames, slugs, count):
+        start = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        now = timezone.now()
+        step = timedelta(days=self.days) / max(count, 1)
+        records = (
+            {
+                'id': post_id,
+                'text': self.faker.paragraph(nb_sentences=5),
+                'pub_date': (
+                    now - step * (start + count - post_id)
+                ).isoformat(),
+                'author': self._popular(usernames),
+                'group': (
+                    self.random.choice(slugs)
+                    if slugs and self.random.random() < 0.7 else None
+                ),
+                'image': None,
+            }
+            for post_id in range(start, start + count)
+        )
+        self._import('post', records)
+        return range(start, start + count)
+
+    def comments(self, usernames, post_ids, count, replies=0.3):
+        """Комментарии; доля replies — ответы на ранее созданные."""
+        start = (Comment.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        now = timezone.now().isoformat()
+        created = []
+
+        def records():
+            for comment_id in range(start, start + count):
+                parent = None
+                if created and self.random.random() < replies:
+                    parent, post_id = self.random.choice(created)
+                else:
+                    post_id = self.random.choice(post_ids)
+                created.append((comment_id, post_id))
+                yield {
+                    'id': comment_id,
+                    'post': post_id,
+                    'author': self.random.choice(usernames),
+                    'text': self.faker.sentence(),
+                    'created': now,
+                    'parent': parent,
+                }
+
+        return self._import('comment', records())
+
+
+def scenarios():
+    """
+    Страницы для прогона: имя → (адрес, нужен ли вход, настройки на
+    время прогона, только для тестового клиента). post_detail без
+    счётчика просмотров показывает, сколько стоит подсчёт.
+    """
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    author = AuthorStats.objects.select_related('author').order_by(
+        '-posts_count'
+    ).first()
+    post = Post.objects.order_by('-pub_date').first()
+    found = {
+        'index': (reverse('posts:index'), False, {}),
+        'index_page_3': (reverse('posts:index') + '?page=3', False, {}),
+        'follow_index': (reverse('posts:follow_index'), True, {}),
+    }
+    if group:
+        found['group_posts'] = (
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            False,
+            {},
+        )
+    if author:
+        found['profile'] = (reverse(
+            'posts:profile', kwargs={'username': author.author.username}
+        ), False, {})
+    if post:
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        found['post_detail'] = (url, False, {})
+        found['post_detail_uncounted'] = (url, False, {'VIEW_COUNTS': False})
+    return found
+
+
+def busiest_reader():
+    """Пользователь с наибольшим числом подписок."""
+    row = Follow.objects.values('user').annotate(
+        total=Count('pk')
+    ).order_by('-total').first()
+    return User.objects.get(pk=row['user']) if row else None
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _fetcher(url, user, base_url):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    if base_url is None:
+        return lambda: client.get(url).status_code
+    import requests
+
+    session = requests.Session()
+    session.cookies.update({
+        name: morsel.value for name, morsel in client.cookies.items()
+    })
+    return lambda: session.get(base_url + url).status_code
+
+
+def _worker(url, count, user, base_url, cold, samples, lock):
+    fetch = _fetcher(url, user, base_url)
+    counter = QueryCounter()
+    results = []
+    with connection.execute_wrapper(counter):
+        for _ in range(count):
+            if cold:
+                cache.clear()
+            counter.count = 0
+            started = time.perf_counter()
+            status = fetch()
+            results.append((
+                time.perf_counter() - started,
+                None if base_url else counter.count,
+                status,
+            ))
+    with lock:
+        samples.extend(results)
+
+
+def run(url, requests, concurrency=1, user=None, base_url=None, cold=False):
+    """Выполняет requests запросов к url; каждый — (время, SQL, код)."""
+    samples = []
+    lock = threading.Lock()
+    per_worker = [
+        requests // concurrency + (worker < requests % concurrency)
+        for worker in range(concurrency)
+    ]
+    if concurrency == 1:
+        _worker(url, requests, user, base_url, cold, samples, lock)
+        return samples
+
+    def target(count):
+        try:
+            _worker(url, count, user, base_url, cold, samples, lock)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=target, args=(count,))
+        for count in per_worker
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    else:
+        cuts = latencies * 99
+    queries = [sample[1] for sample in samples if sample[1] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[2] >= 400),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50': round(cuts[49], 2),
+        'p95': round(cuts[94], 2),
+        'p99': round(cuts[98], 2),
+        'queries': max(queries) if queries else None,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Строки (сценарий, метрика, было, стало, изменение %, хуже ли)."""
+    rows = []
+    for name, summary in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in METRICS:
+            before, after = old.get(metric), summary.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0
+            rows.append((
+                name, metric, before, after, change, change > threshold
+            ))
+    return rows
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)['results']
+
+
+def save_baseline(path, results, options):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump({
+            'created': timezone.now().isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'options': options,
+            'results': results,
+        }, stream, ensure_ascii=False, indent=2)
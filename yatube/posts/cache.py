@@ -0,0 +1,128 @@
+"""
+Версионированные ключи для кэша лент.
+
+Каждая область (все посты, группа, автор, лента подписок читателя)
+хранит в кэше номер версии. Сигналы увеличивают версию при изменении
+данных, поэтому старые фрагменты просто перестают запрашиваться и
+вытесняются кэшем сами.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from .models import Comment, GroupAuthor, Post
+
+
+ALL_POSTS = 'posts'
+
+TRENDING = 'trending'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def followers_scope(author_id):
+    return f'followers:{author_id}'
+
+
+def _version_key(scope):
+    return f'feed:version:{scope}'
+
+
+def _initial_version():
+    # Версия после вытеснения из кэша не должна совпасть со старой.
+    return time.time_ns()
+
+
+def versions(*scopes):
+    """Текущие версии областей, недостающие создаются."""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все фрагменты, зависящие от областей."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+
+
+def post_scopes(post, group_ids=()):
+    """Области, в которых выводится пост."""
+    scopes = {ALL_POSTS, author_scope(post.author_id), post_scope(post.pk)}
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    return scopes
+
+
+def author_group_scopes(author_id):
+    """Области групп, в которых есть посты автора."""
+    group_ids = GroupAuthor.objects.filter(
+        author_id=author_id
+    ).values_list('group_id', flat=True)
+    return sorted(group_scope(group_id) for group_id in group_ids)
+
+
+def user_scopes(user_id):
+    """
+    Области, где выводится имя пользователя: группы его постов и
+    посты с его комментариями.
+    """
+    post_ids = (
+        Comment.objects.filter(author_id=user_id)
+        .values_list('post_id', flat=True)
+        .distinct()
+    )
+    return (
+        set(author_group_scopes(user_id))
+        | {post_scope(post_id) for post_id in post_ids}
+    )
+
+
+def group_post_scopes(group_id):
+    """Области постов группы и их авторов."""
+    scopes = set()
+    rows = Post.objects.filter(group_id=group_id).values_list(
+        'pk', 'author_id'
+    )
+    for post_id, author_id in rows.iterator():
+        scopes.add(post_scope(post_id))
+        scopes.add(author_scope(author_id))
+    return scopes
+
+
+def feed_cache_key(request, *scopes):
+    """
+    Ключ фрагмента ленты: представление, страница или курсор,
+    зритель и версии областей, от которых зависит содержимое.
+    """
+    parts = [
+        request.resolver_match.view_name,
+        request.get_full_path(),
+        str(request.user.pk or 0),
+        *map(str, versions(*scopes)),
+    ]
+    return hashlib.md5(':'.join(parts).encode()).hexdigest()
@@ -0,0 +1,195 @@
+"""
+Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков автора (fan-out on
+write), поэтому чтение ленты — один проход по индексу FeedEntry.
+Посты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+не раскладываются, а подмешиваются при чтении (fan-out on read).
+Когда такой автор теряет подписчиков и возвращается под предел, его
+посты раскладываются по лентам всех подписчиков заново: ни посты,
+ни подписки этого периода в FeedEntry не попали.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from . import follow_graph
+from .models import FeedEntry, Follow, Post
+
+
+BATCH_SIZE = 500
+
+
+def pull_authors(author_ids):
+    """Возвращает авторов, чьи посты подмешиваются при чтении ленты."""
+    return [
+        author_id
+        for author_id, followers in follow_graph.follower_counts(
+            author_ids
+        ).items()
+        if followers > settings.FEED_FANOUT_LIMIT
+    ]
+
+
+def _is_pulled(author_id):
+    """
+    Та же проверка по базе. Её делают сигналы подписки: кэш графа
+    в их транзакции сброшен, и чтение положило бы в него ещё не
+    зафиксированное число подписчиков.
+    """
+    return Follow.objects.filter(
+        author_id=author_id
+    ).count() > settings.FEED_FANOUT_LIMIT
+
+
+def _bulk_create(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if pull_authors([post.author_id]):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_create(
+        FeedEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку постов по лентам подписчиков их авторов."""
+    authors = {post.author_id for post in posts}
+    authors -= set(pull_authors(list(authors)))
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(author_id__in=authors).values_list(
+        'author_id', 'user_id'
+    )
+    for author_id, user_id in follows.iterator(chunk_size=BATCH_SIZE):
+        followers[author_id].append(user_id)
+    _bulk_create(
+        FeedEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+        for user_id in followers[post.author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту постами автора после подписки на него."""
+    if _is_pulled(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _bulk_create(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def backfill_many(pairs):
+    """Заполняет ленты после пачки подписок (подписчик, автор)."""
+    followers = defaultdict(list)
+    for user_id, author_id in pairs:
+        followers[author_id].append(user_id)
+    for author_id in pull_authors(list(followers)):
+        del followers[author_id]
+    posts = defaultdict(list)
+    rows = Post.objects.filter(author_id__in=list(followers)).values_list(
+        'author_id', 'pk', 'pub_date'
+    )
+    for author_id, post_id, pub_date in rows.iterator(chunk_size=BATCH_SIZE):
+        posts[author_id].append((post_id, pub_date))
+    for author_id, user_ids in followers.items():
+        _bulk_create(
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for post_id, pub_date in posts[author_id]
+        )
+
+
+def catch_up(author_id):
+    """
+    Раскладывает посты автора по лентам подписчиков, если после
+    отписки он перестал подмешиваться при чтении.
+    """
+    if Follow.objects.filter(
+        author_id=author_id
+    ).count() != settings.FEED_FANOUT_LIMIT:
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list('pk', 'pub_date')
+    )
+    followers = list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+    for start in range(0, len(followers), BATCH_SIZE):
+        _bulk_create(
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in followers[start:start + BATCH_SIZE]
+            for post_id, pub_date in posts
+        )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя с нуля."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    backfill_many((user_id, author_id) for author_id in authors)
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан пользователь."""
+    if not settings.FOLLOW_FEED_MATERIALIZED:
+        return Post.objects.filter(author__following__user=user)
+    pulled = pull_authors(list(follow_graph.following(user.pk)))
+    if not pulled:
+        # Ключ сортировки берётся из FeedEntry, чтобы идти по её индексу.
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        ).order_by('-feed_date', '-feed_post')
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(Q(pk__in=entries) | Q(author_id__in=pulled))
@@ -0,0 +1,180 @@
+"""
+RSS и Atom для главной, групп и авторов.
+
+Документ ленты сериализуется один раз на версию областей кэша
+(posts.cache) и хранится в кэше целиком, вместе с датой самой новой
+записи. Опрос неизменившейся ленты — чтение версий и документа из
+кэша, а с If-Modified-Since или If-None-Match — ответ 304 без тела.
+"""
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache as django_cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from . import cache
+from .models import Group, Post
+
+
+User = get_user_model()
+
+
+class CachedFeed(Feed):
+    """Лента постов с кэшированием готового документа."""
+
+    def scopes(self, obj):
+        return [cache.ALL_POSTS]
+
+    def _cache_key(self, request, obj):
+        # Ссылки в документе абсолютные, поэтому в ключе и хост.
+        parts = [
+            request.get_host(),
+            request.path,
+            *map(str, cache.versions(*self.scopes(obj))),
+        ]
+        digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+        return f'syndication:{digest}'
+
+    def _document(self, request, obj):
+        feedgen = self.get_feed(obj, request)
+        latest = timegm(feedgen.latest_post_date().utctimetuple())
+        return (
+            feedgen.content_type,
+            feedgen.writeString('utf-8').encode(),
+            latest,
+        )
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+        key = self._cache_key(request, obj)
+        document = django_cache.get(key)
+        if document is None:
+            document = self._document(request, obj)
+            django_cache.set(key, document, settings.SYNDICATION_TIMEOUT)
+        content_type, body, latest = document
+        response = HttpResponse(body, content_type=content_type)
+        response['Last-Modified'] = http_date(latest)
+        response['ETag'] = quote_etag(key)
+        patch_cache_control(
+            response, public=True, max_age=settings.SYNDICATION_MAX_AGE
+        )
+        return get_conditional_response(
+            request,
+            etag=response['ETag'],
+            last_modified=latest,
+            response=response,
+        )
+
+    def title(self, obj):
+        return 'Yatube: последние записи'
+
+    def description(self, obj):
+        return 'Новые посты всех авторов'
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).feed()[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(10)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_author_link(self, item):
+        return reverse(
+            'posts:profile', kwargs={'username': item.author.username}
+        )
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(CachedFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(
+            Group.objects.only('title', 'slug'), slug=slug
+        )
+
+    def scopes(self, group):
+        return [cache.group_scope(group.pk)]
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return f'Новые посты группы «{group.title}»'
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+    def posts(self, group):
+        return group.posts.all()
+
+
+class AuthorFeed(CachedFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(
+            User.objects.only('username'), username=username
+        )
+
+    def scopes(self, author):
+        return [cache.author_scope(author.pk)]
+
+    def title(self, author):
+        return f'Yatube: {author.username}'
+
+    def description(self, author):
+        return f'Новые посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def posts(self, author):
+        return author.posts.all()
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class AtomFeed(AtomMixin, CachedFeed):
+    pass
+
+
+class AtomGroupFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AtomAuthorFeed(AtomMixin, AuthorFeed):
+    pass
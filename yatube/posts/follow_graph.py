@@ -0,0 +1,160 @@
+"""
+Граф подписок в кэше.
+
+Для каждого пользователя кэшируются множество авторов, на которых он
+подписан, и число его подписчиков. Сигналы Follow не правят их, а
+удаляют: сразу и ещё раз после фиксации транзакции, чтобы чтение,
+успевшее положить в кэш данные до фиксации, не оставило их на сутки.
+Со второго чтения проверки «A подписан на B», взаимной подписки и
+счётчики на странице профиля обходятся без запросов. Множества
+подписчиков не хранятся: у популярного автора их слишком много, а для
+этих вопросов хватает множеств подписок. Рекомендации считает
+команда suggest_follows заранее: авторы, на которых подписаны те, на
+кого подписан пользователь.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Follow, FollowSuggestion
+
+
+def _following_key(user_id):
+    return f'follow:following:{user_id}'
+
+
+def _followers_key(user_id):
+    return f'follow:followers:{user_id}'
+
+
+def _suggestions_key(user_id):
+    return f'follow:suggestions:{user_id}'
+
+
+def following(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = _following_key(user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+        cache.set(key, authors, settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+    return authors
+
+
+def is_following(user_id, author_id):
+    return author_id in following(user_id)
+
+
+def is_mutual(user_id, other_id):
+    return is_following(user_id, other_id) and is_following(other_id, user_id)
+
+
+def follower_counts(user_ids):
+    """Число подписчиков каждого пользователя: {id: число}."""
+    keys = {_followers_key(user_id): user_id for user_id in user_ids}
+    counts = {keys[key]: total for key, total in cache.get_many(keys).items()}
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        found = dict(
+            Follow.objects.filter(author_id__in=missing)
+            .values_list('author_id')
+            .annotate(followers=Count('pk'))
+            .order_by()
+        )
+        for user_id in missing:
+            counts[user_id] = found.get(user_id, 0)
+        cache.set_many(
+            {_followers_key(user_id): counts[user_id] for user_id in missing},
+            settings.FOLLOW_GRAPH_CACHE_TIMEOUT,
+        )
+    return counts
+
+
+def counts(user_id):
+    """Пара (подписчиков, подписок)."""
+    return follower_counts([user_id])[user_id], len(following(user_id))
+
+
+def _forget_follow(user_id, author_id):
+    keys = [_following_key(user_id), _followers_key(author_id)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def added(user_id, author_id):
+    """Сбрасывает кэш после новой подписки."""
+    _forget_follow(user_id, author_id)
+
+
+def removed(user_id, author_id):
+    """Сбрасывает кэш после отписки."""
+    _forget_follow(user_id, author_id)
+
+
+def forget(user_ids=(), author_ids=()):
+    """Сбрасывает кэш после массовых изменений мимо сигналов."""
+    cache.delete_many(
+        [_following_key(user_id) for user_id in user_ids]
+        + [_followers_key(author_id) for author_id in author_ids]
+    )
+
+
+def suggestions(user_id, limit=None):
+    """Заранее посчитанные рекомендации без уже отслеживаемых авторов."""
+    limit = limit or settings.FOLLOW_SUGGESTIONS
+    key = _suggestions_key(user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = list(
+            FollowSuggestion.objects.filter(user_id=user_id)
+            .select_related('author')
+            .order_by('-score', '-author_id')
+            .values_list('author_id', 'author__username')
+        )
+        cache.set(key, authors, settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+    followed = following(user_id)
+    return [
+        (author_id, username) for author_id, username in authors
+        if author_id not in followed
+    ][:limit]
+
+
+def compute_suggestions(user_id, limit):
+    """
+    Авторы, на которых чаще всего подписаны авторы пользователя.
+
+    Оценка — число таких общих связей; если их нет, предлагаются
+    самые популярные авторы.
+    """
+    followed = Follow.objects.filter(user_id=user_id).values('author_id')
+    candidates = (
+        Follow.objects.filter(user_id__in=followed)
+        .exclude(author_id__in=followed)
+        .exclude(author_id=user_id)
+        .values('author_id')
+        .annotate(score=Count('pk'))
+        .order_by('-score', '-author_id')
+    )
+    found = [
+        (row['author_id'], row['score']) for row in candidates[:limit]
+    ]
+    if not found:
+        popular = (
+            Follow.objects.exclude(author_id__in=followed)
+            .exclude(author_id=user_id)
+            .values('author_id')
+            .annotate(score=Count('pk'))
+            .order_by('-score', '-author_id')
+        )
+        found = [(row['author_id'], 0) for row in popular[:limit]]
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id=user_id).delete()
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(user_id=user_id, author_id=author_id, score=score)
+            for author_id, score in found
+        )
+    cache.delete(_suggestions_key(user_id))
+    return found
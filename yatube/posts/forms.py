@@ -1,6 +1,9 @@
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from posts.models import Comment, Post
+from core import images
+from posts.models import Comment, Group, Post, User
 
 
 class PostForm(ModelForm):
@@ -18,6 +21,13 @@ class PostForm(ModelForm):
             'image': '(так будет красивее)',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённая картинка поста приходит как FieldFile.
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -29,3 +39,24 @@ class CommentForm(ModelForm):
         help_texts = {
             'text': 'Напишите ваше мнение',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+        empty_label='Все группы',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Такого автора нет.')
+        return author
@@ -0,0 +1,108 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95/p99 и число SQL-запросов страниц постов и '
+        'сравнивает с сохранённым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Прогнать только эти страницы (можно повторять).',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Число параллельных клиентов (можно повторять).',
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера; без него — тестовый клиент. '
+                 'По HTTP число SQL-запросов не считается.',
+        )
+        parser.add_argument('--save', help='Сохранить сводку в JSON.')
+        parser.add_argument('--baseline', help='Сравнить со сводкой из JSON.')
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Рост метрики в процентах, который считается регрессией.',
+        )
+
+    def handle(self, *args, **options):
+        found = benchmark.scenarios()
+        names = options['scenarios'] or list(found)
+        unknown = set(names) - set(found)
+        if unknown:
+            raise CommandError(
+                'Нет сценариев: ' + ', '.join(sorted(unknown))
+            )
+        reader = benchmark.busiest_reader()
+        results = {}
+        for concurrency in options['concurrency'] or [1]:
+            for name in names:
+                url, login, overrides = found[name]
+                if login and reader is None:
+                    self.stderr.write(f'{name}: нет пользователя с подписками')
+                    continue
+                user = reader if login else None
+                with override_settings(**overrides):
+                    benchmark.run(
+                        url, options['warmup'], user=user,
+                        base_url=options['base_url'],
+                    )
+                    started = time.perf_counter()
+                    samples = benchmark.run(
+                        url, options['requests'], concurrency, user=user,
+                        base_url=options['base_url'], cold=options['cold'],
+                    )
+                    elapsed = time.perf_counter() - started
+                summary = benchmark.summarize(samples, elapsed)
+                key = f'{name}@{concurrency}'
+                results[key] = summary
+                self.stdout.write(_format(key, summary))
+        if options['save']:
+            benchmark.save_baseline(options['save'], results, {
+                key: options[key]
+                for key in ('requests', 'concurrency', 'warmup', 'cold',
+                            'base_url')
+            })
+        if options['baseline']:
+            self._compare(results, options)
+
+    def _compare(self, results, options):
+        rows = benchmark.compare(
+            results,
+            benchmark.load_baseline(options['baseline']),
+            options['threshold'],
+        )
+        regressions = 0
+        for name, metric, before, after, change, worse in rows:
+            regressions += worse
+            line = (
+                f'{name:<24} {metric:<8} {before:>9} → {after:<9} '
+                f'{change:+.1f}%'
+            )
+            self.stdout.write(self.style.ERROR(line) if worse else line)
+        if regressions:
+            raise CommandError(f'Регрессий: {regressions}')
+
+
+def _format(key, summary):
+    queries = summary['queries']
+    return (
+        f'{key:<24} p50 {summary["p50"]:>8.2f} мс  '
+        f'p95 {summary["p95"]:>8.2f} мс  p99 {summary["p99"]:>8.2f} мс  '
+        f'SQL {"—" if queries is None else queries:>3}  '
+        f'{summary["rps"]} запр./с  ошибок {summary["errors"]}'
+    )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, и '
+        'потерянные файлы миниатюр.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов будет удалено.',
+        )
+        parser.add_argument(
+            '--deduplicate', action='store_true',
+            help='Сначала переименовать старые файлы по содержимому.',
+        )
+
+    def handle(self, *args, **options):
+        if options['deduplicate'] and not options['dry_run']:
+            renamed = media.deduplicate()
+            self.stdout.write(f'Переименовано файлов: {renamed}')
+        originals, thumbnails = media.collect_garbage(options['dry_run'])
+        verb = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            f'{verb}: оригиналов {originals}, миниатюр {thumbnails}'
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии или подписки в NDJSON/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(transfer.COLUMNS))
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, «-» — стандартный вывод.',
+        )
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--progress-every', type=int, default=100000,
+            help='Как часто сообщать о ходе выгрузки, в записях.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        progress = transfer.Progress(self.stderr, options['progress_every'])
+        stream = (
+            self.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8', newline='')
+        )
+        try:
+            records = transfer.export_records(
+                options['model'], options['chunk_size']
+            )
+            for _ in transfer.write_records(
+                records, stream, fmt, options['model']
+            ):
+                progress.add(1)
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        progress.done()
+
+
+def guess_format(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
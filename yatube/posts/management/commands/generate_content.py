@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, группы, подписки, посты и '
+        'комментарии для нагрузочных прогонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=30,
+            help='Сколько подписок пытается оформить каждый пользователь.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты постов.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Одинаковый seed на пустой базе даёт одинаковые данные.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        generator = Generator(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+        )
+        usernames = generator.users(options['users'])
+        self.stdout.write(f'Пользователей: {len(usernames)}')
+        slugs = generator.groups(options['groups'])
+        self.stdout.write(f'Групп: {len(slugs)}')
+        follows = generator.follows(usernames, options['follows_per_user'])
+        self.stdout.write(f'Подписок: {follows}')
+        post_ids = generator.posts(usernames, slugs, options['posts'])
+        self.stdout.write(f'Постов: {len(post_ids)}')
+        if post_ids:
+            comments = generator.comments(
+                usernames, post_ids, options['comments']
+            )
+            self.stdout.write(f'Комментариев: {comments}')
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+from .export_content import guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии или подписки из NDJSON/CSV. '
+        'Загружайте в порядке group, post, comment, follow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(transfer.COLUMNS))
+        parser.add_argument(
+            'path', help='Файл с записями, «-» — стандартный ввод.'
+        )
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        importer = transfer.Importer(options['model'])
+        progress = transfer.Progress(self.stderr, options['batch_size'])
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        try:
+            records = transfer.read_records(stream, fmt)
+            for chunk in transfer.chunks(records, options['batch_size']):
+                importer.import_chunk(chunk)
+                progress.add(len(chunk))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        progress.done()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {importer.created}, пропущено: {importer.skipped}'
+        ))
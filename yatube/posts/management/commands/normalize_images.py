@@ -0,0 +1,60 @@
+import os
+import posixpath
+from functools import partial
+
+from django import forms
+from django.core.management.base import BaseCommand
+
+from core import images, thumbnails
+from posts import cache, media
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускает картинки уже опубликованных постов через ту же '
+        'нормализацию, что и новые загрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько места освободится.',
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='').order_by()
+            .values_list('image', flat=True).distinct()
+        )
+        rewritten = skipped = saved = 0
+        for name in list(names):
+            try:
+                with media.storage().open(name) as source:
+                    size = media.storage().size(name)
+                    result = images.normalize(source)
+            except (OSError, forms.ValidationError) as error:
+                self.stderr.write(f'{name}: {error}')
+                skipped += 1
+                continue
+            if result.size >= size:
+                continue
+            rewritten += 1
+            saved += size - result.size
+            if options['dry_run']:
+                continue
+            # Прежний файл остаётся без ссылок, его удалит collect_media.
+            # Расширение берётся у результата: формат мог смениться.
+            target = media.storage().save(
+                posixpath.join(
+                    media.upload_dir(), os.path.basename(result.name)
+                ),
+                result,
+            )
+            posts = media.replace(name, target)
+            scopes = set().union(*map(cache.post_scopes, posts))
+            thumbnails.schedule(target, partial(cache.bump, *scopes))
+        self.stdout.write(
+            f'Перекодировано: {rewritten}, пропущено: {skipped}, '
+            f'освобождено байт: {saved}'
+        )
@@ -0,0 +1,69 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import write_queue
+from posts.models import AppliedWrite
+
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая пауза после ошибок подряд, в секундах.
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты и комментарии из журнала отложенной записи '
+        'в базу пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти, не дожидаясь новых записей.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--prune-days', type=int, default=30,
+            help='Сколько дней хранить ключи идемпотентности.',
+        )
+
+    def handle(self, *args, **options):
+        self._prune(options['prune_days'])
+        errors = 0
+        while True:
+            try:
+                done, failed = write_queue.process(options['batch_size'])
+                if not done and not failed:
+                    write_queue.journal().prune()
+            except Exception as error:
+                if options['once']:
+                    raise CommandError(
+                        f'Не удалось разобрать очередь: {error!r}'
+                    ) from error
+                errors += 1
+                logger.exception('Не удалось разобрать очередь записи')
+                time.sleep(
+                    min(options['interval'] * 2 ** errors, MAX_BACKOFF)
+                )
+                continue
+            errors = 0
+            if done or failed:
+                self.stdout.write(f'Записано: {done}, ошибок: {failed}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def _prune(self, days):
+        AppliedWrite.objects.filter(
+            created__lt=timezone.now() - timedelta(days=days)
+        ).delete()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов и комментариев заново.'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Поиск работает только на SQLite с FTS5.')
+        total = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано документов: {total}')
+        )
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Comment, Post
+
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _counts(model):
+    return dict(
+        model.objects.values_list('author_id')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и комментариев авторов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        posts = _counts(Post)
+        comments = _counts(Comment)
+        stored = {
+            stats.author_id: stats
+            for stats in AuthorStats.objects.iterator()
+        }
+        missing, drifted = [], []
+        for author_id in User.objects.values_list('pk', flat=True).iterator():
+            expected = (posts.get(author_id, 0), comments.get(author_id, 0))
+            stats = stored.get(author_id)
+            if stats is None:
+                missing.append(AuthorStats(
+                    author_id=author_id,
+                    posts_count=expected[0],
+                    comments_count=expected[1],
+                ))
+            elif (stats.posts_count, stats.comments_count) != expected:
+                stats.posts_count, stats.comments_count = expected
+                drifted.append(stats)
+        self.stdout.write(
+            f'Нет счётчиков: {len(missing)}, расхождений: {len(drifted)}'
+        )
+        if options['dry_run']:
+            return
+        with transaction.atomic():
+            AuthorStats.objects.bulk_create(
+                missing, batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+            AuthorStats.objects.bulk_update(
+                drifted, ['posts_count', 'comments_count'],
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики исправлены.'))
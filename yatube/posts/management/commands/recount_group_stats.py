@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from posts.models import Group, GroupAuthor, GroupStats, Post
+
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики групп и их авторов с таблицей постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(group=None).order_by()
+        authors = defaultdict(dict)
+        for group_id, author_id, total in (
+            posts.values_list('group_id', 'author_id')
+            .annotate(total=Count('pk')).iterator()
+        ):
+            authors[group_id][author_id] = total
+        last = dict(
+            posts.values_list('group_id').annotate(last=Max('pub_date'))
+        )
+        expected = {
+            group_id: (sum(totals.values()), len(totals), last[group_id])
+            for group_id, totals in authors.items()
+        }
+
+        stale_authors, new_authors, drifted_authors = [], [], []
+        for row in GroupAuthor.objects.iterator():
+            total = authors[row.group_id].pop(row.author_id, 0)
+            if not total:
+                stale_authors.append(row.pk)
+            elif row.posts_count != total:
+                row.posts_count = total
+                drifted_authors.append(row)
+        for group_id, totals in authors.items():
+            new_authors.extend(
+                GroupAuthor(
+                    group_id=group_id, author_id=author_id, posts_count=total
+                )
+                for author_id, total in totals.items()
+            )
+
+        stored = {stats.group_id: stats for stats in GroupStats.objects.all()}
+        missing, drifted = [], []
+        for group_id in Group.objects.values_list('pk', flat=True):
+            values = expected.get(group_id, (0, 0, None))
+            stats = stored.get(group_id)
+            if stats is None:
+                stats = GroupStats(group_id=group_id)
+                missing.append(stats)
+            elif (
+                stats.posts_count, stats.authors_count, stats.last_activity
+            ) != values:
+                drifted.append(stats)
+            else:
+                continue
+            stats.posts_count, stats.authors_count, stats.last_activity = (
+                values
+            )
+
+        self.stdout.write(
+            f'Нет счётчиков групп: {len(missing)}, '
+            f'расхождений: {len(drifted)}, '
+            f'расхождений по авторам: '
+            f'{len(stale_authors) + len(new_authors) + len(drifted_authors)}'
+        )
+        if options['dry_run']:
+            return
+        with transaction.atomic():
+            GroupAuthor.objects.filter(pk__in=stale_authors).delete()
+            GroupAuthor.objects.bulk_create(
+                new_authors, batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+            GroupAuthor.objects.bulk_update(
+                drifted_authors, ['posts_count'], batch_size=BATCH_SIZE
+            )
+            GroupStats.objects.bulk_create(
+                missing, batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+            GroupStats.objects.bulk_update(
+                drifted, ['posts_count', 'authors_count', 'last_activity'],
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики исправлены.'))
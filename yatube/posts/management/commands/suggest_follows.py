@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import follow_graph
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, для которых посчитать (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Сколько рекомендаций хранить для каждого пользователя.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        limit = options['limit'] or settings.FOLLOW_SUGGESTIONS * 2
+        computed = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            follow_graph.compute_suggestions(user_id, limit)
+            computed += 1
+        self.stdout.write(
+            f'Рекомендации пересчитаны для пользователей: {computed}'
+        )
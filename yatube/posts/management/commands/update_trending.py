@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Учитывает новые комментарии и подписки в рейтинге популярных '
+        'постов и удаляет затухшие рейтинги.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Один проход без ожидания новых событий.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help='Пауза в секундах между проходами.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            found = trending.update(options['batch_size'])
+            pruned = trending.prune()
+            if found or pruned:
+                self.stdout.write(
+                    f'Событий: {found}, удалено рейтингов: {pruned}'
+                )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
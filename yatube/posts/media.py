@@ -0,0 +1,176 @@
+"""
+Счётчики ссылок на картинки и сборка мусора в хранилище.
+
+Картинки постов лежат в ContentAddressedStorage (core.storage), и
+один файл может принадлежать нескольким постам. MediaFile хранит число
+таких постов; сигналы Post меняют его при создании, смене картинки и
+удалении поста. Файл, на который никто не ссылается, удаляется не сразу,
+а командой collect_media: после пересчёта ссылок по таблице постов (её
+меняют и массовые операции мимо сигналов) и только если файл старше
+MEDIA_GC_GRACE — загрузка сохраняет файл раньше, чем пост.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache, write_queue
+from .models import MediaFile, Post
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def upload_dir():
+    return Post._meta.get_field('image').upload_to.rstrip('/')
+
+
+def acquire(name, count=1):
+    """Добавляет ссылки на файл."""
+    if not name:
+        return
+    updated = MediaFile.objects.filter(name=name).update(
+        references=F('references') + count
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, references=count)
+        except IntegrityError:
+            acquire(name, count)
+
+
+def release(name):
+    """Убирает ссылку; сам файл удалит collect_garbage()."""
+    if name:
+        MediaFile.objects.filter(name=name, references__gt=0).update(
+            references=F('references') - 1
+        )
+
+
+def recount():
+    """Сверяет счётчики с таблицей постов; возвращает число исправлений."""
+    actual = dict(
+        Post.objects.exclude(image='').values_list('image')
+        .annotate(references=Count('pk')).order_by()
+    )
+    fixed = 0
+    for media in MediaFile.objects.iterator():
+        references = actual.pop(media.name, 0)
+        if media.references != references:
+            MediaFile.objects.filter(pk=media.pk).update(
+                references=references
+            )
+            fixed += 1
+    MediaFile.objects.bulk_create(
+        MediaFile(name=name, references=references)
+        for name, references in actual.items()
+    )
+    return fixed + len(actual)
+
+
+def _walk(directory):
+    """Имена всех файлов в каталоге хранилища и его подкаталогах."""
+    if not storage().exists(directory):
+        return
+    directories, files = storage().listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from _walk(posixpath.join(directory, name))
+
+
+def _is_old(name, before):
+    try:
+        return storage().get_modified_time(name) < before
+    except OSError:
+        return False
+
+
+def _referenced_thumbnails():
+    kvstore = default.kvstore
+    names = set()
+    for key in kvstore._find_keys(identity='image'):
+        image = kvstore._get(key)
+        if image is not None:
+            names.add(image.name)
+    return names
+
+
+def collect_garbage(dry_run=False):
+    """
+    Удаляет оригиналы без ссылок и файлы миниатюр, о которых не знает
+    sorl. Возвращает пару (оригиналов, миниатюр).
+    """
+    before = timezone.now() - timedelta(seconds=settings.MEDIA_GC_GRACE)
+    recount()
+    referenced = set(
+        MediaFile.objects.filter(references__gt=0)
+        .values_list('name', flat=True)
+    )
+    referenced |= write_queue.journal().images()
+    originals = [
+        name for name in _walk(upload_dir())
+        if name not in referenced and _is_old(name, before)
+    ]
+    if not dry_run:
+        # Файл мог загрузиться заново, пока собирался список.
+        originals = [name for name in originals if _is_old(name, before)]
+        for name in originals:
+            # Вместе с оригиналом sorl удаляет его миниатюры.
+            delete(ImageFile(name, storage()))
+        MediaFile.objects.filter(name__in=originals).delete()
+    known = _referenced_thumbnails()
+    prefix = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+    thumbnails = [
+        name for name in _walk(prefix)
+        if name not in known and _is_old(name, before)
+    ]
+    if not dry_run:
+        for name in thumbnails:
+            storage().delete(name)
+    return len(originals), len(thumbnails)
+
+
+def replace(name, target):
+    """Переводит все посты с файла name на файл target."""
+    posts = list(
+        Post.objects.filter(image=name).only('author_id', 'group_id')
+    )
+    with transaction.atomic():
+        Post.objects.filter(image=name).update(image=target)
+        MediaFile.objects.filter(name=name).update(references=0)
+        acquire(target, len(posts))
+    for post in posts:
+        cache.bump(*cache.post_scopes(post))
+    return posts
+
+
+def deduplicate():
+    """
+    Переименовывает старые файлы по содержимому и сводит дубликаты
+    в один файл. Возвращает число переименованных файлов.
+    """
+    renamed = 0
+    names = (
+        Post.objects.exclude(image='').order_by()
+        .values_list('image', flat=True).distinct()
+    )
+    for name in list(names):
+        try:
+            with storage().open(name) as source:
+                if storage().content_name(name, source) == name:
+                    continue
+                target = storage().save(name, source)
+        except OSError:
+            continue
+        replace(name, target)
+        renamed += 1
+    return renamed
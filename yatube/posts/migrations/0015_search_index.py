@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search_index USING fts5('
+        'body, kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, '
+        'author_id UNINDEXED, group_id UNINDEXED)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search_index')
+
+
+def fill_index(apps, schema_editor):
+    from posts import search
+
+    search.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_authorstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
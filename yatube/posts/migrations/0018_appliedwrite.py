@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedWrite',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ идемпотентности')),
+                ('kind', models.CharField(max_length=16, verbose_name='Тип записи')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id записи')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата записи')),
+            ],
+            options={
+                'verbose_name': 'Применённая запись',
+                'verbose_name_plural': 'Применённые записи',
+            },
+        ),
+    ]
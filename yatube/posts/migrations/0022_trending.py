@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max
+import django.utils.timezone
+
+
+def skip_old_follows(apps, schema_editor):
+    # Дата старых подписок неизвестна: они не попадают в рейтинг.
+    Follow = apps.get_model('posts', 'Follow')
+    TrendingCursor = apps.get_model('posts', 'TrendingCursor')
+    last = Follow.objects.aggregate(last=Max('pk'))['last']
+    if last:
+        TrendingCursor.objects.create(source='follows', position=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCursor',
+            fields=[
+                ('source', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Источник событий')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Последний pk')),
+            ],
+            options={
+                'verbose_name': 'Позиция рейтинга',
+                'verbose_name_plural': 'Позиции рейтинга',
+            },
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата подписки'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('rank', models.FloatField(verbose_name='Рейтинг')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Учтено комментариев')),
+                ('follows', models.PositiveIntegerField(default=0, verbose_name='Учтено подписок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг поста',
+                'verbose_name_plural': 'Рейтинги постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-rank'], name='posts_posts_rank_3bb973_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['group', '-rank'], name='posts_posts_group_i_f5a8a2_idx'),
+        ),
+        migrations.RunPython(skip_old_follows, migrations.RunPython.noop),
+    ]
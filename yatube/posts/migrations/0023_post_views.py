@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число просмотров'),
+        ),
+        migrations.AddField(
+            model_name='postscore',
+            name='views',
+            field=models.PositiveIntegerField(default=0, verbose_name='Учтено просмотров'),
+        ),
+    ]
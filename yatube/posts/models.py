@@ -1,5 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.storage import images_storage
 
 
 User = get_user_model()
@@ -14,6 +18,47 @@ class Group(models.Model):
         return self.title
 
 
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'views',
+    'image',
+    'author',
+    'author__username',
+    'group',
+    'group__title',
+    'group__slug',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def feed(self, author_stats=False):
+        """
+        Посты для лент: автор и группа в том же запросе, только поля,
+        которые выводят шаблоны, и число комментариев подзапросом.
+        """
+        fields = FEED_FIELDS
+        related = ['author', 'group']
+        if author_stats:
+            fields += (
+                'author__stats__posts_count',
+                'author__stats__comments_count',
+            )
+            related.append('author__stats')
+        comments = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return self.select_related(*related).only(*fields).annotate(
+            comments_count=Coalesce(
+                Subquery(comments, output_field=IntegerField()), 0
+            )
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -41,17 +86,42 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=images_storage,
         blank=True
     )
+    views = models.PositiveIntegerField(
+        verbose_name='Число просмотров',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['pub_date']),
+            models.Index(fields=['author', 'pub_date']),
+            models.Index(fields=['group', 'pub_date']),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+PATH_DIGITS = 10
+
+
 class Comment(models.Model):
+    """
+    Комментарий или ответ в ветке.
+
+    У ответа thread — корневой комментарий ветки, path — pk предков
+    и его собственный, каждый дополнен нулями до PATH_DIGITS знаков.
+    Сортировка по (thread, path) даёт ветку в порядке обхода дерева.
+    У корня thread пуст, path — пустая строка, а replies_count хранит
+    число ответов во всей ветке.
+    """
     post = models.ForeignKey(
         Post,
         verbose_name='Комментируемый пост',
@@ -72,9 +142,64 @@ class Comment(models.Model):
         verbose_name='Дата комментария',
         auto_now_add=True,
     )
+    parent = models.ForeignKey(
+        'self',
+        verbose_name='Ответ на',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='replies',
+    )
+    thread = models.ForeignKey(
+        'self',
+        verbose_name='Ветка',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    path = models.CharField(
+        verbose_name='Путь в ветке',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    depth = models.PositiveSmallIntegerField(
+        verbose_name='Глубина',
+        default=0,
+        editable=False,
+    )
+    replies_count = models.PositiveIntegerField(
+        verbose_name='Число ответов в ветке',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created']),
+            models.Index(fields=['post', 'parent', 'created']),
+            models.Index(fields=['thread', 'path']),
+        ]
+
+    def attach_to(self, parent):
+        """Делает комментарий ответом на parent в той же ветке."""
+        self.parent = parent
+        self.thread_id = parent.thread_id or parent.pk
+        self.depth = parent.depth + 1
+        if self.pk is not None:
+            self.path = parent.path + str(self.pk).zfill(PATH_DIGITS)
+
+    def save(self, *args, **kwargs):
+        if self.parent_id and self.thread_id is None:
+            # Ответ создан присваиванием parent, без attach_to().
+            self.attach_to(self.parent)
+        super().save(*args, **kwargs)
+        if self.parent_id and not self.path:
+            # Путь содержит pk, который известен только после вставки.
+            self.path = self.parent.path + str(self.pk).zfill(PATH_DIGITS)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 
 class Follow(models.Model):
@@ -90,6 +215,10 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата подписки',
+        auto_now_add=True,
+    )
 
     class Meta:
         constraints = [
@@ -98,3 +227,254 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация подписки, посчитанная командой suggest_follows."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Кому',
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.PositiveIntegerField(verbose_name='Оценка', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'score', 'author']),
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель ленты',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group,
+        verbose_name='Группа',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+    authors_count = models.PositiveIntegerField(
+        verbose_name='Число авторов',
+        default=0,
+    )
+    last_activity = models.DateTimeField(
+        verbose_name='Дата последнего поста',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+
+class GroupAuthor(models.Model):
+    """Число постов автора в группе; строка есть, пока оно больше нуля."""
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Автор группы'
+        verbose_name_plural = 'Авторы групп'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'author'],
+                name='unique_group_author'
+            )
+        ]
+
+
+class PostScore(models.Model):
+    """
+    Рейтинг поста для популярного: логарифм суммы весов событий,
+    каждый вес умножен на exp(t / tau) от момента события
+    (posts.trending). Группа копируется из поста для рейтинга группы.
+    """
+    post = models.OneToOneField(
+        Post,
+        verbose_name='Пост',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='score',
+    )
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    rank = models.FloatField(verbose_name='Рейтинг')
+    comments = models.PositiveIntegerField(
+        verbose_name='Учтено комментариев',
+        default=0,
+    )
+    follows = models.PositiveIntegerField(
+        verbose_name='Учтено подписок',
+        default=0,
+    )
+    views = models.PositiveIntegerField(
+        verbose_name='Учтено просмотров',
+        default=0,
+    )
+    updated = models.DateTimeField(
+        verbose_name='Дата пересчёта',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = [
+            models.Index(fields=['-rank']),
+            models.Index(fields=['group', '-rank']),
+        ]
+
+
+class TrendingCursor(models.Model):
+    """Последний учтённый в рейтинге pk таблицы событий."""
+    source = models.CharField(
+        verbose_name='Источник событий',
+        max_length=32,
+        primary_key=True,
+    )
+    position = models.PositiveIntegerField(
+        verbose_name='Последний pk',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Позиция рейтинга'
+        verbose_name_plural = 'Позиции рейтинга'
+
+
+class AppliedWrite(models.Model):
+    """Ключ идемпотентности уже записанного поста или комментария."""
+    key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        max_length=64,
+        unique=True,
+    )
+    kind = models.CharField(verbose_name='Тип записи', max_length=16)
+    object_id = models.PositiveIntegerField(verbose_name='Id записи')
+    created = models.DateTimeField(
+        verbose_name='Дата записи',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Применённая запись'
+        verbose_name_plural = 'Применённые записи'
+
+
+class MediaFile(models.Model):
+    """Число постов, ссылающихся на файл в хранилище картинок."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        unique=True,
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=0,
+    )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
@@ -0,0 +1,161 @@
+"""
+Кэш целых страниц для гостей.
+
+Представление, помеченное public_page, отдаёт всем гостям одинаковый
+HTML, поэтому ответ на анонимный GET сохраняется в кэше pages целиком.
+Представление перечисляет области (posts.cache), от которых зависит
+страница, через tag(); вместе с ответом хранятся их версии. Сигналы,
+которые увеличивают версию области при сохранении поста, комментария
+или группы, тем самым сбрасывают ровно те страницы, где он выводится.
+
+Те же области уходят в заголовке Surrogate-Key, а Cache-Control
+разрешает обратному прокси хранить ответ PAGE_CACHE_MAX_AGE секунд.
+При PAGE_CACHE_STALE_WHILE_REVALIDATE устаревшую страницу
+перестраивает один запрос, остальные до его окончания получают
+прежнюю копию.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import cache
+
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+PRIVATE = 'private'
+
+# Запросы с такими cookie получают страницу, зависящую от них.
+PERSONAL_COOKIES = ('messages',)
+
+
+def public_page(view):
+    """Разрешает кэшировать ответы представления для гостей."""
+    view.public_page = True
+    return view
+
+
+def tag(request, *scopes):
+    """Области, от которых зависит страница; версии берутся до рендера."""
+    request.page_scopes = scopes
+    request.page_versions = cache.versions(*scopes)
+
+
+def _pages():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _key(request):
+    location = f'{request.get_host()}{request.get_full_path()}'
+    return f'page:{hashlib.md5(location.encode()).hexdigest()}'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _is_guest(request):
+    return not request.user.is_authenticated and not any(
+        name in request.COOKIES for name in PERSONAL_COOKIES
+    )
+
+
+def _restore(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    response['Age'] = str(int(time.time() - entry['created']))
+    response['X-Page-Cache'] = state
+    return response
+
+
+def _is_storable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _public_headers(response, scopes):
+    options = {
+        'public': True,
+        'max_age': 0,
+        's_maxage': settings.PAGE_CACHE_MAX_AGE,
+    }
+    if settings.PAGE_CACHE_STALE_WHILE_REVALIDATE:
+        options['stale_while_revalidate'] = (
+            settings.PAGE_CACHE_STALE_WHILE_REVALIDATE
+        )
+    patch_cache_control(response, **options)
+    patch_vary_headers(response, ('Cookie',))
+    if scopes:
+        response['Surrogate-Key'] = ' '.join(scopes)
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        state = getattr(request, 'page_cache', None)
+        if state == MISS:
+            self._store(request, response)
+        elif state == PRIVATE:
+            patch_cache_control(response, private=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(view_func, 'public_page', False):
+            return None
+        if not settings.PAGE_CACHE or request.method not in ('GET', 'HEAD'):
+            return None
+        if not _is_guest(request):
+            request.page_cache = PRIVATE
+            return None
+        key = _key(request)
+        entry = _pages().get(key)
+        request.page_cache = MISS
+        if entry is None:
+            return None
+        if list(cache.versions(*entry['scopes'])) == entry['versions']:
+            request.page_cache = HIT
+            return _restore(entry, HIT)
+        if settings.PAGE_CACHE_STALE_WHILE_REVALIDATE and not _pages().add(
+            _lock_key(key), True, settings.PAGE_CACHE_LOCK_TIMEOUT
+        ):
+            # Страницу уже перестраивает другой запрос.
+            request.page_cache = STALE
+            return _restore(entry, STALE)
+        return None
+
+    def _store(self, request, response):
+        scopes = getattr(request, 'page_scopes', ())
+        if not _is_guest(request) or not _is_storable(request, response):
+            return
+        _public_headers(response, scopes)
+        response['X-Page-Cache'] = MISS
+        if request.method != 'GET':
+            # Тело ответа на HEAD сервер может не передать.
+            return
+        key = _key(request)
+        _pages().set(key, {
+            'scopes': scopes,
+            'versions': list(getattr(request, 'page_versions', [])),
+            'status': response.status_code,
+            'headers': [
+                (name, value) for name, value in response.items()
+                if name.lower() not in ('set-cookie', 'x-page-cache')
+            ],
+            'content': response.content,
+            'created': time.time(),
+        }, settings.PAGE_CACHE_TIMEOUT)
+        _pages().delete(_lock_key(key))
@@ -0,0 +1,250 @@
+"""
+Полнотекстовый поиск по постам и комментариям.
+
+Индекс — виртуальная таблица SQLite FTS5. В неё пишутся основы слов
+(см. stemmer), поэтому «котики» находятся по запросу «коты». Порядок
+выдачи — bm25, постраничная навигация идёт по ключу (rank, rowid).
+На других СУБД индекс не создаётся и поиск ничего не находит.
+"""
+import json
+import re
+from collections import namedtuple
+from itertools import chain, islice
+
+from django.apps import apps as global_apps
+from django.db import connection
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from .stemmer import stem
+
+
+TABLE = 'posts_search_index'
+POST = 'post'
+COMMENT = 'comment'
+KINDS = (POST, COMMENT)
+WORD = re.compile(r'\w+')
+SNIPPET_WORDS = 30
+BATCH_SIZE = 500
+
+Hit = namedtuple('Hit', 'kind object_id post_id rank rowid')
+Result = namedtuple('Result', 'kind post comment snippet')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def terms(text):
+    return [stem(word) for word in WORD.findall(text)]
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS.index(kind)
+
+
+def _row(kind, object_id, text, post_id, author_id, group_id):
+    return [
+        _rowid(kind, object_id), ' '.join(terms(text)), kind, object_id,
+        post_id, author_id, group_id,
+    ]
+
+
+def _insert(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {TABLE} '
+        '(rowid, body, kind, object_id, post_id, author_id, group_id) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+        rows,
+    )
+
+
+def remove(kind, object_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [_rowid(kind, object_id)],
+        )
+
+
+def index_post(post):
+    if not available():
+        return
+    remove(POST, post.pk)
+    with connection.cursor() as cursor:
+        _insert(cursor, [_row(
+            POST, post.pk, post.text, post.pk, post.author_id, post.group_id
+        )])
+
+
+def index_comment(comment):
+    if not available():
+        return
+    remove(COMMENT, comment.pk)
+    with connection.cursor() as cursor:
+        _insert(cursor, [_row(
+            COMMENT, comment.pk, comment.text, comment.post_id,
+            comment.author_id, comment.post.group_id,
+        )])
+
+
+def index_posts(posts):
+    """Добавляет в индекс пачку новых постов."""
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        _insert(cursor, [
+            _row(POST, post.pk, post.text, post.pk, post.author_id,
+                 post.group_id)
+            for post in posts
+        ])
+
+
+def index_comments(comments):
+    """Добавляет в индекс пачку новых комментариев."""
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        _insert(cursor, [
+            _row(COMMENT, comment.pk, comment.text, comment.post_id,
+                 comment.author_id, comment.post.group_id)
+            for comment in comments
+        ])
+
+
+def move_comments(post):
+    """Переносит комментарии поста в его новую группу."""
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET group_id = %s '
+            'WHERE post_id = %s AND kind = %s',
+            [post.group_id, post.pk, COMMENT],
+        )
+
+
+def rebuild(apps=global_apps):
+    """
+    Строит индекс заново по всем постам и комментариям. Строки
+    вставляются пачками по мере чтения, память не растёт с таблицами.
+    """
+    if not available():
+        return 0
+    posts = apps.get_model('posts', 'Post').objects.values_list(
+        'pk', 'text', 'author_id', 'group_id'
+    ).order_by()
+    comments = apps.get_model('posts', 'Comment').objects.values_list(
+        'pk', 'text', 'post_id', 'author_id', 'post__group_id'
+    ).order_by()
+    rows = chain(
+        (
+            _row(POST, pk, text, pk, author_id, group_id)
+            for pk, text, author_id, group_id in posts.iterator(BATCH_SIZE)
+        ),
+        (_row(COMMENT, *values) for values in comments.iterator(BATCH_SIZE)),
+    )
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        chunk = list(islice(rows, BATCH_SIZE))
+        while chunk:
+            _insert(cursor, chunk)
+            total += len(chunk)
+            chunk = list(islice(rows, BATCH_SIZE))
+    return total
+
+
+def encode_cursor(hit):
+    return urlsafe_base64_encode(json.dumps([hit.rank, hit.rowid]).encode())
+
+
+def decode_cursor(cursor):
+    try:
+        rank, rowid = json.loads(urlsafe_base64_decode(cursor).decode())
+        return float(rank), int(rowid)
+    except (TypeError, ValueError):
+        return None
+
+
+def search(query, kind=None, group_id=None, author_id=None, cursor=None,
+           limit=10):
+    """Находит документы по запросу; возвращает страницу и курсор."""
+    query_terms = terms(query)
+    if not query_terms or not available():
+        return [], None
+    sql = [
+        f'SELECT kind, object_id, post_id, rank, rowid FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s'
+    ]
+    params = [' '.join(f'"{term}"*' for term in query_terms)]
+    for column, value in (
+        ('kind', kind), ('group_id', group_id), ('author_id', author_id)
+    ):
+        if value is not None:
+            sql.append(f'AND {column} = %s')
+            params.append(value)
+    key = decode_cursor(cursor) if cursor else None
+    if key is not None:
+        sql.append('AND (rank > %s OR (rank = %s AND rowid > %s))')
+        params.extend([key[0], key[0], key[1]])
+    sql.append('ORDER BY rank, rowid LIMIT %s')
+    params.append(limit + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(' '.join(sql), params)
+        hits = [Hit(*row) for row in db_cursor.fetchall()]
+    next_cursor = encode_cursor(hits[limit - 1]) if len(hits) > limit else None
+    return hits[:limit], next_cursor
+
+
+def highlight(text, query_terms):
+    """Фрагмент текста с найденными словами в <mark>."""
+    words = list(WORD.finditer(text))
+    matched = {
+        number for number, word in enumerate(words)
+        if any(stem(word.group()).startswith(term) for term in query_terms)
+    }
+    first = min(matched, default=0)
+    start = max(first - SNIPPET_WORDS // 3, 0)
+    window = words[start:start + SNIPPET_WORDS]
+    if not window:
+        return escape(text)
+    parts = ['… ' if start else '']
+    position = window[0].start()
+    for number, word in enumerate(window, start):
+        parts.append(escape(text[position:word.start()]))
+        if number in matched:
+            parts.append(f'<mark>{escape(word.group())}</mark>')
+        else:
+            parts.append(escape(word.group()))
+        position = word.end()
+    if start + len(window) < len(words):
+        parts.append(' …')
+    else:
+        parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
+
+
+def results(hits, query):
+    """Посты и комментарии для найденных документов с подсветкой."""
+    from .models import Comment, Post
+
+    query_terms = terms(query)
+    posts = Post.objects.feed().in_bulk({hit.post_id for hit in hits})
+    comments = Comment.objects.select_related('author').in_bulk(
+        [hit.object_id for hit in hits if hit.kind == COMMENT]
+    )
+    found = []
+    for hit in hits:
+        post = posts.get(hit.post_id)
+        comment = comments.get(hit.object_id) if hit.kind == COMMENT else None
+        if post is None or (hit.kind == COMMENT and comment is None):
+            continue
+        text = (comment or post).text
+        found.append(Result(
+            hit.kind, post, comment, highlight(text, query_terms)
+        ))
+    return found
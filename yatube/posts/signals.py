@@ -0,0 +1,216 @@
+from django.conf import settings
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (cache, feed, follow_graph, media, search, stats, threads,
+               trending)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created and settings.FOLLOW_FEED_MATERIALIZED:
+        feed.fan_out(instance)
+
+
+# Граф подписок обновляется раньше лент: backfill смотрит на число
+# подписчиков автора.
+@receiver(post_save, sender=Follow)
+def add_to_follow_graph(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.added(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_from_follow_graph(sender, instance, **kwargs):
+    follow_graph.removed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created and settings.FOLLOW_FEED_MATERIALIZED:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    if settings.FOLLOW_FEED_MATERIALIZED:
+        feed.prune(instance.user_id, instance.author_id)
+        feed.catch_up(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, posts=-1)
+
+
+@receiver(post_save, sender=Post)
+def count_group_post(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_group_id', None)
+    if not created and previous == instance.group_id:
+        return
+    if not created:
+        stats.adjust_group(previous, instance.author_id, -1)
+    stats.adjust_group(
+        instance.group_id, instance.author_id, 1, instance.pub_date
+    )
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_group_post(sender, instance, **kwargs):
+    stats.adjust_group(instance.group_id, instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def move_post_score(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_group_id', None)
+    if not created and previous != instance.group_id:
+        trending.moved(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(instance.author_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, comments=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_reply(sender, instance, created, **kwargs):
+    if created:
+        threads.count_reply(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_reply(sender, instance, **kwargs):
+    threads.count_reply(instance, -1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    # При смене группы устаревает и лента прежней группы, при смене
+    # картинки прежний файл теряет ссылку.
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', '')
+    if previous != instance.image.name:
+        media.acquire(instance.image.name)
+        media.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_group_id', None)
+    cache.bump(*cache.post_scopes(instance, [previous]))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    # Профиль комментатора показывает число его комментариев.
+    cache.bump(cache.author_scope(instance.author_id))
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    cache.bump(*cache.post_scopes(post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    cache.bump(
+        cache.follow_scope(instance.user_id),
+        cache.followers_scope(instance.author_id),
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, **kwargs):
+    instance._previous_username = None
+    if instance.pk is not None:
+        instance._previous_username = (
+            User.objects.filter(pk=instance.pk)
+            .values_list('username', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, update_fields,
+                            **kwargs):
+    # Вход пользователя меняет только last_login, которого не видно.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    cache.bump(cache.author_scope(instance.pk))
+    previous = getattr(instance, '_previous_username', None)
+    if previous is not None and previous != instance.username:
+        # Имя автора выводится во всех лентах с его постами и под
+        # его комментариями.
+        cache.bump(cache.ALL_POSTS, *cache.user_scopes(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # Посты группы теряют её через UPDATE без сигналов.
+    instance._post_scopes = cache.group_post_scopes(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    cache.bump(
+        cache.ALL_POSTS,
+        cache.group_scope(instance.pk),
+        *getattr(instance, '_post_scopes', ()),
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, **kwargs):
+    search.index_post(instance)
+    previous = getattr(instance, '_previous_group_id', None)
+    if not created and previous != instance.group_id:
+        search.move_comments(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove(search.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove(search.COMMENT, instance.pk)
@@ -0,0 +1,143 @@
+"""
+Денормализованные счётчики: посты и комментарии автора, посты, авторы
+и дата последнего поста группы.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import (Count, DateTimeField, F, Max, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, GroupAuthor, GroupStats, Post
+
+
+def recount(author_id):
+    """Пересчитывает счётчики автора по таблицам постов и комментариев."""
+    stats, _ = AuthorStats.objects.update_or_create(
+        author_id=author_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=author_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=author_id
+            ).count(),
+        },
+    )
+    return stats
+
+
+def adjust(author_id, posts=0, comments=0):
+    """Изменяет счётчики автора на заданные величины."""
+    with transaction.atomic():
+        updated = AuthorStats.objects.filter(author_id=author_id).update(
+            posts_count=Greatest(F('posts_count') + posts, 0),
+            comments_count=Greatest(F('comments_count') + comments, 0),
+        )
+        # При удалении строки нет только у удаляемого автора,
+        # создавать её заново нельзя.
+        if not updated and (posts > 0 or comments > 0):
+            recount(author_id)
+
+
+def author_stats(author):
+    """Счётчики автора; недостающая строка создаётся по факту."""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        author.stats = recount(author.pk)
+        return author.stats
+
+
+def recount_group(group_id):
+    """Пересчитывает счётчики группы по её постам."""
+    posts = Post.objects.filter(group_id=group_id).order_by()
+    authors = dict(
+        posts.values_list('author_id').annotate(total=Count('pk'))
+    )
+    with transaction.atomic():
+        GroupAuthor.objects.filter(group_id=group_id).exclude(
+            author_id__in=authors
+        ).delete()
+        for author_id, total in authors.items():
+            GroupAuthor.objects.update_or_create(
+                group_id=group_id,
+                author_id=author_id,
+                defaults={'posts_count': total},
+            )
+        stats, _ = GroupStats.objects.update_or_create(
+            group_id=group_id,
+            defaults={
+                'posts_count': sum(authors.values()),
+                'authors_count': len(authors),
+                'last_activity': posts.aggregate(
+                    last=Max('pub_date')
+                )['last'],
+            },
+        )
+    return stats
+
+
+def _adjust_group_author(group_id, author_id, posts):
+    """
+    Меняет число постов автора в группе. Возвращает +1, если автор
+    появился в группе, -1, если ушёл из неё, иначе 0.
+    """
+    updated = GroupAuthor.objects.filter(
+        group_id=group_id, author_id=author_id
+    ).update(posts_count=Greatest(F('posts_count') + posts, 0))
+    if not updated:
+        if posts <= 0:
+            return 0
+        try:
+            with transaction.atomic():
+                GroupAuthor.objects.create(
+                    group_id=group_id, author_id=author_id, posts_count=posts
+                )
+        except IntegrityError:
+            return _adjust_group_author(group_id, author_id, posts)
+        return 1
+    if posts < 0:
+        deleted, _ = GroupAuthor.objects.filter(
+            group_id=group_id, author_id=author_id, posts_count=0
+        ).delete()
+        return -1 if deleted else 0
+    return 0
+
+
+def adjust_group(group_id, author_id, posts, pub_date=None):
+    """
+    Учитывает пост автора, добавленный в группу (posts=1, pub_date —
+    его дата) или убранный из неё (posts=-1).
+    """
+    if group_id is None:
+        return
+    with transaction.atomic():
+        authors = _adjust_group_author(group_id, author_id, posts)
+        changes = {
+            'posts_count': Greatest(F('posts_count') + posts, 0),
+            'authors_count': Greatest(F('authors_count') + authors, 0),
+        }
+        if pub_date is not None:
+            date = Value(pub_date, output_field=DateTimeField())
+            changes['last_activity'] = Coalesce(
+                Greatest(F('last_activity'), date), date
+            )
+        elif posts < 0:
+            # Последним мог быть убранный пост; индекс (group, pub_date)
+            # даёт новую дату без просмотра всех постов группы.
+            changes['last_activity'] = Subquery(
+                Post.objects.filter(group_id=group_id)
+                .order_by('-pub_date').values('pub_date')[:1]
+            )
+        updated = GroupStats.objects.filter(group_id=group_id).update(
+            **changes
+        )
+        if not updated and posts > 0:
+            recount_group(group_id)
+
+
+def group_stats(group):
+    """Счётчики группы; недостающая строка создаётся по факту."""
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        group.stats = recount_group(group.pk)
+        return group.stats
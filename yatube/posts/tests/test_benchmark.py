@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from .. import benchmark
+from ..models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        call_command(
+            'generate_content', users=10, groups=2, posts=30, comments=20,
+            follows_per_user=3, stdout=StringIO(),
+        )
+
+    def test_generate_content(self):
+        """Генератор создаёт данные и обновляет производные таблицы."""
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            30,
+        )
+
+    def test_benchmark_saves_and_compares(self):
+        """Прогон сохраняет сводку и сравнивает следующий прогон с ней."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+        out = StringIO()
+        call_command(
+            'benchmark', requests=3, warmup=1, save=path, stdout=out
+        )
+        with open(path, encoding='utf-8') as stream:
+            results = json.load(stream)['results']
+        self.assertEqual(
+            set(results),
+            {f'{name}@1' for name in benchmark.scenarios()},
+        )
+        for summary in results.values():
+            self.assertEqual(summary['errors'], 0)
+            self.assertIsNotNone(summary['queries'])
+        # Прогретая лента отдаётся из кэша фрагментов без запросов.
+        self.assertEqual(results['index@1']['queries'], 0)
+        call_command(
+            'benchmark', requests=3, warmup=0, scenarios=['index'],
+            baseline=path, threshold=10 ** 6, stdout=out,
+        )
+
+    def test_compare_flags_regressions(self):
+        """Рост метрики сверх порога считается регрессией."""
+        rows = benchmark.compare(
+            {'index@1': {'p50': 12, 'p95': 20, 'p99': 30, 'queries': 4}},
+            {'index@1': {'p50': 10, 'p95': 20, 'p99': 30, 'queries': 4}},
+            threshold=10,
+        )
+        self.assertEqual(
+            [row[:2] for row in rows if row[5]], [('index@1', 'p50')]
+        )
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark', scenarios=['missing'])
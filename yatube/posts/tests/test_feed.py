@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..feed import follow_feed
+from ..models import FeedEntry, Follow, Post
+
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост попадает в неё сразу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('post_id', flat=True)),
+            {self.old_post.pk, new_post.pk},
+        )
+        self.assertEqual(
+            list(follow_feed(self.reader)), [new_post, self.old_post]
+        )
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertFalse(follow_feed(self.reader).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора подмешиваются при чтении ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(
+            list(follow_feed(self.reader)), [new_post, self.old_post]
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_leaving_pull_mode_is_materialized(self):
+        """Посты и подписки периода подмешивания попадают в ленты."""
+        other = User.objects.create_user(username='Other')
+        other_follow = Follow.objects.create(user=other, author=self.author)
+        # Автор уже подмешивается при чтении: ленту читателя не заполнить.
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.reader).exists()
+        )
+        other_follow.delete()
+        self.assertEqual(
+            set(
+                FeedEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)
+            ),
+            {self.old_post.pk, new_post.pk},
+        )
+        self.assertEqual(
+            list(follow_feed(self.reader)), [new_post, self.old_post]
+        )
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+
+User = get_user_model()
+
+
+class SyndicationFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост для ленты', author=cls.author, group=cls.group
+        )
+        Post.objects.create(
+            text='Пост без группы',
+            author=User.objects.create_user(username='Other'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_posts(self):
+        """RSS и Atom главной, группы и автора содержат свои посты."""
+        feeds = {
+            reverse('posts:index_rss'): 2,
+            reverse('posts:index_atom'): 2,
+            reverse('posts:group_rss', kwargs={'slug': 'test-slug'}): 1,
+            reverse('posts:group_atom', kwargs={'slug': 'test-slug'}): 1,
+            reverse('posts:profile_rss', kwargs={'username': 'Author'}): 1,
+            reverse('posts:profile_atom', kwargs={'username': 'Author'}): 1,
+        }
+        for url, total in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                tag = b'<entry>' if 'atom' in url else b'<item>'
+                self.assertEqual(response.content.count(tag), total)
+                self.assertIn('Пост для ленты'.encode(), response.content)
+
+    def test_unknown_group(self):
+        response = self.client.get(
+            reverse('posts:group_rss', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_document_is_cached_per_version(self):
+        """Повторный опрос идёт из кэша, новый пост даёт новый документ."""
+        url = reverse('posts:group_rss', kwargs={'slug': 'test-slug'})
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, first.content)
+        Post.objects.create(
+            text='Свежий пост', author=self.author, group=self.group
+        )
+        self.assertIn('Свежий пост'.encode(), self.client.get(url).content)
+
+    def test_conditional_get(self):
+        """If-Modified-Since и If-None-Match дают 304."""
+        url = reverse('posts:index_atom')
+        response = self.client.get(url)
+        for header, value in (
+            ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+            ('HTTP_IF_NONE_MATCH', response['ETag']),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(
+                    self.client.get(url, **{header: value}).status_code, 304
+                )
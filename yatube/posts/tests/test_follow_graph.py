@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow
+
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """Подписка и отписка сбрасывают закэшированные множества."""
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.assertEqual(follow_graph.counts(self.author.pk), (0, 0))
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Author'}
+        ))
+        for queries in (2, 0):
+            with self.assertNumQueries(queries):
+                self.assertTrue(
+                    follow_graph.is_following(self.reader.pk, self.author.pk)
+                )
+                self.assertEqual(follow_graph.counts(self.author.pk), (1, 0))
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Author'}
+        ))
+        for queries in (2, 0):
+            with self.assertNumQueries(queries):
+                self.assertFalse(
+                    follow_graph.is_following(self.reader.pk, self.author.pk)
+                )
+                self.assertEqual(follow_graph.counts(self.author.pk), (0, 0))
+
+    def test_rolled_back_follow_leaves_cache_intact(self):
+        """Отменённая подписка не попадает в кэш."""
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+            raise RuntimeError
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.author.pk)
+        )
+        self.assertEqual(follow_graph.counts(self.author.pk), (0, 0))
+
+    def test_mutual(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertFalse(
+            follow_graph.is_mutual(self.reader.pk, self.author.pk)
+        )
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertTrue(
+            follow_graph.is_mutual(self.reader.pk, self.author.pk)
+        )
+
+    def test_profile_shows_counts_without_extra_queries(self):
+        """Профиль показывает счётчики и при тёплом кэше не ходит за ними."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+        url = reverse('posts:profile', kwargs={'username': 'Author'})
+        response = self.client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertTrue(response.context['mutual'])
+        self.assertEqual(response.context['followers_count'], 1)
+        self.assertEqual(response.context['following_count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([
+            query for query in queries
+            if 'posts_follow' in query['sql']
+        ])
+
+    def test_suggestions(self):
+        """Рекомендуются авторы, на которых подписаны авторы читателя."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.other)
+        call_command('suggest_follows', stdout=StringIO())
+        self.assertEqual(
+            follow_graph.suggestions(self.reader.pk),
+            [(self.other.pk, 'Other')],
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.assertEqual(follow_graph.suggestions(self.reader.pk), [])
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -75,7 +76,6 @@ class PostsCreateFormTest(TestCase):
         )
         sorted_posts = Post.objects.order_by('-id')
         new_post = sorted_posts[0]
-        picture = f'posts/{uploaded}'
         self.assertRedirects(
             response,
             reverse('posts:profile', kwargs={'username': self.user.username}))
@@ -83,7 +83,10 @@ class PostsCreateFormTest(TestCase):
         self.assertEqual(new_post.text, form_data['text'])
         self.assertEqual(new_post.group.pk, form_data['group'])
         self.assertEqual(new_post.author, self.user)
-        self.assertEqual(new_post.image, picture)
+        # Файл назван по SHA-256 сохранённого содержимого.
+        with new_post.image.open() as stored:
+            digest = hashlib.sha256(stored.read()).hexdigest()
+        self.assertEqual(new_post.image, f'posts/{digest}.gif')
 
     def test_post_edit_form(self):
         """Пост корректно отредактирован с помощью формы."""
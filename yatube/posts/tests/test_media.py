@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import thumbnails
+from .. import media
+from ..models import MediaFile, Post
+
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def gif(name='small.gif', content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, 'image/gif')
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(TEMP_DIR, 'media'),
+    WRITE_QUEUE_PATH=os.path.join(TEMP_DIR, 'queue.sqlite3'),
+    THUMBNAIL_PREGENERATE_WORKERS=0,
+    MEDIA_GC_GRACE=60,
+)
+class MediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, upload):
+        return Post.objects.create(
+            text='Пост', author=self.user, image=upload
+        )
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).references
+
+    def age(self, name):
+        """Делает файл старше срока, после которого его можно удалить."""
+        moment = time.time() - 3600
+        os.utime(media.storage().path(name), (moment, moment))
+
+    def collect(self):
+        call_command('collect_media', stdout=StringIO())
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом со счётчиком ссылок."""
+        first = self.create(gif('first.gif'))
+        second = self.create(gif('second.GIF'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{64}\.gif$')
+        self.assertEqual(media.storage().listdir('posts')[1], [
+            os.path.basename(first.image.name)
+        ])
+        self.assertEqual(self.references(first.image.name), 2)
+        first.delete()
+        self.assertEqual(self.references(second.image.name), 1)
+
+    def test_changed_image_releases_previous(self):
+        """Смена картинки переносит ссылку на новый файл."""
+        post = self.create(gif())
+        previous = post.image.name
+        post.image = gif(content=SMALL_GIF.replace(b'\xFF', b'\xFE'))
+        post.save()
+        self.assertEqual(self.references(previous), 0)
+        self.assertEqual(self.references(post.image.name), 1)
+
+    def test_garbage_collection(self):
+        """Удаляются старые файлы без ссылок и их миниатюры."""
+        kept = self.create(gif())
+        orphan = self.create(gif(content=SMALL_GIF.replace(b'\xFF', b'\xFE')))
+        for post in (kept, orphan):
+            thumbnails.generate(post.image.name)
+        young = media.storage().save(
+            'posts/young.gif', gif(content=SMALL_GIF.replace(b'\x0C', b'\x0D'))
+        )
+        stray = default_storage.save('cache/00/00/stray.gif', gif())
+        for name in (kept.image.name, orphan.image.name, stray):
+            self.age(name)
+        # Пост теряет картинку мимо сигналов: счётчик исправит пересчёт.
+        Post.objects.filter(pk=orphan.pk).update(image='')
+        self.collect()
+        storage = media.storage()
+        self.assertTrue(storage.exists(kept.image.name))
+        self.assertTrue(storage.exists(young))
+        self.assertFalse(storage.exists(orphan.image.name))
+        self.assertFalse(storage.exists(stray))
+        self.assertFalse(
+            MediaFile.objects.filter(name=orphan.image.name).exists()
+        )
+        self.assertNotEqual(
+            thumbnails.thumbnail_url(kept.image, '960x339'), kept.image.url
+        )
+
+    def test_deduplicate_renames_old_files(self):
+        """Старые файлы с случайными именами сводятся в один."""
+        storage = media.storage()
+        names = []
+        for index in range(2):
+            path = storage.path(f'posts/image_{index}.gif')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(SMALL_GIF)
+            names.append(f'posts/image_{index}.gif')
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.user, image=name) for name in names
+        )
+        call_command('collect_media', deduplicate=True, stdout=StringIO())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertEqual(self.references(images.pop()), 2)
+
+    def test_repeated_upload_is_not_collected(self):
+        """Повторная загрузка старого файла без ссылок спасает его."""
+        orphan = self.create(gif())
+        name = orphan.image.name
+        self.age(name)
+        orphan.delete()
+        # Файл формы уже сохранён, а пост ещё не создан.
+        self.assertEqual(media.storage().save('posts/again.gif', gif()), name)
+        self.collect()
+        self.assertTrue(media.storage().exists(name))
+
+    def test_normalize_images_changes_extension(self):
+        """Перекодированный в JPEG оригинал получает расширение .jpg."""
+        buffer = BytesIO()
+        Image.new('RGB', (200, 200), 'red').save(buffer, 'BMP')
+        post = self.create(SimpleUploadedFile(
+            'picture.bmp', buffer.getvalue(), 'image/bmp'
+        ))
+        self.assertTrue(post.image.name.endswith('.bmp'))
+        call_command('normalize_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{64}\.jpg$')
+        with media.storage().open(post.image.name) as file:
+            self.assertEqual(Image.open(file).format, 'JPEG')
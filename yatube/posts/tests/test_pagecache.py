@@ -0,0 +1,183 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import pagecache
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE=True)
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-group',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            text='Пост в группе',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.guest = Client()
+
+    def get(self, url, client=None):
+        response = (client or self.guest).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_guest_page_is_served_from_cache(self):
+        """Повторный запрос гостя не доходит до представления."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        first = self.get(url)
+        second = self.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+
+    def test_proxy_headers(self):
+        """Ответ гостю разрешено хранить прокси, он помечен областями."""
+        response = self.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=60', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=30', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertEqual(
+            set(response['Surrogate-Key'].split()),
+            {
+                f'post:{self.post.pk}',
+                f'author:{self.author.pk}',
+                f'group:{self.group.pk}',
+            },
+        )
+
+    def test_post_save_purges_only_affected_pages(self):
+        """Правка поста сбрасывает его страницы, но не чужую группу."""
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'other': reverse(
+                'posts:group_list', args=[self.other_group.slug]
+            ),
+            'detail': reverse('posts:post_detail', args=[self.post.pk]),
+            'about': reverse('about:author'),
+        }
+        for url in urls.values():
+            self.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        states = {
+            name: self.get(url)['X-Page-Cache'] for name, url in urls.items()
+        }
+        self.assertEqual(states, {
+            'index': 'miss',
+            'group': 'miss',
+            'other': 'hit',
+            'detail': 'miss',
+            'about': 'hit',
+        })
+        self.assertContains(self.get(urls['detail']), 'Исправленный пост')
+
+    def test_follow_purges_profile(self):
+        """Новый подписчик виден на профиле автора сразу."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.get(url)
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+
+    def test_group_rename_purges_author_and_post_pages(self):
+        """Новое название группы видно на профиле и странице поста."""
+        urls = [
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+        for url in urls:
+            self.get(url)
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        self.addCleanup(setattr, self.group, 'title', 'Группа')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'Переименованная группа')
+
+    def test_username_change_purges_feeds(self):
+        """Новое имя автора видно в общей ленте и ленте группы."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ]
+        for url in urls:
+            self.get(url)
+        self.author.username = 'RenamedAuthor'
+        self.author.save()
+        self.addCleanup(setattr, self.author, 'username', 'Author')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'RenamedAuthor')
+
+    def test_comment_purges_commenter_profile(self):
+        """Число комментариев на профиле комментатора обновляется сразу."""
+        commenter = User.objects.create_user(username='Commenter')
+        url = reverse('posts:profile', args=[commenter.username])
+        self.assertContains(self.get(url), 'Всего комментариев: 0')
+        comment = Comment.objects.create(
+            text='Комментарий', author=commenter, post=self.post
+        )
+        response = self.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Всего комментариев: 1')
+        self.get(url)
+        comment.delete()
+        self.assertContains(self.get(url), 'Всего комментариев: 0')
+
+    def test_stale_page_is_rebuilt_by_one_request(self):
+        """Пока один запрос перестраивает страницу, другие видят старую."""
+        url = reverse('posts:index')
+        self.get(url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        lock = pagecache._lock_key(pagecache._key(RequestFactory().get(url)))
+        # Блокировку держит запрос, который уже перестраивает страницу.
+        caches['pages'].add(lock, True)
+        stale = self.get(url)
+        self.assertEqual(stale['X-Page-Cache'], 'stale')
+        self.assertNotContains(stale, 'Новый пост')
+        caches['pages'].delete(lock)
+        rebuilt = self.get(url)
+        self.assertEqual(rebuilt['X-Page-Cache'], 'miss')
+        self.assertContains(rebuilt, 'Новый пост')
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'hit')
+
+    def test_authenticated_user_is_not_cached(self):
+        """Страницы пользователя не кэшируются и помечены private."""
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('posts:index')
+        self.get(url, client)
+        response = self.get(url, client)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIsNotNone(response.context)
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_PER_PAGE
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+MAX_QUERIES_PER_PAGE = 8
+
+
+class FeedQueryCountTest(TestCase):
+    """Число запросов на страницу не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_cats',
+            description='Описание группы',
+        )
+        cls.author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Первый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def add_posts(self):
+        """Заполняет страницу постами и комментариями разных авторов."""
+        for number in range(POSTS_PER_PAGE):
+            author = User.objects.create_user(username=f'Author{number}')
+            Follow.objects.create(user=self.reader, author=author)
+            post = Post.objects.create(
+                text=f'Текст поста {number}',
+                author=author,
+                group=self.group,
+            )
+            Comment.objects.create(
+                text='Комментарий', author=author, post=post
+            )
+            Comment.objects.create(
+                text='Комментарий к первому посту',
+                author=author,
+                post=self.post,
+            )
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        return len(queries)
+
+    def test_feed_query_count_is_constant(self):
+        """Ленты и страница поста не делают запросов на каждую запись."""
+        pages = {
+            reverse('posts:index'): self.client,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                self.client,
+            reverse('posts:profile', kwargs={'username': 'Author'}):
+                self.client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                self.client,
+            reverse('posts:follow_index'): self.reader_client,
+        }
+        before = {
+            url: self.count_queries(client, url)
+            for url, client in pages.items()
+        }
+        self.add_posts()
+        for url, client in pages.items():
+            with self.subTest(url=url):
+                after = self.count_queries(client, url)
+                self.assertEqual(after, before[url])
+                self.assertLessEqual(after, MAX_QUERIES_PER_PAGE)
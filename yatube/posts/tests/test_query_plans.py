@@ -0,0 +1,123 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_PER_PAGE
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+def query_plan(sql):
+    """Строки EXPLAIN QUERY PLAN для запроса SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    """
+    Полные сканирования таблиц и сортировки во временном B-дереве.
+
+    Проход по результату подзапроса (CO-ROUTINE, MATERIALIZE) — не скан
+    таблицы: его стоимость видна в шагах самого подзапроса.
+    """
+    problems = []
+    steps = query_plan(sql)
+    derived = {
+        step.split(' ', 1)[1] for step in steps
+        if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    for step in steps:
+        full_scan = step.startswith('SCAN') and ' USING ' not in step
+        if step[len('SCAN '):] in derived:
+            continue
+        if full_scan and 'VIRTUAL TABLE' not in step:
+            problems.append(step)
+        elif 'USE TEMP B-TREE' in step:
+            problems.append(step)
+    return problems
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы страниц идут по индексам, без полных сканов и сортировок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание группы',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(POSTS_PER_PAGE + 1):
+            cls.post = Post.objects.create(
+                text=f'Текст поста {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+            cls.comment = Comment.objects.create(
+                text='Комментарий', author=cls.reader, post=cls.post
+            )
+        for number in range(POSTS_PER_PAGE + 1):
+            reply = Comment(
+                text=f'Ответ {number}', author=cls.author, post=cls.post
+            )
+            reply.attach_to(cls.comment)
+            reply.save()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def assert_indexed(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(plan_problems(sql), [])
+        return response
+
+    def test_feed_pages(self):
+        """Ленты главной, группы, профиля и подписок."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:follow_index'),
+        ):
+            response = self.assert_indexed(url)
+            next_query = response.context['page_obj'].next_query
+            self.assert_indexed(f'{url}?{next_query}')
+            next_cursor = response.context['page_obj'].next_cursor
+            self.assert_indexed(url, {'cursor': next_cursor})
+
+    def test_post_detail(self):
+        """Страница поста с комментариями и первыми ответами веток."""
+        self.assert_indexed(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+
+    def test_comment_replies(self):
+        """Страницы ответов ветки."""
+        url = reverse('posts:comment_replies', kwargs={
+            'post_id': self.post.pk, 'comment_id': self.comment.pk
+        })
+        response = self.assert_indexed(url)
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assert_indexed(url, {'cursor': next_cursor})
@@ -0,0 +1,128 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..admin import PostAdmin
+from ..models import Comment, Group, Post
+from ..stemmer import stem
+
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова приводятся к одной основе."""
+        self.assertEqual(stem('котики'), stem('Котик'))
+        self.assertEqual(stem('котов'), 'кот')
+        self.assertEqual(stem('Python'), 'python')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+        cls.other = User.objects.create_user(username='OtherUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_finds_word_forms_and_highlights(self):
+        """Поиск учитывает морфологию и подсвечивает найденное."""
+        post = Post.objects.create(
+            text='Мои котики спят на <b>диване</b>', author=self.user
+        )
+        Post.objects.create(text='Про собак', author=self.user)
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        results = response.context['results']
+        self.assertEqual([result.post for result in results], [post])
+        self.assertEqual(
+            results[0].snippet,
+            'Мои <mark>котики</mark> спят на &lt;b&gt;диване&lt;/b&gt;',
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        """Индекс обновляется при изменении и удалении записей."""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(search.search('старый')[0], [])
+        self.assertEqual(len(search.search('новый')[0]), 1)
+        post.delete()
+        self.assertEqual(search.search('новый')[0], [])
+
+    def test_comments_and_filters(self):
+        """Комментарии ищутся, фильтры по группе и автору работают."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group
+        )
+        comment = Comment.objects.create(
+            text='Отличная фотография', author=self.other, post=post
+        )
+        Post.objects.create(text='Фотографии без группы', author=self.user)
+        hits, _ = search.search('фотография', group_id=self.group.pk)
+        self.assertEqual(
+            [(hit.kind, hit.object_id) for hit in hits],
+            [(search.COMMENT, comment.pk)],
+        )
+        hits, _ = search.search('фотография', author_id=self.user.pk)
+        self.assertEqual([hit.kind for hit in hits], [search.POST])
+
+    def test_keyset_pagination(self):
+        """Страницы выдачи идут по курсору без повторов."""
+        for number in range(5):
+            Post.objects.create(
+                text=f'Новость номер {number}', author=self.user
+            )
+        first, cursor = search.search('новость', limit=3)
+        second, last_cursor = search.search('новость', cursor=cursor, limit=3)
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertIsNone(last_cursor)
+        found = {hit.object_id for hit in first + second}
+        self.assertEqual(len(found), 5)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        Post.objects.create(text='Потерянный пост', author=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search.search('потерянный')[0]), 1)
+
+    def test_rebuild_inserts_in_batches(self):
+        """Индекс строится пачками, и ни одна строка не теряется."""
+        post = Post.objects.create(text='Первый пост', author=self.user)
+        Post.objects.create(text='Второй пост', author=self.user)
+        Comment.objects.create(
+            text='Пост хороший', author=self.user, post=post
+        )
+        with mock.patch.object(search, 'BATCH_SIZE', 2):
+            self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(len(search.search('пост', limit=5)[0]), 3)
+
+    def test_admin_warns_about_search_limit(self):
+        """Админка сообщает, что показаны не все совпадения."""
+        admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='secret'
+        )
+        self.client.force_login(admin)
+        for number in range(3):
+            Post.objects.create(text=f'Заметка {number}', author=self.user)
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch.object(PostAdmin, 'search_limit', 2):
+            response = self.client.get(url, {'q': 'заметка'})
+        self.assertContains(response, 'Показаны 2 самых релевантных')
+        response = self.client.get(url, {'q': 'заметка'})
+        self.assertNotContains(response, 'самых релевантных')
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.templatetags.user_filters import total_comments, total_posts
+from ..models import AuthorStats, Comment, Group, GroupStats, Post
+
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются при создании и удалении постов и комментариев."""
+        post = Post.objects.create(text='Текст поста', author=self.user)
+        Post.objects.create(text='Ещё один пост', author=self.user)
+        Comment.objects.create(text='Комментарий', author=self.user, post=post)
+        stats = AuthorStats.objects.get(author=self.user)
+        self.assertEqual((stats.posts_count, stats.comments_count), (2, 1))
+        post.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.posts_count, stats.comments_count), (1, 0))
+
+    def test_filters_read_stored_counters(self):
+        """Фильтры шаблона не выполняют COUNT по постам."""
+        Post.objects.create(text='Текст поста', author=self.user)
+        author = User.objects.select_related('stats').get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(total_posts(author), 1)
+            self.assertEqual(total_comments(author), 0)
+
+    def test_command_repairs_drift(self):
+        """Команда recount_author_stats исправляет расхождения."""
+        Post.objects.create(text='Текст поста', author=self.user)
+        AuthorStats.objects.filter(author=self.user).update(posts_count=7)
+        call_command('recount_author_stats', stdout=StringIO())
+        stats = AuthorStats.objects.get(author=self.user)
+        self.assertEqual(stats.posts_count, 1)
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+        cls.other = User.objects.create_user(username='OtherUser')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.second_group = Group.objects.create(
+            title='Вторая группа',
+            slug='second-group',
+            description='Описание',
+        )
+
+    def stats(self, group):
+        stats = GroupStats.objects.get(group=group)
+        return stats.posts_count, stats.authors_count, stats.last_activity
+
+    def test_counters_follow_posts(self):
+        """Счётчики группы меняются при создании, переносе и удалении."""
+        Post.objects.create(text='Первый', author=self.user, group=self.group)
+        second = Post.objects.create(
+            text='Второй', author=self.user, group=self.group
+        )
+        last = Post.objects.create(
+            text='Третий', author=self.other, group=self.group
+        )
+        self.assertEqual(self.stats(self.group), (3, 2, last.pub_date))
+        last.group = self.second_group
+        last.save()
+        self.assertEqual(self.stats(self.group), (2, 1, second.pub_date))
+        self.assertEqual(self.stats(self.second_group), (1, 1, last.pub_date))
+        last.delete()
+        self.assertEqual(self.stats(self.second_group), (0, 0, None))
+
+    def test_directory_reads_stored_counters(self):
+        """Список групп не считает посты по таблице постов."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        stats = GroupStats.objects.filter(group=self.second_group)
+        stats.delete()
+        url = reverse('posts:groups')
+        # Недостающая строка создаётся при первом показе.
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(
+            [group.stats.posts_count for group in response.context['groups']],
+            [0, 1],
+        )
+
+    def test_command_repairs_drift(self):
+        """Команда recount_group_stats исправляет расхождения."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group
+        )
+        GroupStats.objects.filter(group=self.group).update(
+            posts_count=7, authors_count=3, last_activity=None
+        )
+        Post.objects.filter(pk=post.pk).update(group=self.second_group)
+        call_command('recount_group_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.group), (0, 0, None))
+        self.assertEqual(self.stats(self.second_group), (1, 1, post.pub_date))
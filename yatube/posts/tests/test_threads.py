@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import threads
+from ..models import Comment, Post
+
+
+User = get_user_model()
+
+
+@override_settings(COMMENT_REPLIES_PREVIEW=2, COMMENT_MAX_DEPTH=3)
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(
+            text='Пост с ветками',
+            author=User.objects.create_user(username='Author'),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.root = Comment.objects.create(
+            text='Корень', author=self.user, post=self.post
+        )
+
+    def reply(self, parent, text='Ответ'):
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': text, 'parent': parent.pk},
+        )
+        return Comment.objects.get(text=text)
+
+    def detail(self):
+        return self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+
+    def test_reply_is_placed_in_thread(self):
+        """Ответ получает ветку, глубину и путь, а корень — счётчик."""
+        first = self.reply(self.root, 'Первый')
+        second = self.reply(first, 'Второй')
+        self.assertEqual(second.parent, first)
+        self.assertEqual(second.thread, self.root)
+        self.assertEqual(second.depth, 2)
+        self.assertTrue(second.path.startswith(first.path))
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.replies_count, 2)
+        second.delete()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.replies_count, 1)
+
+    def test_reply_created_with_parent_joins_thread(self):
+        """Ответ, созданный через parent=, тоже попадает в ветку."""
+        first = Comment.objects.create(
+            text='Первый', author=self.user, post=self.post, parent=self.root
+        )
+        second = Comment.objects.create(
+            text='Второй', author=self.user, post=self.post, parent=first
+        )
+        self.assertEqual((second.thread, second.depth), (self.root, 2))
+        self.assertTrue(second.path.startswith(first.path))
+        self.assertEqual(
+            list(threads.replies(self.root)), [first, second]
+        )
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.replies_count, 2)
+
+    def test_depth_is_capped(self):
+        """Ответ на самый глубокий комментарий становится его соседом."""
+        parent = self.root
+        for level in range(3):
+            parent = self.reply(parent, f'Уровень {level + 1}')
+        deepest = self.reply(parent, 'Глубже некуда')
+        self.assertEqual(deepest.depth, 3)
+        self.assertEqual(deepest.parent, parent.parent)
+
+    def test_foreign_parent_is_rejected(self):
+        """Нельзя ответить на комментарий к другому посту."""
+        other = Comment.objects.create(
+            text='Чужой',
+            author=self.user,
+            post=Post.objects.create(text='Другой пост', author=self.user),
+        )
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Ответ', 'parent': other.pk},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_post_detail_shows_preview(self):
+        """На странице поста — корни и первые ответы веток в порядке дерева."""
+        first = self.reply(self.root, 'Первый')
+        nested = self.reply(first, 'Вложенный')
+        self.reply(self.root, 'Третий')
+        response = self.detail()
+        roots = list(response.context['page_obj'])
+        self.assertEqual(roots, [self.root])
+        self.assertEqual(roots[0].preview_replies, [first, nested])
+        self.assertEqual(roots[0].hidden_replies, 1)
+        self.assertContains(
+            response,
+            reverse('posts:comment_replies', kwargs={
+                'post_id': self.post.pk, 'comment_id': self.root.pk
+            }),
+        )
+
+    def test_post_detail_query_count_is_bounded(self):
+        """Длинные ветки не добавляют запросов странице поста."""
+        self.reply(self.root, 'Первый')
+        with CaptureQueriesContext(connection) as before:
+            self.detail()
+        for number in range(10):
+            Comment.objects.create(
+                text=f'Корень {number}', author=self.user, post=self.post
+            ).save()
+            self.reply(self.root, f'Ещё ответ {number}')
+        with CaptureQueriesContext(connection) as after:
+            self.detail()
+        self.assertEqual(len(after), len(before))
+
+    def test_replies_page(self):
+        """Все ответы ветки отдаются отдельной страницей и фрагментом."""
+        replies = [self.reply(self.root, f'Ответ {number}') for number in
+                   range(3)]
+        url = reverse('posts:comment_replies', kwargs={
+            'post_id': self.post.pk, 'comment_id': self.root.pk
+        })
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['page_obj']), replies)
+        self.assertTemplateUsed(response, 'posts/comment_replies.html')
+        fragment = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        self.assertContains(fragment, 'Ответ 2')
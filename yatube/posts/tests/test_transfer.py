@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.dateparse import parse_datetime
+
+from .. import search
+from ..models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                      GroupAuthor, GroupStats, Post)
+
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Пост про котиков', author=self.author, group=self.group
+        )
+        Comment.objects.create(
+            text='Комментарий', author=self.reader, post=self.post
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def round_trip(self, extension):
+        paths = {}
+        for model in ('group', 'post', 'comment', 'follow'):
+            paths[model] = os.path.join(TEMP_DIR, f'{model}.{extension}')
+            call_command(
+                'export_content', model, paths[model], stderr=StringIO()
+            )
+        pub_date = self.post.pub_date
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        for model, path in paths.items():
+            call_command(
+                'import_content', model, path,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments.get().author, self.reader)
+        return post
+
+    def test_ndjson_round_trip_repairs_derived_data(self):
+        """Импорт восстанавливает счётчики, ленты и поисковый индекс."""
+        post = self.round_trip('ndjson')
+        self.assertEqual(post.group.slug, 'test-slug')
+        stats = AuthorStats.objects.get(author=self.reader)
+        self.assertEqual(stats.comments_count, 1)
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.author
+        ).posts_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post_id=self.post.pk
+        ).exists())
+        self.assertEqual(len(search.search('котик')[0]), 1)
+
+    def test_csv_round_trip(self):
+        """CSV сохраняет пустые значения и даты."""
+        self.post.group = None
+        self.post.save()
+        self.assertIsNone(self.round_trip('csv').group)
+
+    def test_repeated_import_skips_existing(self):
+        """Повторный импорт не дублирует записи."""
+        path = os.path.join(TEMP_DIR, 'again.ndjson')
+        call_command('export_content', 'post', path, stderr=StringIO())
+        out = StringIO()
+        call_command(
+            'import_content', 'post', path, stdout=out, stderr=StringIO()
+        )
+        self.assertIn('Создано: 0, пропущено: 1', out.getvalue())
+
+    def test_follow_import_counts_inserted_rows(self):
+        """Повторы и существующие подписки считаются пропущенными."""
+        other = User.objects.create_user(username='Other')
+        path = os.path.join(TEMP_DIR, 'follows.ndjson')
+        with open(path, 'w') as file:
+            for user, author in (
+                ('Reader', 'Author'), ('Other', 'Author'),
+                ('Other', 'Author'), ('Other', 'Other'),
+            ):
+                file.write(f'{{"user": "{user}", "author": "{author}"}}\n')
+        out = StringIO()
+        call_command(
+            'import_content', 'follow', path, stdout=out, stderr=StringIO()
+        )
+        self.assertIn('Создано: 1, пропущено: 3', out.getvalue())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=other, post_id=self.post.pk
+        ).exists())
+
+    def test_post_import_updates_existing_group_stats(self):
+        """Импорт в существующую группу обновляет её счётчики."""
+        other = User.objects.create_user(username='Other')
+        path = os.path.join(TEMP_DIR, 'group_posts.ndjson')
+        rows = [
+            (1001, 'Author', '2030-01-01T10:00:00+00:00'),
+            (1002, 'Other', '2030-01-02T10:00:00+00:00'),
+            (1003, 'Other', '2030-01-03T10:00:00+00:00'),
+        ]
+        with open(path, 'w') as file:
+            for pk, author, pub_date in rows:
+                file.write(json.dumps({
+                    'id': pk, 'text': 'Импорт', 'pub_date': pub_date,
+                    'author': author, 'group': 'test-slug', 'image': '',
+                }) + '\n')
+        call_command(
+            'import_content', 'post', path,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+        stats = GroupStats.objects.get(group=self.group)
+        self.assertEqual(stats.posts_count, 4)
+        self.assertEqual(stats.authors_count, 2)
+        self.assertEqual(
+            stats.last_activity, parse_datetime(rows[-1][2])
+        )
+        self.assertEqual(
+            dict(GroupAuthor.objects.filter(group=self.group).values_list(
+                'author_id', 'posts_count'
+            )),
+            {self.author.pk: 2, other.pk: 2},
+        )
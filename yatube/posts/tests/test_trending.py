@@ -0,0 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Group, Post, PostScore
+
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+        cls.new_post = Post.objects.create(
+            text='Новый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(
+                text='Комментарий', author=self.reader, post=post
+            )
+
+    def test_update_is_incremental(self):
+        """Каждое событие учитывается ровно один раз."""
+        self.comment(self.old_post, 2)
+        self.assertEqual(trending.update(batch_size=1), 2)
+        self.assertEqual(trending.update(), 0)
+        self.comment(self.old_post)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(trending.update(), 2)
+        old_score = PostScore.objects.get(post=self.old_post)
+        self.assertEqual((old_score.comments, old_score.follows), (3, 0))
+        # Подписка засчитана последнему посту автора.
+        new_score = PostScore.objects.get(post=self.new_post)
+        self.assertEqual((new_score.comments, new_score.follows), (0, 1))
+        self.assertAlmostEqual(trending.score(old_score.rank), 3, places=3)
+
+    def test_older_events_weigh_less(self):
+        """Давний комментарий весит меньше свежего, порядок — по rank."""
+        self.comment(self.old_post, 3)
+        self.comment(self.new_post)
+        two_days_ago = timezone.now() - timedelta(days=2)
+        Comment.objects.filter(post=self.old_post).update(
+            created=two_days_ago
+        )
+        trending.update()
+        self.assertEqual(
+            list(trending.popular()), [self.new_post, self.old_post]
+        )
+        self.assertEqual(
+            list(trending.popular(self.group.pk)), [self.new_post]
+        )
+
+    @override_settings(TRENDING_MIN_SCORE=0.5)
+    def test_prune_drops_faded_scores(self):
+        """Затухший рейтинг удаляется, пост пропадает из популярного."""
+        self.comment(self.old_post)
+        self.comment(self.new_post)
+        Comment.objects.filter(post=self.old_post).update(
+            created=timezone.now() - timedelta(days=3)
+        )
+        trending.update()
+        self.assertEqual(trending.prune(), 1)
+        self.assertFalse(PostScore.objects.filter(post=self.old_post).exists())
+
+    def test_popular_views(self):
+        """Популярное и популярное группы обновляются после команды."""
+        self.comment(self.new_post)
+        call_command('update_trending', '--once', stdout=StringIO())
+        response = self.client.get(reverse('posts:popular'))
+        self.assertEqual(list(response.context['posts']), [self.new_post])
+        response = self.client.get(
+            reverse('posts:group_popular', args=[self.group.slug])
+        )
+        self.assertContains(response, self.new_post.text)
+        self.new_post.group = None
+        self.new_post.save()
+        self.assertEqual(list(trending.popular(self.group.pk)), [])
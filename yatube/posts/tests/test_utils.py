@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from yatube.settings import NUMBERED_PAGES, POSTS_PER_PAGE
+from ..models import Post
+from ..utils import KeysetPaginator, PageRedirect, paginator
+
+
+User = get_user_model()
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NewUser')
+        cls.posts_count = POSTS_PER_PAGE * (NUMBERED_PAGES + 2) + 3
+        Post.objects.bulk_create(
+            Post(text=f'Текст поста {number}', author=cls.user)
+            for number in range(cls.posts_count)
+        )
+        # Одинаковая дата у всех постов проверяет сортировку по pk.
+        Post.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_page(self, query=''):
+        request = self.factory.get('/?' + query)
+        return paginator(Post.objects.all(), request)
+
+    def test_cursor_walk_returns_every_post_once(self):
+        """Переход по ссылкам «Следующая» выдаёт все посты по одному разу."""
+        page_obj = self.get_page()
+        seen = list(page_obj)
+        while page_obj.has_next():
+            page_obj = self.get_page(page_obj.next_query)
+            seen.extend(page_obj)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), self.posts_count)
+
+    def test_deep_pages_use_cursor_links(self):
+        """После NUMBERED_PAGES ссылки строятся на курсорах."""
+        page_obj = self.get_page(f'page={NUMBERED_PAGES}')
+        self.assertEqual(page_obj.next_query, f'cursor={page_obj.next_cursor}')
+        next_page = self.get_page(page_obj.next_query)
+        self.assertEqual(next_page.number, NUMBERED_PAGES + 1)
+        self.assertEqual(
+            next_page.previous_query, f'page={NUMBERED_PAGES}'
+        )
+
+    def test_previous_cursor_returns_same_page(self):
+        """Курсор «Предыдущая» возвращает ту же страницу, что и номер."""
+        last = self.get_page(f'page={NUMBERED_PAGES}')
+        numbered = self.get_page(f'cursor={last.next_cursor}')
+        following = self.get_page(f'cursor={numbered.next_cursor}')
+        previous = self.get_page(f'cursor={following.previous_cursor}')
+        self.assertEqual(list(previous), list(numbered))
+        self.assertEqual(previous.number, numbered.number)
+
+    def test_deep_page_number_redirects_to_cursor(self):
+        """Номер дальше NUMBERED_PAGES ведёт на ссылку с курсором."""
+        last = self.get_page(f'page={NUMBERED_PAGES}')
+        with self.assertRaises(PageRedirect) as raised:
+            self.get_page(f'page={NUMBERED_PAGES + 1}')
+        self.assertEqual(raised.exception.query, last.next_query)
+        response = self.client.get(
+            reverse('posts:index'), {'page': NUMBERED_PAGES + 100}
+        )
+        self.assertRedirects(
+            response,
+            f"{reverse('posts:index')}?{last.next_query}",
+            fetch_redirect_response=False,
+        )
+
+    def test_page_out_of_range_is_not_found(self):
+        """Номер за последней страницей даёт 404, а не пустую страницу."""
+        post_list = Post.objects.filter(
+            pk__in=Post.objects.all()[:POSTS_PER_PAGE]
+        )
+        request = self.factory.get('/', {'page': 2})
+        with self.assertRaises(Http404):
+            paginator(post_list, request)
+
+    def test_mixed_ordering_is_rejected(self):
+        """Сортировка в разные стороны не подходит для ключа."""
+        with self.assertRaises(ValueError):
+            KeysetPaginator(
+                Post.objects.order_by('-pub_date', 'pk'), POSTS_PER_PAGE
+            )
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Повреждённый курсор открывает первую страницу."""
+        page_obj = self.get_page('cursor=broken')
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+
+    def test_other_query_parameters_are_kept(self):
+        """Ссылки сохраняют остальные параметры запроса."""
+        page_obj = self.get_page('q=text')
+        self.assertEqual(page_obj.next_query, 'q=text&page=2')
@@ -0,0 +1,123 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import view_counts
+from ..models import Post, PostScore
+
+
+User = get_user_model()
+
+
+@override_settings(VIEW_FLUSH_INTERVAL=60 * 60)
+class ViewCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.author)
+        cls.other_post = Post.objects.create(
+            text='Второй пост', author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        view_counts.clear()
+        self.guest = Client()
+        self.user = Client()
+        self.user.force_login(self.reader)
+
+    def view(self, client, post):
+        response = client.get(reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeated_views_are_counted_once(self):
+        """Повторный просмотр тем же зрителем не считается."""
+        self.view(self.guest, self.post)
+        self.view(self.guest, self.post)
+        self.view(self.user, self.post)
+        self.view(self.user, self.other_post)
+        self.assertEqual(
+            view_counts.pending(), {self.post.pk: 2, self.other_post.pk: 1}
+        )
+        self.client.get(reverse('posts:post_detail', args=[10 ** 6]))
+        self.assertNotIn(10 ** 6, view_counts.pending())
+
+    def test_flush_writes_batched_deltas(self):
+        """Перенос обновляет посты и рейтинг, пока буфер пуст — ничего."""
+        self.view(self.guest, self.post)
+        self.view(self.user, self.post)
+        self.view(self.user, self.other_post)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 0)
+        self.assertEqual(view_counts.flush(), 3)
+        self.assertEqual(
+            dict(Post.objects.values_list('pk', 'views')),
+            {self.post.pk: 2, self.other_post.pk: 1},
+        )
+        self.assertEqual(PostScore.objects.get(post=self.post).views, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(view_counts.flush(), 0)
+        self.assertContains(self.view(self.user, self.post), 'Просмотров')
+
+    @override_settings(VIEW_FLUSH_INTERVAL=0)
+    def test_flush_after_interval(self):
+        """По истечении интервала просмотр сразу переносит буфер."""
+        self.view(self.guest, self.post)
+        self.assertEqual(view_counts.pending(), {})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 1)
+
+    @override_settings(PAGE_CACHE=True)
+    def test_cached_page_is_counted(self):
+        """Просмотр страницы из кэша тоже считается."""
+        self.view(self.guest, self.post)
+        response = self.view(Client(HTTP_USER_AGENT='other'), self.post)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(view_counts.pending(), {self.post.pk: 2})
+
+    @override_settings(VIEW_COUNTS=False)
+    def test_counting_can_be_disabled(self):
+        self.view(self.guest, self.post)
+        self.assertEqual(view_counts.pending(), {})
+
+
+@override_settings(VIEW_FLUSH_INTERVAL=0.05)
+class ViewFlusherTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        view_counts.clear()
+        author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(text='Пост', author=author)
+        view_counts.start_flusher()
+        self.addCleanup(view_counts.stop_flusher)
+
+    def views(self):
+        return Post.objects.get(pk=self.post.pk).views
+
+    def test_views_reach_database_without_requests(self):
+        """Фоновый поток переносит просмотры без новых запросов."""
+        self.client.get(reverse('posts:post_detail', args=[self.post.pk]))
+        deadline = time.monotonic() + 5
+        while view_counts.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(view_counts.pending(), {})
+        # Дожидаемся конца транзакции потока, прежде чем читать базу.
+        view_counts.stop_flusher()
+        self.assertEqual(self.views(), 1)
+
+    @override_settings(VIEW_FLUSH_INTERVAL=60 * 60)
+    def test_stop_flushes_rest(self):
+        """Остановка потока переносит накопленное."""
+        view_counts.stop_flusher()
+        view_counts.start_flusher()
+        self.client.get(reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(view_counts.pending(), {self.post.pk: 1})
+        view_counts.stop_flusher()
+        self.assertEqual(self.views(), 1)
@@ -6,8 +6,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from yatube.settings import POSTS_PER_PAGE
@@ -307,17 +309,24 @@ class CacheTest(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='NewUser')
+        cls.other_user = User.objects.create_user(username='OtherUser')
 
     def setUp(self):
+        cache.clear()
         self.post = Post.objects.create(
             text='Текст поста',
             author=self.user,
         )
+        self.auth_user = Client()
+        self.auth_user.force_login(self.user)
+        self.other_auth_user = Client()
+        self.other_auth_user.force_login(self.other_user)
 
     def test_index_cache_has_correct_data_and_clear(self):
         """Кэш создаётся и очищается корректно."""
         response = self.client.get(reverse('posts:index'))
-        self.post.delete()
+        # update() не отправляет сигналов, поэтому фрагмент остаётся.
+        Post.objects.filter(pk=self.post.pk).update(text='Другой текст')
         cache_response = self.client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_response.content)
         cache.clear()
@@ -326,6 +335,65 @@ class CacheTest(TestCase):
             cache_response.content, clear_cache_response.content
         )
 
+    def test_feed_cache_invalidated_by_post_changes(self):
+        """Новый и удалённый пост сразу видны в лентах."""
+        names = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'NewUser'}),
+        ]
+        for name in names:
+            with self.subTest(name=name):
+                self.client.get(name)
+                new_post = Post.objects.create(
+                    text='Свежий пост', author=self.user
+                )
+                self.assertContains(self.client.get(name), 'Свежий пост')
+                new_post.delete()
+                self.assertNotContains(self.client.get(name), 'Свежий пост')
+
+    def test_cached_feed_skips_paginator_queries(self):
+        """Фрагмент из кэша отдаётся без запросов к постам."""
+        self.auth_user.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.auth_user.get(reverse('posts:index'))
+        self.assertContains(response, 'Текст поста')
+        self.assertFalse([
+            query for query in queries
+            if Post._meta.db_table in query['sql']
+        ])
+
+    def test_feed_cache_invalidated_by_group_delete(self):
+        """Удаление группы убирает её из лент авторов."""
+        group = Group.objects.create(
+            title='Удаляемая группа', slug='deleted-group'
+        )
+        self.post.group = group
+        self.post.save()
+        url = reverse('posts:profile', kwargs={'username': 'NewUser'})
+        self.assertContains(self.client.get(url), 'Удаляемая группа')
+        group.delete()
+        self.assertNotContains(self.client.get(url), 'Удаляемая группа')
+
+    def test_feed_cache_invalidated_by_username_change(self):
+        """Новое имя автора сразу видно в общей ленте."""
+        self.client.get(reverse('posts:index'))
+        self.user.username = 'RenamedUser'
+        self.user.save()
+        self.addCleanup(setattr, self.user, 'username', 'NewUser')
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'RenamedUser')
+
+    def test_feed_cache_is_not_shared_between_users(self):
+        """Ленты разных пользователей не попадают в чужой кэш."""
+        Follow.objects.create(user=self.other_user, author=self.user)
+        self.auth_user.get(reverse('posts:index'))
+        response = self.other_auth_user.get(reverse('posts:index'))
+        self.assertNotContains(response, 'редактировать запись')
+        follow_response = self.auth_user.get(reverse('posts:follow_index'))
+        self.assertNotContains(follow_response, 'Текст поста')
+        response = self.other_auth_user.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Текст поста')
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import write_queue
+from ..models import AppliedWrite, Comment, Post
+
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    WRITE_BEHIND=True,
+    WRITE_QUEUE_PATH=os.path.join(TEMP_DIR, 'queue.sqlite3'),
+    WRITE_QUEUE_MAX_ATTEMPTS=2,
+)
+class WriteQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(text='Пост', author=self.user)
+        self.addCleanup(self.clear_journal)
+
+    def clear_journal(self):
+        write_queue.journal()._connection().execute('DELETE FROM entries')
+
+    def create_post(self, key):
+        return self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Отложенный пост', 'idempotency_key': key},
+        )
+
+    def process(self):
+        call_command('process_write_queue', once=True, stdout=StringIO())
+
+    def test_post_is_pending_until_processed(self):
+        """Пост виден автору как ожидающий и появляется после воркера."""
+        response = self.create_post(write_queue.new_key())
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        self.assertFalse(Post.objects.filter(text='Отложенный пост').exists())
+        profile = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(len(profile.context['pending_posts']), 1)
+        self.assertContains(profile, 'Ожидает публикации')
+        self.assertNotContains(
+            Client().get(
+                reverse('posts:profile', kwargs={'username': 'Author'})
+            ),
+            'Ожидает публикации',
+        )
+        self.process()
+        self.assertTrue(Post.objects.filter(
+            text='Отложенный пост', author=self.user
+        ).exists())
+        self.assertEqual(write_queue.journal().size(), 0)
+
+    def test_retries_do_not_duplicate(self):
+        """Повтор отправки с тем же ключом не создаёт второй пост."""
+        key = write_queue.new_key()
+        self.create_post(key)
+        self.create_post(key)
+        self.process()
+        # Запись из журнала, уже применённая до сбоя воркера.
+        write_queue.journal().add(
+            write_queue.POST, self.user.pk,
+            {'text': 'Отложенный пост', 'group': None, 'image': ''}, key,
+        )
+        self.process()
+        self.assertEqual(
+            Post.objects.filter(text='Отложенный пост').count(), 1
+        )
+        self.assertTrue(AppliedWrite.objects.filter(key=key).exists())
+
+    def test_comment_reply_is_applied(self):
+        """Ответ на комментарий проходит через журнал в ту же ветку."""
+        root = Comment.objects.create(
+            text='Корень', author=self.user, post=self.post
+        )
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Ответ', 'parent': root.pk,
+             'idempotency_key': write_queue.new_key()},
+        )
+        detail = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(len(detail.context['pending_comments']), 1)
+        self.process()
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.thread, root)
+
+    def test_failed_entry_is_kept(self):
+        """Запись к удалённому посту после всех попыток помечается ошибкой."""
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Потерянный'},
+        )
+        post_id = self.post.pk
+        self.post.delete()
+        self.process()
+        entry, = write_queue.journal().pending(
+            self.user.pk, write_queue.COMMENT, post_id
+        )
+        self.assertTrue(entry.failed)
+        self.assertEqual(entry.attempts, 2)
+        with override_settings(WRITE_QUEUE_FAILED_TIMEOUT=0):
+            self.assertEqual(write_queue.journal().prune(), 1)
+        self.assertEqual(
+            write_queue.journal().pending(
+                self.user.pk, write_queue.COMMENT, post_id
+            ),
+            [],
+        )
+
+    def test_locked_database_is_retried(self):
+        """Сбой базы на одной записи не мешает остальным в пачке."""
+        self.create_post(write_queue.new_key())
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+
+        def locked(entry):
+            raise OperationalError('database is locked')
+
+        with mock.patch.dict(write_queue.APPLIERS, {write_queue.POST: locked}):
+            self.assertEqual(write_queue.process(), (1, 1))
+        entry, = write_queue.journal().pending(self.user.pk, write_queue.POST)
+        self.assertFalse(entry.failed)
+        self.assertEqual(entry.attempts, 1)
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+        self.process()
+        self.assertTrue(Post.objects.filter(text='Отложенный пост').exists())
+
+    def test_failed_batch_is_released(self):
+        """Если пачка не записалась, её записи возвращаются в очередь."""
+        self.create_post(write_queue.new_key())
+        with mock.patch.object(
+            write_queue, 'applied',
+            side_effect=OperationalError('database is locked'),
+        ):
+            with self.assertRaises(OperationalError):
+                write_queue.process()
+        entry, = write_queue.journal().pending(self.user.pk, write_queue.POST)
+        self.assertEqual(
+            (entry.status, entry.attempts), (write_queue.PENDING, 0)
+        )
+
+    def test_worker_survives_errors(self):
+        """Воркер пишет ошибку в лог, ждёт и продолжает работу."""
+        out = StringIO()
+        with mock.patch.object(write_queue, 'process', side_effect=[
+            OperationalError('database is locked'), (1, 0), KeyboardInterrupt,
+        ]), mock.patch('time.sleep') as sleep:
+            with self.assertLogs(
+                'posts.management.commands.process_write_queue', 'ERROR'
+            ):
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command('process_write_queue', stdout=out)
+        sleep.assert_called_once_with(2)
+        self.assertIn('Записано: 1', out.getvalue())
+
+
+class IdempotentWriteTest(TestCase):
+    def test_synchronous_retry_is_ignored(self):
+        """Без очереди повтор с тем же ключом тоже не дублирует пост."""
+        user = User.objects.create_user(username='Author')
+        client = Client()
+        client.force_login(user)
+        key = write_queue.new_key()
+        for _ in range(2):
+            client.post(
+                reverse('posts:post_create'),
+                {'text': 'Один раз', 'idempotency_key': key},
+            )
+        self.assertEqual(Post.objects.filter(text='Один раз').count(), 1)
@@ -0,0 +1,99 @@
+"""
+Ветки комментариев к посту.
+
+Страница поста листает корневые комментарии, а ответы к ним
+загружаются одним запросом: оконная функция нумерует ответы каждой
+ветки в порядке path, и выбираются только первые
+COMMENT_REPLIES_PREVIEW из каждой. Остальные ответы ветки отдаёт
+отдельная страница replies по курсору, так что длинная ветка
+не увеличивает стоимость страницы поста.
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import F
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .models import Comment
+
+
+def roots(post):
+    return post.comments.filter(parent=None).select_related('author')
+
+
+def replies(root):
+    """Все ответы ветки в порядке обхода дерева."""
+    return Comment.objects.filter(thread=root).select_related(
+        'author'
+    ).order_by('path')
+
+
+def reply_parent(post, parent_id):
+    """
+    Комментарий, к которому добавляется ответ.
+
+    Ответ на комментарий предельной глубины становится ответом на его
+    родителя, поэтому путь в ветке не растёт бесконечно.
+    """
+    if not str(parent_id).isdigit():
+        raise Http404
+    parent = get_object_or_404(
+        Comment.objects.select_related('parent'), pk=parent_id, post=post
+    )
+    if parent.depth >= settings.COMMENT_MAX_DEPTH:
+        return parent.parent
+    return parent
+
+
+def _first_replies(thread_ids, limit):
+    table = Comment._meta.db_table
+    placeholders = ', '.join(['%s'] * len(thread_ids))
+    # RawSQL внутри pk__in обёрнут в лишние скобки, и SQLite считает
+    # подзапрос скалярным, поэтому условие задаётся через extra().
+    ranked = (
+        f'{table}.id IN (SELECT id FROM ('
+        f'SELECT id, ROW_NUMBER() OVER ('
+        f'PARTITION BY thread_id ORDER BY path) AS position '
+        f'FROM {table} WHERE thread_id IN ({placeholders})'
+        f') AS ranked WHERE position <= %s)'
+    )
+    return Comment.objects.extra(
+        where=[ranked], params=[*thread_ids, limit]
+    ).select_related('author').order_by()
+
+
+def attach_previews(comments, limit=None):
+    """
+    Добавляет корням preview_replies и hidden_replies.
+
+    Ответы сортируются в Python: их не больше limit на ветку.
+    """
+    limit = limit or settings.COMMENT_REPLIES_PREVIEW
+    comments = list(comments)
+    threads = [comment.pk for comment in comments if comment.replies_count]
+    found = {}
+    if threads:
+        rows = sorted(
+            _first_replies(threads, limit),
+            key=lambda reply: (reply.thread_id, reply.path),
+        )
+        found = {
+            thread_id: list(group)
+            for thread_id, group in groupby(
+                rows, key=lambda reply: reply.thread_id
+            )
+        }
+    for comment in comments:
+        comment.preview_replies = found.get(comment.pk, [])
+        comment.hidden_replies = (
+            comment.replies_count - len(comment.preview_replies)
+        )
+    return comments
+
+
+def count_reply(comment, delta):
+    if comment.thread_id:
+        Comment.objects.filter(pk=comment.thread_id).update(
+            replies_count=F('replies_count') + delta
+        )
@@ -0,0 +1,319 @@
+"""
+Потоковый перенос контента в NDJSON и CSV.
+
+Экспорт читает таблицу через iterator(chunk_size), импорт пишет
+пачками bulk_create, каждая пачка — отдельная транзакция. Авторы и
+группы ищутся по словарям username → id и slug → id, загруженным один
+раз, поэтому память не растёт с числом строк. bulk_create не шлёт
+сигналов, так что после каждой пачки вручную обновляются счётчики
+авторов, счётчики групп (GroupStats и GroupAuthor), ленты подписок,
+поисковый индекс и версии кэша лент.
+"""
+import csv
+import json
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
+
+from . import cache, feed, follow_graph, search, stats
+from .models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+
+COLUMNS = {
+    'group': ('slug', 'title', 'description'),
+    'post': ('id', 'text', 'pub_date', 'author', 'group', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created', 'parent'),
+    'follow': ('user', 'author'),
+}
+
+
+def _export_rows(model):
+    if model == 'group':
+        return Group.objects.order_by('pk').values_list(*COLUMNS['group'])
+    if model == 'post':
+        return Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+            'image',
+        )
+    if model == 'comment':
+        return Comment.objects.order_by('pk').values_list(
+            'pk', 'post_id', 'author__username', 'text', 'created',
+            'parent_id',
+        )
+    return Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'
+    )
+
+
+def _encode(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_records(model, chunk_size):
+    """Записи модели словарями в порядке pk."""
+    columns = COLUMNS[model]
+    for row in _export_rows(model).iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, map(_encode, row)))
+
+
+def write_records(records, stream, fmt, model):
+    """Пишет записи в поток и отдаёт их дальше для подсчёта."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, COLUMNS[model])
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            yield record
+        return
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield record
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            # В CSV нет null: пустая строка значит «нет значения».
+            yield {key: value or None for key, value in record.items()}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_create_dated(model, objs, field_name):
+    """
+    bulk_create с исходными датами в поле auto_now_add.
+
+    bulk_create ставит такому полю текущее время, поэтому даты из
+    записей возвращаются вторым запросом, bulk_update.
+    """
+    dates = [getattr(obj, field_name) for obj in objs]
+    model.objects.bulk_create(objs)
+    for obj, date in zip(objs, dates):
+        setattr(obj, field_name, date)
+    model.objects.bulk_update(objs, [field_name])
+
+
+class Importer:
+    """Импорт пачками; счётчики — созданные и пропущенные записи."""
+
+    def __init__(self, model):
+        self.model = model
+        self.created = 0
+        self.skipped = 0
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def import_chunk(self, records):
+        with transaction.atomic():
+            getattr(self, f'_import_{self.model}s')(records)
+
+    def _skip(self, count=1):
+        self.skipped += count
+
+    def _import_groups(self, records):
+        groups = []
+        for record in records:
+            if record['slug'] in self.groups:
+                self._skip()
+                continue
+            groups.append(Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'] or '',
+            ))
+        Group.objects.bulk_create(groups)
+        # bulk_create на SQLite не возвращает pk, дочитываем их.
+        self.groups.update(Group.objects.filter(
+            slug__in=[group.slug for group in groups]
+        ).values_list('slug', 'pk'))
+        self.created += len(groups)
+
+    def _existing(self, model, ids):
+        return set(model.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+
+    def _import_posts(self, records):
+        existing = self._existing(Post, [record['id'] for record in records])
+        posts = []
+        for record in records:
+            author_id = self.users.get(record['author'])
+            group_id = self.groups.get(record['group'])
+            if (
+                int(record['id']) in existing
+                or author_id is None
+                or (record['group'] and group_id is None)
+            ):
+                self._skip()
+                continue
+            posts.append(Post(
+                pk=int(record['id']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                author_id=author_id,
+                group_id=group_id,
+                image=record['image'] or '',
+            ))
+        bulk_create_dated(Post, posts, 'pub_date')
+        for author_id, total in Counter(
+            post.author_id for post in posts
+        ).items():
+            stats.adjust(author_id, posts=total)
+        in_groups = {}
+        for post in posts:
+            if post.group_id is not None:
+                pair = (post.group_id, post.author_id)
+                total, last = in_groups.get(pair, (0, post.pub_date))
+                in_groups[pair] = (total + 1, max(last, post.pub_date))
+        for (group_id, author_id), (total, last) in in_groups.items():
+            stats.adjust_group(group_id, author_id, total, last)
+        feed.fan_out_many(posts)
+        search.index_posts(posts)
+        scopes = {cache.ALL_POSTS}
+        for post in posts:
+            scopes |= cache.post_scopes(post)
+        cache.bump(*scopes)
+        self.created += len(posts)
+
+    def _import_comments(self, records):
+        existing = self._existing(
+            Comment, [record['id'] for record in records]
+        )
+        parents = {
+            post.pk: post for post in Post.objects.filter(
+                pk__in={record['post'] for record in records}
+            ).only('pk', 'author_id', 'group_id')
+        }
+        # Ответы идут после родителей: pk родителя всегда меньше.
+        threads = {
+            comment.pk: comment for comment in Comment.objects.filter(
+                pk__in={
+                    record['parent'] for record in records
+                    if record.get('parent')
+                }
+            ).only('pk', 'thread_id', 'path', 'depth')
+        }
+        comments = []
+        for record in records:
+            author_id = self.users.get(record['author'])
+            post = parents.get(int(record['post']))
+            parent = None
+            if record.get('parent'):
+                parent = threads.get(int(record['parent']))
+            if (
+                int(record['id']) in existing
+                or author_id is None
+                or not post
+                or (record.get('parent') and parent is None)
+            ):
+                self._skip()
+                continue
+            comment = Comment(
+                pk=int(record['id']),
+                post=post,
+                author_id=author_id,
+                text=record['text'],
+                created=parse_datetime(record['created']),
+            )
+            if parent is not None:
+                comment.attach_to(parent)
+            threads[comment.pk] = comment
+            comments.append(comment)
+        bulk_create_dated(Comment, comments, 'created')
+        for thread_id, total in Counter(
+            comment.thread_id for comment in comments if comment.thread_id
+        ).items():
+            Comment.objects.filter(pk=thread_id).update(
+                replies_count=F('replies_count') + total
+            )
+        for author_id, total in Counter(
+            comment.author_id for comment in comments
+        ).items():
+            stats.adjust(author_id, comments=total)
+        search.index_comments(comments)
+        scopes = set()
+        for comment in comments:
+            scopes |= cache.post_scopes(comment.post)
+        cache.bump(*scopes)
+        self.created += len(comments)
+
+    def _import_follows(self, records):
+        pairs = []
+        for record in records:
+            user_id = self.users.get(record['user'])
+            author_id = self.users.get(record['author'])
+            if user_id is None or author_id is None or user_id == author_id:
+                self._skip()
+                continue
+            pairs.append((user_id, author_id))
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        new = set(pairs) - existing
+        # Повторы внутри пачки и уже существующие подписки пропускаются.
+        self._skip(len(pairs) - len(new))
+        Follow.objects.bulk_create(
+            [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in new
+            ],
+            ignore_conflicts=True,
+        )
+        follow_graph.forget(
+            {user_id for user_id, _ in new},
+            {author_id for _, author_id in new},
+        )
+        feed.backfill_many(new)
+        cache.bump(*{cache.follow_scope(user_id) for user_id, _ in new})
+        self.created += len(new)
+
+
+class Progress:
+    """Пишет число обработанных записей и скорость."""
+
+    def __init__(self, stream, every):
+        self.stream = stream
+        self.every = every
+        self.total = 0
+        self.started = time.monotonic()
+        self._next = every
+
+    def rate(self):
+        return self.total / max(time.monotonic() - self.started, 1e-9)
+
+    def add(self, count):
+        self.total += count
+        if self.total >= self._next:
+            self._next = self.total + self.every
+            self.stream.write(
+                f'{self.total} записей, {self.rate():.0f} в секунду'
+            )
+
+    def done(self):
+        elapsed = time.monotonic() - self.started
+        self.stream.write(
+            f'Готово: {self.total} записей за {elapsed:.1f} с '
+            f'({self.rate():.0f} в секунду)'
+        )
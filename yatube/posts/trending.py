@@ -0,0 +1,185 @@
+"""
+Рейтинг популярных постов.
+
+Каждое событие вокруг поста добавляет к его рейтингу вес из
+TRENDING_WEIGHTS, который затухает вдвое за TRENDING_HALF_LIFE.
+Чтобы не пересчитывать на каждом проходе все посты, PostScore.rank
+хранит логарифм суммы весов, приведённых к общему моменту EPOCH:
+ln Σ w·exp((t − EPOCH) / tau). Затухание у всех постов одинаковое,
+поэтому порядок по rank совпадает с порядком по текущему рейтингу,
+обновлять нужно только посты с новыми событиями, а популярное
+читается одним проходом по индексу rank.
+
+Новые события забирает update(): комментарии и подписки с pk больше
+запомненного в TrendingCursor. Подписка засчитывается последнему
+посту автора. Просмотры приходят пачками из posts.view_counts.
+"""
+import math
+from collections import Counter
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Comment, Follow, Post, PostScore, TrendingCursor
+
+
+EPOCH = datetime(2021, 1, 1, tzinfo=dt_timezone.utc)
+
+COMMENTS = 'comments'
+FOLLOWS = 'follows'
+VIEWS = 'views'
+
+
+def _elapsed(when):
+    tau = settings.TRENDING_HALF_LIFE / math.log(2)
+    return (when - EPOCH).total_seconds() / tau
+
+
+def rank(weight, when):
+    """Вклад события весом weight, случившегося в момент when."""
+    return math.log(weight) + _elapsed(when)
+
+
+def score(value, now=None):
+    """Текущий рейтинг поста по его rank."""
+    return math.exp(value - _elapsed(now or timezone.now()))
+
+
+def _add(first, second):
+    """Логарифм суммы по логарифмам слагаемых."""
+    if first is None:
+        return second
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _comment_events(after, limit):
+    return [
+        (pk, post_id, created, 1)
+        for pk, post_id, created in Comment.objects.filter(pk__gt=after)
+        .order_by('pk').values_list('pk', 'post_id', 'created')[:limit]
+    ]
+
+
+def _follow_events(after, limit):
+    follows = list(
+        Follow.objects.filter(pk__gt=after).order_by('pk')
+        .values_list('pk', 'author_id', 'created')[:limit]
+    )
+    # Каждый последний пост берётся по индексу (author, pub_date).
+    latest = {
+        author_id: Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date').values_list('pk', flat=True).first()
+        for author_id in {author_id for _, author_id, _ in follows}
+    }
+    return [
+        (pk, latest[author_id], created, 1)
+        for pk, author_id, created in follows
+    ]
+
+
+SOURCES = {
+    COMMENTS: _comment_events,
+    FOLLOWS: _follow_events,
+}
+
+
+def _apply(source, events):
+    """Добавляет события (pk, id поста, момент, число) к рейтингам."""
+    weight = settings.TRENDING_WEIGHTS[source]
+    ranks = {}
+    counts = Counter()
+    for _, post_id, when, count in events:
+        if post_id is not None:
+            ranks[post_id] = _add(
+                ranks.get(post_id), rank(weight * count, when)
+            )
+            counts[post_id] += count
+    scores = PostScore.objects.select_for_update().in_bulk(list(ranks))
+    groups = dict(
+        Post.objects.filter(
+            pk__in=[post_id for post_id in ranks if post_id not in scores]
+        ).values_list('pk', 'group_id')
+    )
+    now = timezone.now()
+    created, changed = [], []
+    for post_id, value in ranks.items():
+        post_score = scores.get(post_id)
+        if post_score is None:
+            if post_id not in groups:
+                # Пост удалён раньше, чем событие дошло до рейтинга.
+                continue
+            post_score = PostScore(
+                post_id=post_id, group_id=groups[post_id], rank=value
+            )
+            created.append(post_score)
+        else:
+            post_score.rank = _add(post_score.rank, value)
+            post_score.updated = now
+            changed.append(post_score)
+        setattr(
+            post_score, source, getattr(post_score, source) + counts[post_id]
+        )
+    PostScore.objects.bulk_create(created)
+    PostScore.objects.bulk_update(changed, ['rank', source, 'updated'])
+
+
+def update(batch_size=None):
+    """Учитывает новые события в рейтинге; возвращает их число."""
+    batch_size = batch_size or settings.TRENDING_BATCH_SIZE
+    total = 0
+    for source, read_events in SOURCES.items():
+        found = batch_size
+        while found == batch_size:
+            with transaction.atomic():
+                cursor, _ = TrendingCursor.objects.get_or_create(
+                    source=source
+                )
+                events = read_events(cursor.position, batch_size)
+                if events:
+                    _apply(source, events)
+                    cursor.position = events[-1][0]
+                    cursor.save()
+            found = len(events)
+            total += found
+    if total:
+        cache.bump(cache.TRENDING)
+    return total
+
+
+def add_views(views, now=None):
+    """Учитывает просмотры {id поста: число} в рейтинге."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        _apply(VIEWS, [
+            (None, post_id, now, count) for post_id, count in views.items()
+        ])
+    cache.bump(cache.TRENDING)
+
+
+def prune(now=None):
+    """Удаляет рейтинги, затухшие ниже TRENDING_MIN_SCORE."""
+    threshold = math.log(settings.TRENDING_MIN_SCORE) + _elapsed(
+        now or timezone.now()
+    )
+    deleted, _ = PostScore.objects.filter(rank__lt=threshold).delete()
+    if deleted:
+        cache.bump(cache.TRENDING)
+    return deleted
+
+
+def moved(post):
+    """Переносит рейтинг поста в его новую группу."""
+    PostScore.objects.filter(post_id=post.pk).update(group_id=post.group_id)
+
+
+def popular(group_id=None):
+    """Самые популярные посты сайта или группы."""
+    posts = Post.objects.feed().filter(score__isnull=False)
+    if group_id is not None:
+        posts = posts.filter(score__group_id=group_id)
+    return posts.order_by('-score__rank')[:settings.TRENDING_LIMIT]
@@ -1,14 +1,35 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.CachedFeed(), name='index_rss'),
+    path('atom/', feeds.AtomFeed(), name='index_atom'),
+    path('popular/', views.popular, name='popular'),
+    path('groups/', views.group_index, name='groups'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/popular/',
+        views.group_popular,
+        name='group_popular'
+    ),
+    path('group/<slug:slug>/rss/', feeds.GroupFeed(), name='group_rss'),
+    path(
+        'group/<slug:slug>/atom/', feeds.AtomGroupFeed(), name='group_atom'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/rss/', feeds.AuthorFeed(), name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.AtomAuthorFeed(),
+        name='profile_atom'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
@@ -17,6 +38,12 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/replies/',
+        views.comment_replies,
+        name='comment_replies'
+    ),
+    path('search/', views.search_posts, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,9 +1,269 @@
-from django.core.paginator import Paginator
+import copy
+import hashlib
+import json
+from functools import partial
 
-from yatube.settings import POSTS_PER_PAGE
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import redirect
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
+from yatube.settings import (NUMBERED_PAGES, PAGINATOR_COUNT_TIMEOUT,
+                             POSTS_PER_PAGE)
 
-def paginator(post_list, request):
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class DeepPage(InvalidPage):
+    """Номер страницы дальше NUMBERED_PAGES; cursor — первая за ними."""
+
+    def __init__(self, cursor):
+        super().__init__(cursor)
+        self.cursor = cursor
+
+
+class PageRedirect(Exception):
+    """Страницу отдаёт другой адрес того же представления."""
+
+    def __init__(self, query):
+        super().__init__(query)
+        self.query = query
+
+
+class PaginationMiddleware:
+    """Переводит PageRedirect из представлений в редирект."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, PageRedirect):
+            return redirect(f'{request.path}?{exception.query}')
+        return None
+
+
+def _annotation_field(annotation, name):
+    """Поле модели, описывающее аннотацию как часть ключа."""
+    field = annotation.output_field
+    if field.is_relation:
+        field = field.target_field
+    field = copy.copy(field)
+    field.name = None
+    field.set_attributes_from_name(name)
+    return field
+
+
+class KeysetPaginator(Paginator):
+    """
+    Паджинатор по ключу сортировки вместо OFFSET.
+
+    Ключ — поле сортировки модели и pk, например (pub_date, id).
+    Если сортировка задана несколькими полями, ключом служат они,
+    и последнее из них должно быть уникальным.
+    Первые NUMBERED_PAGES страниц доступны по номеру, дальше навигация
+    идёт по непрозрачному курсору, который хранит ключ крайней записи;
+    номер больше NUMBERED_PAGES даёт DeepPage с курсором первой из
+    следующих страниц, так что OFFSET не растёт. Все поля сортировки
+    должны идти в одну сторону. COUNT(*) не выполняется, пока не
+    запрошен приблизительный итог.
+    """
+
+    def __init__(self, object_list, per_page, with_total=False, **kwargs):
+        opts = object_list.model._meta
+        ordering = object_list.query.order_by or opts.ordering
+        if len({name.startswith('-') for name in ordering}) > 1:
+            raise ValueError(
+                f'Сортировка {ordering} идёт в разные стороны, '
+                'ключ для неё не построить.'
+            )
+        self.descending = ordering[0].startswith('-')
+        names = [name.lstrip('-') for name in ordering]
+        if len(names) == 1 and names[0] not in ('pk', opts.pk.name):
+            names.append('pk')
+        self.key_fields = [
+            self._key_field(object_list, name) for name in names
+        ]
+        sign = '-' if self.descending else ''
+        object_list = object_list.order_by(
+            *(sign + field.name for field in self.key_fields)
+        )
+        super().__init__(object_list, per_page, **kwargs)
+        self.with_total = with_total
+        self._num_pages = 1
+
+    @staticmethod
+    def _key_field(object_list, name):
+        opts = object_list.model._meta
+        if name == 'pk':
+            return opts.pk
+        if name in object_list.query.annotations:
+            return _annotation_field(object_list.query.annotations[name], name)
+        return opts.get_field(name)
+
+    @cached_property
+    def count(self):
+        """Приблизительное число записей, пересчитывается раз в минуту."""
+        query = str(self.object_list.query).encode()
+        key = 'paginator:count:' + hashlib.md5(query).hexdigest()
+        return cache.get_or_set(
+            key, self.object_list.count, PAGINATOR_COUNT_TIMEOUT
+        )
+
+    @property
+    def num_pages(self):
+        """Число известных страниц: текущая и, если есть, следующая."""
+        return self._num_pages
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self.page_from_cursor(cursor)
+            except (TypeError, ValueError, ValidationError):
+                pass
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self.page(number)
+
+    def page(self, number):
+        if number > NUMBERED_PAGES:
+            last = self.page(NUMBERED_PAGES)
+            if last.next_cursor is None:
+                raise EmptyPage('Такой страницы нет.')
+            raise DeepPage(last.next_cursor)
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Такой страницы нет.')
+        return self._build_page(rows, number, len(rows) > self.per_page)
+
+    def page_from_cursor(self, cursor):
+        direction, number, values = json.loads(
+            urlsafe_base64_decode(cursor).decode()
+        )
+        key = [
+            field.to_python(value)
+            for field, value in zip(self.key_fields, values)
+        ]
+        if direction == FORWARD:
+            queryset = self.object_list.filter(self._seek(key, True))
+            rows = list(queryset[:self.per_page + 1])
+            return self._build_page(
+                rows, int(number), len(rows) > self.per_page
+            )
+        if direction == BACKWARD:
+            queryset = self.object_list.filter(self._seek(key, False))
+            rows = list(queryset.reverse()[:self.per_page])
+            return self._build_page(rows[::-1], max(int(number), 1), True)
+        raise ValueError(direction)
+
+    def _seek(self, key, forward):
+        """Условие «строго после ключа» в лексикографическом порядке."""
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.key_fields, key):
+            condition |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+            equal[field.attname] = value
+        return condition
+
+    def _cursor(self, direction, number, obj):
+        values = [field.value_to_string(obj) for field in self.key_fields]
+        data = json.dumps([direction, number, values]).encode()
+        return urlsafe_base64_encode(data)
+
+    def _build_page(self, rows, number, has_next):
+        rows = rows[:self.per_page]
+        self._num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self._cursor(FORWARD, number + 1, rows[-1])
+        if rows and number > 1:
+            page.previous_cursor = self._cursor(
+                BACKWARD, number - 1, rows[0]
+            )
+        return page
+
+
+class LazyPage(Page):
+    """Страница, которая выбирает записи при первом обращении."""
+
+    def __init__(self, load):
+        self._load = load
+        self._page = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._page is None:
+            self._page = self._load()
+        return getattr(self._page, name)
+
+
+def page_query(request, **params):
+    """Строка запроса с params вместо номера страницы и курсора."""
+    query = request.GET.copy()
+    for name in ('page', 'cursor'):
+        query.pop(name, None)
+    query.update(params)
+    return query.urlencode()
+
+
+def _link(request, number, cursor):
+    if number <= NUMBERED_PAGES or not cursor:
+        return page_query(request, page=number)
+    return page_query(request, cursor=cursor)
+
+
+def paginator(post_list, request, with_total=False):
     '''Returns page object.'''
-    return Paginator(
-        post_list, POSTS_PER_PAGE).get_page(request.GET.get('page'))
+    try:
+        page_obj = KeysetPaginator(
+            post_list, POSTS_PER_PAGE, with_total=with_total
+        ).get_page(request.GET.get('page'), request.GET.get('cursor'))
+    except DeepPage as deep:
+        raise PageRedirect(page_query(request, cursor=deep.cursor))
+    except EmptyPage:
+        raise Http404('Такой страницы нет.')
+    number = page_obj.number
+    page_obj.first_query = page_query(request, page=1)
+    if page_obj.has_previous():
+        page_obj.previous_query = _link(
+            request, number - 1, page_obj.previous_cursor
+        )
+    if page_obj.has_next():
+        page_obj.next_query = _link(
+            request, number + 1, page_obj.next_cursor
+        )
+    last_numbered = min(page_obj.paginator.num_pages, NUMBERED_PAGES)
+    page_obj.numbered_links = [
+        (i, page_query(request, page=i)) for i in range(1, last_numbered + 1)
+    ]
+    return page_obj
+
+
+def feed_paginator(post_list, request, feed_cache_key):
+    """
+    paginator() для ленты в кэшируемом фрагменте feed_page.
+
+    Если фрагмент уже в кэше, шаблон не обращается к странице, и она
+    остаётся ленивой: запросы паджинатора не выполняются. Иначе
+    страница выбирается сразу, чтобы 404 и редирект на курсор
+    случились до рендера.
+    """
+    key = make_template_fragment_key('feed_page', [feed_cache_key])
+    if key in cache:
+        return LazyPage(partial(paginator, post_list, request))
+    return paginator(post_list, request)
@@ -0,0 +1,188 @@
+"""
+Счётчики просмотров постов.
+
+Просмотр не пишется в базу сразу: UPDATE на каждый запрос упёрся бы
+в блокировку записи SQLite. Каждый процесс копит приращения в памяти
+и раз в VIEW_FLUSH_INTERVAL секунд (или когда накопилось
+VIEW_BUFFER_SIZE постов) переносит их одной транзакцией: посты с
+одинаковым приращением обновляются одним UPDATE. Те же приращения
+уходят в рейтинг популярного. Повторный просмотр того же поста тем
+же зрителем в течение VIEW_DEDUPE_TIMEOUT не считается.
+
+В веб-сервере перенос делает фоновый поток (start_flusher вызывается
+из yatube.wsgi), поэтому буфер пустеет и без новых просмотров, а
+остаток переносится при выходе процесса. Без потока — в тестах и
+командах — перенос делает запрос, при котором он стал нужен.
+
+Считает ViewCountMiddleware, поэтому учитываются и страницы из кэша
+posts.pagecache. Закэшированные страницы показывают число просмотров
+на момент рендера. Приращения теряются, только если процесс убит.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from . import trending
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_flushed = time.monotonic()
+_flusher = None
+_wakeup = threading.Event()
+_stop = threading.Event()
+
+
+def counted(kwarg):
+    """Отмечает представление поста; kwarg — аргумент с id поста."""
+    def decorator(view):
+        view.counted_post_kwarg = kwarg
+        return view
+    return decorator
+
+
+def _viewer(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    # У гостя без сессии — адрес и браузер.
+    client = '{}:{}'.format(
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', ''),
+    )
+    return 'guest:' + hashlib.md5(client.encode()).hexdigest()
+
+
+def record(request, post_id):
+    """Учитывает просмотр поста, если зритель ещё не видел его."""
+    key = f'views:seen:{post_id}:{_viewer(request)}'
+    if not cache.add(key, True, settings.VIEW_DEDUPE_TIMEOUT):
+        return False
+    with _lock:
+        _buffer[post_id] += 1
+        full = len(_buffer) >= settings.VIEW_BUFFER_SIZE
+    if _flusher is None:
+        flush(force=False)
+    elif full:
+        _wakeup.set()
+    return True
+
+
+def pending():
+    """Ещё не перенесённые в базу просмотры."""
+    with _lock:
+        return dict(_buffer)
+
+
+def clear():
+    """Отбрасывает накопленные просмотры."""
+    with _lock:
+        _buffer.clear()
+
+
+def flush(force=True):
+    """Переносит накопленные просмотры в базу; возвращает их число."""
+    global _buffer, _flushed
+    with _lock:
+        due = (
+            time.monotonic() - _flushed >= settings.VIEW_FLUSH_INTERVAL
+            or len(_buffer) >= settings.VIEW_BUFFER_SIZE
+        )
+        if not force and not due:
+            return 0
+        views, _buffer = _buffer, Counter()
+        _flushed = time.monotonic()
+    if not views:
+        return 0
+    by_count = defaultdict(list)
+    for post_id, count in views.items():
+        by_count[count].append(post_id)
+    try:
+        with transaction.atomic():
+            for count, post_ids in by_count.items():
+                Post.objects.filter(pk__in=post_ids).update(
+                    views=F('views') + count
+                )
+            trending.add_views(views)
+    except DatabaseError:
+        logger.exception('Не удалось записать просмотры')
+        with _lock:
+            # Попробуем снова при следующем переносе.
+            _buffer.update(views)
+        return 0
+    return sum(views.values())
+
+
+def _flush_periodically():
+    while not _stop.is_set():
+        _wakeup.wait(settings.VIEW_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Фоновый перенос просмотров не удался')
+        finally:
+            # Соединение потока не должно висеть между переносами.
+            connection.close()
+
+
+def start_flusher():
+    """
+    Запускает фоновый перенос просмотров раз в VIEW_FLUSH_INTERVAL
+    секунд и перенос остатка при выходе процесса.
+    """
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return _flusher
+        _flusher = threading.Thread(
+            target=_flush_periodically, name='view-counts', daemon=True
+        )
+    _flusher.start()
+    atexit.register(flush)
+    return _flusher
+
+
+def stop_flusher():
+    """Останавливает фоновый перенос и переносит остаток."""
+    global _flusher
+    with _lock:
+        flusher, _flusher = _flusher, None
+    if flusher is None:
+        return
+    atexit.unregister(flush)
+    _stop.set()
+    _wakeup.set()
+    flusher.join()
+    _stop.clear()
+    _wakeup.clear()
+
+
+class ViewCountMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        kwarg = getattr(match and match.func, 'counted_post_kwarg', None)
+        if (
+            kwarg is not None
+            and settings.VIEW_COUNTS
+            and request.method == 'GET'
+            and response.status_code == 200
+        ):
+            record(request, match.kwargs[kwarg])
+        return response
@@ -1,70 +1,205 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from core import thumbnails
+from yatube.settings import POSTS_PER_PAGE
+from . import (cache, follow_graph, search, stats, threads, trending,
+               write_queue)
+from .pagecache import public_page, tag
+from .view_counts import counted
+from .feed import follow_feed
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .utils import feed_paginator, page_query, paginator
 
 
+@public_page
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    page_obj = paginator(post_list, request)
+    tag(request, cache.ALL_POSTS)
+    post_list = Post.objects.feed()
+    feed_cache_key = cache.feed_cache_key(request, cache.ALL_POSTS)
     context = {
-        'page_obj': page_obj,
+        'page_obj': feed_paginator(post_list, request, feed_cache_key),
+        'feed_cache_key': feed_cache_key,
     }
     return render(request, 'posts/index.html', context)
 
 
-def group_posts(request, slug):
+@public_page
+def popular(request):
+    tag(request, cache.ALL_POSTS, cache.TRENDING)
+    context = {'posts': trending.popular()}
+    return render(request, 'posts/popular.html', context)
+
+
+@public_page
+def group_popular(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator(post_list, request)
+    tag(request, cache.group_scope(group.pk), cache.TRENDING)
     context = {
         'group': group,
-        'page_obj': page_obj,
+        'posts': trending.popular(group.pk),
+    }
+    return render(request, 'posts/popular.html', context)
+
+
+@public_page
+def group_index(request):
+    tag(request, cache.ALL_POSTS)
+    groups = list(Group.objects.select_related('stats').order_by('title'))
+    for group in groups:
+        stats.group_stats(group)
+    return render(request, 'posts/groups.html', {'groups': groups})
+
+
+@public_page
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.select_related('stats'), slug=slug
+    )
+    tag(request, cache.group_scope(group.pk))
+    post_list = group.posts.feed()
+    feed_cache_key = cache.feed_cache_key(
+        request, cache.group_scope(group.pk)
+    )
+    context = {
+        'group': group,
+        'stats': stats.group_stats(group),
+        'page_obj': feed_paginator(post_list, request, feed_cache_key),
+        'feed_cache_key': feed_cache_key,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@public_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    page_obj = paginator(post_list, request)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    # Посты автора подписаны названиями их групп.
+    group_scopes = cache.author_group_scopes(author.pk)
+    tag(
+        request,
+        cache.author_scope(author.pk),
+        cache.follow_scope(author.pk),
+        cache.followers_scope(author.pk),
+        *group_scopes,
+    )
+    post_list = author.posts.feed()
+    feed_cache_key = cache.feed_cache_key(
+        request, cache.author_scope(author.pk), *group_scopes
+    )
+    following = mutual = False
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=User.objects.get(username=username),
-        ).exists()
-    else:
-        following = False
+        following = follow_graph.is_following(request.user.pk, author.pk)
+        mutual = follow_graph.is_mutual(request.user.pk, author.pk)
+    followers_count, following_count = follow_graph.counts(author.pk)
+    pending_posts = []
+    if settings.WRITE_BEHIND and request.user == author:
+        pending_posts = write_queue.journal().pending(
+            author.pk, write_queue.POST
+        )
     context = {
         'author': author,
-        'page_obj': page_obj,
+        'page_obj': feed_paginator(post_list, request, feed_cache_key),
         'following': following,
+        'mutual': mutual,
+        'followers_count': followers_count,
+        'following_count': following_count,
+        'pending_posts': pending_posts,
+        'feed_cache_key': feed_cache_key,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@counted('post_id')
+@public_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.feed(author_stats=True), pk=post_id
+    )
+    scopes = [cache.post_scope(post.pk), cache.author_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(cache.group_scope(post.group_id))
+    tag(request, *scopes)
     form = CommentForm()
-    comments = post.comments.all()
-    page_obj = paginator(comments, request)
+    page_obj = paginator(threads.roots(post), request)
+    page_obj.object_list = threads.attach_previews(page_obj.object_list)
+    pending_comments = []
+    if settings.WRITE_BEHIND and request.user.is_authenticated:
+        pending_comments = write_queue.journal().pending(
+            request.user.pk, write_queue.COMMENT, post.pk
+        )
     context = {
         'post': post,
         'form': form,
         'page_obj': page_obj,
+        'pending_comments': pending_comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_replies(request, post_id, comment_id):
+    root = get_object_or_404(
+        Comment.objects.select_related('author', 'post'),
+        pk=comment_id,
+        post_id=post_id,
+        parent=None,
+    )
+    page_obj = paginator(threads.replies(root), request)
+    context = {
+        'post': root.post,
+        'root': root,
+        'page_obj': page_obj,
+    }
+    template = (
+        'posts/includes/replies.html' if request.is_ajax()
+        else 'posts/comment_replies.html'
+    )
+    return render(request, template, context)
+
+
+def _pregenerate_thumbnails(post):
+    # Готовые миниатюры должны сразу попасть в закэшированные ленты.
+    thumbnails.pregenerate(
+        post.image, partial(cache.bump, *cache.post_scopes(post))
+    )
+
+
+def _save_once(obj, key, kind, after_save=None):
+    """
+    Сохраняет obj, если запись с этим ключом ещё не применялась.
+
+    Одновременный повтор упадёт на уникальности ключа и откатится.
+    """
+    if write_queue.applied(key):
+        return
+    try:
+        with transaction.atomic():
+            obj.save()
+            write_queue.remember(key, kind, obj)
+            if after_save is not None:
+                after_save(obj)
+    except IntegrityError:
+        if not write_queue.applied(key):
+            raise
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        key = write_queue.clean_key(request.POST.get('idempotency_key'))
+        if settings.WRITE_BEHIND:
+            write_queue.enqueue_post(request.user, form, key)
+        else:
+            post = form.save(commit=False)
+            post.author = request.user
+            _save_once(post, key, write_queue.POST, _pregenerate_thumbnails)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -81,6 +216,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            _pregenerate_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     is_edit = True
     context = {
@@ -96,20 +233,32 @@ def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        parent = None
+        if request.POST.get('parent'):
+            parent = threads.reply_parent(post, request.POST['parent'])
+        key = write_queue.clean_key(request.POST.get('idempotency_key'))
+        if settings.WRITE_BEHIND:
+            write_queue.enqueue_comment(request.user, post, form, parent, key)
+        else:
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            if parent is not None:
+                comment.attach_to(parent)
+            _save_once(comment, key, write_queue.COMMENT)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    page_obj = paginator(post_list, request)
+    post_list = follow_feed(request.user).feed()
+    feed_cache_key = cache.feed_cache_key(
+        request, cache.ALL_POSTS, cache.follow_scope(request.user.pk)
+    )
     context = {
-        'page_obj': page_obj,
+        'page_obj': feed_paginator(post_list, request, feed_cache_key),
+        'suggestions': follow_graph.suggestions(request.user.pk),
+        'feed_cache_key': feed_cache_key,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -133,3 +282,30 @@ def profile_unfollow(request, username):
         author=get_object_or_404(User, username=username),
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+def search_posts(request):
+    form = SearchForm(request.GET or None)
+    found, next_query = [], None
+    if form.is_valid():
+        data = form.cleaned_data
+        hits, next_cursor = search.search(
+            data['q'],
+            group_id=data['group'] and data['group'].pk,
+            author_id=data['author'] and data['author'].pk,
+            cursor=request.GET.get('cursor'),
+            limit=POSTS_PER_PAGE,
+        )
+        found = search.results(hits, data['q'])
+        if next_cursor:
+            next_query = page_query(request, cursor=next_cursor)
+    first_query = None
+    if 'cursor' in request.GET:
+        first_query = page_query(request)
+    context = {
+        'form': form,
+        'results': found,
+        'first_query': first_query,
+        'next_query': next_query,
+    }
+    return render(request, 'posts/search.html', context)
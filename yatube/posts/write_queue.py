@@ -0,0 +1,342 @@
+"""
+Отложенная запись постов и комментариев.
+
+При WRITE_BEHIND представления не пишут в базу сайта, а кладут
+проверенные данные формы в журнал — отдельный файл SQLite в режиме WAL,
+где вставка короткая и не ждёт блокировки основной базы. Команда
+process_write_queue переносит записи в базу пачками, по транзакции на
+пачку. Каждая запись несёт ключ идемпотентности из формы: повтор
+отправки не попадает в журнал второй раз, а ключ применённой записи
+сохраняется в AppliedWrite в той же транзакции, что и сам пост,
+поэтому запись, применённая до сбоя воркера, не продублируется.
+
+Запись, которую не удалось применить (в том числе из-за блокировки
+базы), возвращается в очередь до WRITE_QUEUE_MAX_ATTEMPTS попыток;
+если не удалось записать всю пачку, её записи возвращаются без учёта
+попытки. Исчерпавшие попытки записи автор видит с ошибкой
+WRITE_QUEUE_FAILED_TIMEOUT секунд, затем они удаляются.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+
+from core import thumbnails
+from . import cache
+from .models import AppliedWrite, Comment, Group, Post
+
+
+logger = logging.getLogger(__name__)
+
+POST = 'post'
+COMMENT = 'comment'
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+FAILED = 'failed'
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    target INTEGER,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    claimed REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_status ON entries (status, id);
+CREATE INDEX IF NOT EXISTS entries_user ON entries (user_id, kind, target);
+'''
+
+COLUMNS = (
+    'id, key, kind, user_id, target, payload, created, status, attempts, '
+    'error'
+)
+
+
+class Entry(namedtuple('Entry', COLUMNS)):
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+    @property
+    def created_at(self):
+        return datetime.fromtimestamp(self.created, dt_timezone.utc)
+
+    @property
+    def failed(self):
+        return self.status == FAILED
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def clean_key(value):
+    """Ключ из формы или None, если он не похож на выданный new_key()."""
+    if value and KEY_PATTERN.match(value):
+        return value
+    return None
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def add(self, kind, user_id, payload, key, target=None):
+        """Добавляет запись; повтор с тем же ключом игнорируется."""
+        self._connection().execute(
+            'INSERT OR IGNORE INTO entries '
+            '(key, kind, user_id, target, payload, created) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                key, kind, user_id, target,
+                json.dumps(payload, ensure_ascii=False), time.time(),
+            ),
+        )
+
+    def _select(self, where, params):
+        rows = self._connection().execute(
+            f'SELECT {COLUMNS} FROM entries WHERE {where} ORDER BY id',
+            params,
+        )
+        return [Entry(*row) for row in rows]
+
+    def pending(self, user_id, kind, target=None):
+        """Ещё не применённые записи пользователя, включая неудачные."""
+        where = 'user_id = ? AND kind = ?'
+        params = [user_id, kind]
+        if target is not None:
+            where += ' AND target = ?'
+            params.append(target)
+        return self._select(where, params)
+
+    def claim(self, limit):
+        """Берёт в работу до limit записей по порядку поступления."""
+        connection = self._connection()
+        now = time.time()
+        stale = now - settings.WRITE_QUEUE_CLAIM_TIMEOUT
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            entries = self._select(
+                'id IN (SELECT id FROM entries WHERE status = ? '
+                'OR (status = ? AND claimed < ?) ORDER BY id LIMIT ?)',
+                [PENDING, PROCESSING, stale, limit],
+            )
+            connection.executemany(
+                'UPDATE entries SET status = ?, claimed = ? WHERE id = ?',
+                [(PROCESSING, now, entry.id) for entry in entries],
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return entries
+
+    def finish(self, done, failed):
+        """
+        Удаляет применённые записи, неудачные возвращает в очередь,
+        пока не исчерпаны попытки.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'DELETE FROM entries WHERE id = ?',
+                [(entry_id,) for entry_id in done],
+            )
+            connection.executemany(
+                'UPDATE entries SET attempts = attempts + 1, error = ?, '
+                'status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END '
+                'WHERE id = ?',
+                [
+                    (error, settings.WRITE_QUEUE_MAX_ATTEMPTS, FAILED,
+                     PENDING, entry_id)
+                    for entry_id, error in failed
+                ],
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def release(self, entry_ids):
+        """Возвращает записи в очередь, не засчитывая попытку."""
+        self._connection().executemany(
+            'UPDATE entries SET status = ?, claimed = NULL WHERE id = ?',
+            [(PENDING, entry_id) for entry_id in entry_ids],
+        )
+
+    def prune(self):
+        """
+        Удаляет записи, исчерпавшие попытки раньше чем
+        WRITE_QUEUE_FAILED_TIMEOUT секунд назад.
+        """
+        return self._connection().execute(
+            'DELETE FROM entries WHERE status = ? AND claimed <= ?',
+            [FAILED, time.time() - settings.WRITE_QUEUE_FAILED_TIMEOUT],
+        ).rowcount
+
+    def images(self):
+        """Картинки постов, которые ещё ждут переноса в базу."""
+        rows = self._connection().execute(
+            'SELECT payload FROM entries WHERE kind = ?', [POST]
+        )
+        return {
+            name for name in (json.loads(row[0])['image'] for row in rows)
+            if name
+        }
+
+    def size(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM entries WHERE status != ?', [FAILED]
+        ).fetchone()[0]
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def journal():
+    path = settings.WRITE_QUEUE_PATH
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = Journal(path)
+        return _journals[path]
+
+
+def applied(key):
+    return key is not None and AppliedWrite.objects.filter(key=key).exists()
+
+
+def remember(key, kind, obj):
+    """Сохраняет ключ; вызывается в транзакции, создавшей obj."""
+    if key is not None:
+        AppliedWrite.objects.create(key=key, kind=kind, object_id=obj.pk)
+
+
+def enqueue_post(user, form, key):
+    image = form.cleaned_data.get('image')
+    name = ''
+    if image:
+        # Файл сохраняется сразу: в журнал попадает только имя.
+        field = Post._meta.get_field('image')
+        name = field.storage.save(
+            field.generate_filename(None, image.name), image
+        )
+    group = form.cleaned_data.get('group')
+    journal().add(POST, user.pk, {
+        'text': form.cleaned_data['text'],
+        'group': group and group.pk,
+        'image': name,
+    }, key or new_key())
+
+
+def enqueue_comment(user, post, form, parent, key):
+    journal().add(COMMENT, user.pk, {
+        'text': form.cleaned_data['text'],
+        'parent': parent and parent.pk,
+    }, key or new_key(), target=post.pk)
+
+
+def _apply_post(entry):
+    data = entry.data
+    post = Post(
+        text=data['text'],
+        author_id=entry.user_id,
+        group=data['group'] and Group.objects.get(pk=data['group']),
+        image=data['image'],
+    )
+    post.save()
+    return post
+
+
+def _apply_comment(entry):
+    data = entry.data
+    comment = Comment(
+        text=data['text'],
+        author_id=entry.user_id,
+        post=Post.objects.get(pk=entry.target),
+    )
+    if data['parent']:
+        comment.attach_to(Comment.objects.get(pk=data['parent']))
+    comment.save()
+    return comment
+
+
+APPLIERS = {POST: _apply_post, COMMENT: _apply_comment}
+
+# Ошибки в данных записи: повтор поможет, только если их исправят.
+INVALID = (
+    Group.DoesNotExist, Post.DoesNotExist, Comment.DoesNotExist,
+    IntegrityError,
+)
+
+
+def _apply(entry):
+    with transaction.atomic():
+        obj = APPLIERS[entry.kind](entry)
+        remember(entry.key, entry.kind, obj)
+        if entry.kind == POST:
+            thumbnails.pregenerate(obj.image, partial(
+                cache.bump, *cache.post_scopes(obj)
+            ))
+
+
+def process(limit=None):
+    """Переносит пачку записей в базу; возвращает (применено, ошибок)."""
+    entries = journal().claim(limit or settings.WRITE_QUEUE_BATCH_SIZE)
+    done, failed = [], []
+    try:
+        with transaction.atomic():
+            for entry in entries:
+                if applied(entry.key):
+                    done.append(entry.id)
+                    continue
+                try:
+                    _apply(entry)
+                except INVALID as error:
+                    failed.append((entry.id, repr(error)))
+                except Exception as error:
+                    # Например, «database is locked»: запись повторится.
+                    logger.exception(
+                        'Не удалось применить запись %s', entry.key
+                    )
+                    failed.append((entry.id, repr(error)))
+                else:
+                    done.append(entry.id)
+    except DatabaseError:
+        # Пачка не записана целиком, попытки её записей не засчитываются.
+        journal().release([entry.id for entry in entries])
+        raise
+    journal().finish(done, failed)
+    return len(done), len(failed)
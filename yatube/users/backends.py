@@ -0,0 +1,40 @@
+"""
+Кэш пользователя сессии.
+
+AuthenticationMiddleware на каждом запросе вошедшего пользователя
+вызывает get_user() бэкенда. ModelBackend делает на это SELECT всей
+строки auth_user; здесь пользователь загружается только с полями
+USER_SESSION_FIELDS (пароль нужен для проверки хэша сессии) и
+хранится в кэше. Остальные поля догрузятся при обращении к ним.
+Сигналы сбрасывают кэш при любом сохранении пользователя, так что
+смена пароля по-прежнему завершает чужие сессии.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+User = get_user_model()
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget(user_id):
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = User._default_manager.only(
+                *settings.USER_SESSION_FIELDS
+            ).filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,32 @@
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def writes_session(view):
+    """Разрешает представлению сохранять сессию и на безопасный запрос."""
+    view.writes_session = True
+    return view
+
+
+class ReadOnlySessionMiddleware(SessionMiddleware):
+    """
+    Не сохраняет сессию в ответ на безопасные запросы.
+
+    Такие запросы ничего не меняют, а случайная запись в сессию на
+    GET стоила бы записи в кэш и базу. Удаление опустевшей сессии
+    (выход, протухшая кука) работает как прежде. Представления, которые
+    пишут в сессию на GET намеренно (подтверждение сброса пароля хранит
+    в ней токен), помечаются writes_session.
+    """
+
+    def process_response(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        if (
+            request.method in SAFE_METHODS
+            and not request.session.is_empty()
+            and not getattr(match and match.func, 'writes_session', False)
+        ):
+            request.session.modified = False
+        return super().process_response(request, response)
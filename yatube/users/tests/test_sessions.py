@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from ..middleware import ReadOnlySessionMiddleware
+
+
+User = get_user_model()
+
+
+def session_queries(captured):
+    """Запросы к таблицам сессий и пользователей."""
+    return [
+        query['sql'] for query in captured.captured_queries
+        if 'django_session' in query['sql'] or 'auth_user' in query['sql']
+    ]
+
+
+class SessionHotPathTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['sessions'].clear()
+        self.user = User.objects.create_user(
+            username='NewUser', password='secret-password'
+        )
+        self.client = Client()
+        self.client.login(username='NewUser', password='secret-password')
+
+    def get(self, client):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(reverse('about:author'))
+        self.assertEqual(response.status_code, 200)
+        return response, session_queries(captured)
+
+    def test_anonymous_request_skips_database(self):
+        """Гость не читает из базы ни сессию, ни пользователя."""
+        _, queries = self.get(Client())
+        self.assertEqual(queries, [])
+
+    def test_logged_in_user_is_cached(self):
+        """Сессия и пользователь читаются из кэша со второго запроса."""
+        response, _ = self.get(self.client)
+        self.assertEqual(response.context['user'], self.user)
+        response, queries = self.get(self.client)
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'Пользователь: NewUser')
+
+    def test_password_change_ends_cached_session(self):
+        """Смена пароля по-прежнему завершает чужие сессии."""
+        self.get(self.client)
+        self.user.set_password('another-password')
+        self.user.save()
+        response, _ = self.get(self.client)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_safe_request_does_not_save_session(self):
+        """Изменения сессии на GET не сохраняются, на POST — да."""
+        def view(request):
+            request.session['visited'] = True
+            return HttpResponse()
+
+        factory = RequestFactory()
+        middleware = ReadOnlySessionMiddleware(view)
+        response = middleware(factory.get('/'))
+        self.assertNotIn('sessionid', response.cookies)
+        response = middleware(factory.post('/'))
+        self.assertIn('sessionid', response.cookies)
+
+    def test_password_reset_link_keeps_token_in_session(self):
+        """Ссылка сброса пароля работает: токен сохраняется на GET."""
+        guest = Client()
+        # Вход в setUp обновил last_login, от которого зависит токен.
+        self.user.refresh_from_db()
+        link = reverse('users:password_reset_confirm', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': default_token_generator.make_token(self.user),
+        })
+        response = guest.get(link, follow=True)
+        self.assertTrue(response.context['validlink'])
+        response = guest.post(response.redirect_chain[-1][0], {
+            'new_password1': 'brand-new-password',
+            'new_password2': 'brand-new-password',
+        })
+        self.assertRedirects(
+            response, reverse('users:password_reset_complete')
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('brand-new-password'))
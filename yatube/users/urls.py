@@ -7,6 +7,7 @@ from django.contrib.auth.views import PasswordResetCompleteView
 from django.urls import path
 
 from . import views
+from .middleware import writes_session
 
 
 app_name = 'users'
@@ -53,9 +54,10 @@ urlpatterns = [
     ),
     path(
         'reset/<uidb64>/<token>/',
-        PasswordResetConfirmView.as_view(
+        # Токен из ссылки сохраняется в сессии перед редиректом.
+        writes_session(PasswordResetConfirmView.as_view(
             template_name='users/password_reset_confirm.html'
-        ),
+        )),
         name='password_reset_confirm'
     ),
     path(
@@ -1,5 +1,7 @@
 import os
 
+from PIL import features
+
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -7,6 +9,9 @@ SECRET_KEY = 'qc3nz!v%0)qv&p^17fytoyp##e^b%b9ot60n-g571@s3f#fc_^'
 
 DEBUG = True
 
+# Панель отладки только для разработки: под нагрузкой она лишь мешает.
+DEBUG_TOOLBAR = DEBUG and os.getenv('DEBUG_TOOLBAR', '1') == '1'
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -27,28 +32,35 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'users.middleware.ReadOnlySessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.view_counts.ViewCountMiddleware',
+    'posts.pagecache.PageCacheMiddleware',
+    'posts.utils.PaginationMiddleware',
 ]
 
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -103,6 +115,28 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 LOGIN_URL = 'users:login'
 
+# Сессии читаются из кэша sessions, в базу идут только при записи.
+# Безопасные запросы сессию не сохраняют (users.middleware), поэтому
+# сообщения хранятся в cookie, а не в сессии.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# ModelBackend остаётся для сессий, открытых до появления кэша.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Поля пользователя сессии, которые загружаются и кэшируются сразу.
+USER_SESSION_FIELDS = (
+    'username', 'password', 'is_active', 'is_staff', 'is_superuser',
+)
+
+USER_CACHE_TIMEOUT = 60 * 15
+
 LOGIN_REDIRECT_URL = 'posts:index'
 
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -113,18 +147,227 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
 
+NUMBERED_PAGES = 5
+
+PAGINATOR_COUNT_TIMEOUT = 60
+
+# Ответы глубже COMMENT_MAX_DEPTH становятся соседями родителя.
+COMMENT_MAX_DEPTH = 8
+
+# Сколько ответов ветки показывать сразу, остальные — по ссылке.
+COMMENT_REPLIES_PREVIEW = 3
+
+FOLLOW_FEED_MATERIALIZED = True
+
+FEED_FANOUT_LIMIT = 10000
+
+# RSS и Atom: число записей, срок хранения готового документа
+# (ключ версионирован, так что срок лишь освобождает память) и max-age.
+SYNDICATION_ITEMS = 20
+
+SYNDICATION_TIMEOUT = 24 * 60 * 60
+
+SYNDICATION_MAX_AGE = 60
+
+FOLLOW_GRAPH_CACHE_TIMEOUT = 24 * 60 * 60
+
+FOLLOW_SUGGESTIONS = 5
+
+# Популярное (posts.trending): вес события затухает вдвое за
+# TRENDING_HALF_LIFE секунд, посты с рейтингом ниже TRENDING_MIN_SCORE
+# из него удаляются. Пересчитывает команда update_trending.
+TRENDING_HALF_LIFE = 24 * 60 * 60
+
+TRENDING_WEIGHTS = {
+    'comments': 1.0,
+    'follows': 3.0,
+    'views': 0.1,
+}
+
+TRENDING_MIN_SCORE = 0.05
+
+TRENDING_BATCH_SIZE = 1000
+
+TRENDING_LIMIT = 20
+
+# Просмотры постов (posts.view_counts) копятся в памяти процесса и
+# фоновый поток переносит их в базу раз в VIEW_FLUSH_INTERVAL секунд
+# или по набору VIEW_BUFFER_SIZE постов. Повторы одного зрителя в течение
+# VIEW_DEDUPE_TIMEOUT секунд не считаются.
+VIEW_COUNTS = True
+
+VIEW_FLUSH_INTERVAL = 10
+
+VIEW_BUFFER_SIZE = 1000
+
+VIEW_DEDUPE_TIMEOUT = 30 * 60
+
+# Отложенная запись: посты и комментарии сначала попадают в журнал
+# WRITE_QUEUE_PATH, а в базу их пачками переносит команда
+# process_write_queue. Автор до этого видит их как «ожидающие».
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '0') == '1'
+
+WRITE_QUEUE_PATH = os.getenv(
+    'WRITE_QUEUE_PATH', os.path.join(BASE_DIR, 'write_queue.sqlite3')
+)
+
+WRITE_QUEUE_BATCH_SIZE = 100
+
+WRITE_QUEUE_MAX_ATTEMPTS = 5
+
+# Взятые воркером записи без результата через это время берутся снова.
+WRITE_QUEUE_CLAIM_TIMEOUT = 5 * 60
+
+# Записи, исчерпавшие попытки, автор видит с ошибкой это время.
+WRITE_QUEUE_FAILED_TIMEOUT = 24 * 60 * 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+# Кэш выбирается переменной окружения CACHE_BACKEND:
+# locmem (по умолчанию, только для разработки), file, memcached,
+# pylibmc или redis (нужен пакет django-redis). Для общих бэкендов
+# default работает в два уровня: L1 в памяти воркера и L2 общий.
+# Бэкенды из core.cache считают попадания для метрик; redis — нет.
+LOCMEM_CACHE = 'core.cache.LocMemCache'
+
+SHARED_CACHE_BACKENDS = {
+    'file': 'core.cache.FileBasedCache',
+    'memcached': 'core.cache.MemcachedCache',
+    'pylibmc': 'core.cache.PyLibMCCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+
+CACHE_LOCAL_TIMEOUT = int(os.getenv('CACHE_LOCAL_TIMEOUT', 5))
+
+CACHE_ALIASES = ('pages', 'sessions')
+
+
+def shared_cache(alias, **extra):
+    location = CACHE_LOCATION
+    if CACHE_BACKEND == 'file':
+        location = os.path.join(CACHE_LOCATION, alias)
+    return {
+        'BACKEND': SHARED_CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': location,
+        'KEY_PREFIX': alias,
+        **extra,
+    }
+
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        alias: {'BACKEND': LOCMEM_CACHE, 'LOCATION': alias}
+        for alias in ('default',) + CACHE_ALIASES
     }
+else:
+    CACHES = {
+        'local': {'BACKEND': LOCMEM_CACHE, 'LOCATION': 'local'},
+        'shared': shared_cache('shared'),
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'OPTIONS': {
+                'LOCAL': 'local',
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': CACHE_LOCAL_TIMEOUT,
+            },
+        },
+        'pages': shared_cache('pages'),
+        'sessions': shared_cache('sessions'),
+    }
+
+# Кэш страниц для гостей (posts.pagecache). При разработке выключен,
+# чтобы правки шаблонов были видны сразу.
+PAGE_CACHE = os.getenv('PAGE_CACHE', '0' if DEBUG else '1') == '1'
+
+PAGE_CACHE_ALIAS = 'pages'
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько секунд страницу может отдавать обратный прокси и сколько
+# ещё — устаревшую, пока он перестраивает её.
+PAGE_CACHE_MAX_AGE = 60
+
+PAGE_CACHE_STALE_WHILE_REVALIDATE = 30
+
+PAGE_CACHE_LOCK_TIMEOUT = 10
+
+THUMBNAIL_BACKEND = 'core.thumbnails.ThumbnailBackend'
+
+# Метаданные миниатюр: индекс SQLite (по умолчанию
+# MEDIA_ROOT/.thumbnails.sqlite3) и LRU в памяти каждого процесса.
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+
+THUMBNAIL_INDEX_PATH = os.getenv('THUMBNAIL_INDEX_PATH')
+
+THUMBNAIL_INDEX_FLUSH_INTERVAL = 30
+
+THUMBNAIL_LRU_SIZE = 10000
+
+THUMBNAIL_LRU_TIMEOUT = 60
+
+# Сколько места миниатюры могут занимать после thumbnail_cache --evict.
+THUMBNAIL_DISK_BUDGET = int(
+    os.getenv('THUMBNAIL_DISK_BUDGET', 1024 * 1024 * 1024)
+)
+
+# Миниатюру, которую шаблон нашёл недавно, ещё показывают закэшированные
+# страницы: фрагменты лент (600 секунд), кэш страниц и обратный прокси.
+# Вытесняются только миниатюры, не читанные дольше этого.
+THUMBNAIL_EVICT_IDLE = (
+    PAGE_CACHE_TIMEOUT + PAGE_CACHE_MAX_AGE
+    + PAGE_CACHE_STALE_WHILE_REVALIDATE + THUMBNAIL_INDEX_FLUSH_INTERVAL
+)
+
+THUMBNAIL_PREGENERATE_SIZES = {
+    '480x170': {'crop': 'center', 'upscale': True},
+    '960x339': {'crop': 'center', 'upscale': True},
+    '1920x678': {'crop': 'center', 'upscale': False},
+}
+
+# Ширины для srcset картинки каждого размера, от меньшей к большей.
+THUMBNAIL_SRCSET = {
+    '960x339': ('480x170', '960x339', '1920x678'),
 }
 
+# Копии миниатюр в WebP, если Pillow собран с его поддержкой.
+THUMBNAIL_WEBP = features.check('webp')
+
+# Загруженные картинки уменьшаются до этого размера и перекодируются
+# так, чтобы уложиться в IMAGE_MAX_BYTES (см. core.images).
+IMAGE_MAX_SIZE = (1920, 1920)
+
+IMAGE_MAX_BYTES = 512 * 1024
+
+IMAGE_JPEG_QUALITY = (85, 75, 65, 55)
+
+# collect_media не трогает файлы моложе этого срока: загрузка
+# сохраняет картинку раньше, чем появляется ссылающийся на неё пост.
+MEDIA_GC_GRACE = 60 * 60 * 24
+
+THUMBNAIL_PREGENERATE_WORKERS = 2
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Эндпоинт /metrics/ доступен с этих адресов и персоналу сайта.
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+METRICS_SLOW_REQUEST_SECONDS = float(
+    os.getenv('METRICS_SLOW_REQUEST_SECONDS', 1)
+)
+
+# Доля медленных запросов, попадающих в журнал вместе с SQL.
+METRICS_SLOW_REQUEST_SAMPLE = float(
+    os.getenv('METRICS_SLOW_REQUEST_SAMPLE', 0.1)
+)
@@ -1,8 +1,17 @@
 import os
 
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Фоновые потоки нужны только веб-серверу, не тестам и командам.
+from core import thumbnails  # noqa: E402
+from posts import view_counts  # noqa: E402
+
+thumbnails.start_pool()
+if settings.VIEW_COUNTS:
+    view_counts.start_flusher()